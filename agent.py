@@ -1,9 +1,9 @@
 import asyncio
 import os
+import time
 import logging
 from datetime import datetime
 from telegram.ext import ApplicationBuilder
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import pytz
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,26 +12,33 @@ import sys
 # Добавляем путь к модулям (важно для Render)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from bot_chat.chat_handler import setup_chat_handlers
-from smoking_reminder.smoking_tracker import setup_smoking_scheduler, calculate_days_and_savings
-from lina_water.water_reminder import setup_water_scheduler
-from medicine_reminder.medicine_tracker import setup_medicine_scheduler
-from french_reminder.french_tracker import setup_french_scheduler
-
-# 🔧 Включаем tracemalloc
-import tracemalloc
+# ⏱️ Отсчет холодного старта
+BOOT_STARTED = time.perf_counter()
 
-tracemalloc.start()
+from bot_chat.chat_handler import setup_chat_handlers
+from bot_chat.response_cache import response_cache
+from reminder_core.catalog import CursorStore, message_catalog
+from reminder_core.delivery import delivery_engine, send_message
+from reminder_core.digest import DigestStore, setup_digest_handlers
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.job_store import JobStateStore
+from reminder_core.jobs import job_runner
+from reminder_core.leader import LeaderElector, LeaseStore, watch_leader
+from reminder_core.logs import setup_logging
+from reminder_core.metrics import metrics
+from reminder_core.outbox import Outbox
+from reminder_core.plugins import PluginRegistry, TrackerSpec
+from reminder_core.profiling import current_rss, memory_profiler, setup_profiling_handlers
+from reminder_core.registry import SubscriptionRegistry
+from reminder_core.storage import connect
+from reminder_core.subscriptions import SubscriptionManager, setup_subscription_handlers
+from reminder_core.webhook import run_webhook
 
 # 🔧 Логирование
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('telegram').setLevel(logging.WARNING)
-logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 # 🔐 .env
 load_dotenv(dotenv_path='secrets/keys.env')
@@ -44,79 +51,225 @@ MOTHER_USER_ID = int(os.getenv("MOTHER_USER_ID", "0")) if os.getenv("MOTHER_USER
 if not TELEGRAM_TOKEN or USER_ID == 0:
     raise ValueError("❌ TELEGRAM_TOKEN или USER_ID не заданы!")
 
+REMINDER_MAX_CONCURRENCY = int(os.getenv("REMINDER_MAX_CONCURRENCY", "20"))
+REMINDER_JOB_TIMEOUT = int(os.getenv("REMINDER_JOB_TIMEOUT", "60"))
+
 vancouver_tz = pytz.timezone('America/Vancouver')
-WEBHOOK_URL = "https://my-ai-bot-ehgw.onrender.com"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://my-ai-bot-ehgw.onrender.com")
+# Другой адрес Bot API (например, поддельный сервер для прогона записанного трафика)
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL")
+# Токен для /metrics (Authorization: Bearer ...); без него метрики отдаются только на localhost
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
+# 🎭 Роли процесса: web — только вебхук, worker — только напоминания, all — всё вместе.
+# Напоминания рассылает только лидер (аренда в SQLite), остальные ждут в резерве.
+# Кнопки и команды из вебхука пишут в базу, а повторы по ним планирует лидер, поэтому web и worker
+# обязаны работать с одним файлом REMINDER_DB (один хост или общий том). На Render у сервисов нет
+# общего диска — там запускается один сервис с ролью all (render.yaml).
+ROLE_WEB = 'web'
+ROLE_WORKER = 'worker'
+ROLE_ALL = 'all'
 
-# 🌞 Стартовое сообщение
-async def send_startup_message(bot):
-    try:
-        days, money_saved, cigarettes_not_smoked = calculate_days_and_savings()
+# 🧩 Манифест трекеров: модуль импортируется только при первой подписке на него
+TRACKERS = PluginRegistry({
+    # Статистика курения — один файл данных администратора: трекер личный
+    'smoking': TrackerSpec('smoking_reminder.smoking_tracker:setup_smoking_scheduler',
+                           'America/Vancouver', "🚬 Курение: 6:40 AM", owner=USER_ID),
+    'water': TrackerSpec('lina_water.water_reminder:setup_water_scheduler',
+                         'America/Vancouver', "💧 Вода: каждый час 7:00-22:00"),
+    'medicine': TrackerSpec('medicine_reminder.medicine_tracker:setup_medicine_scheduler',
+                            'Europe/Helsinki', "💊 Лекарства: 8:00, 14:00, 20:00 (+повтор без подтверждения)"),
+    'french': TrackerSpec('french_reminder.french_tracker:setup_french_scheduler',
+                          'America/Vancouver', "🇫🇷 Французский: 22:15"),
+})
 
-        # Определяем активные напоминания
-        active_reminders = []
-        active_reminders.append("🚬 Курение: 6:40 AM")
 
-        if LINA_USER_ID:
-            active_reminders.append("💧 Вода (Лина): каждый час 7:00-22:00")
+def seed_registry(registry):
+    """Начальные подписки из переменных окружения (для существующего деплоя)"""
+    registry.seed(USER_ID, 'smoking', 'America/Vancouver')
+    registry.seed(USER_ID, 'french', 'America/Vancouver')
+    if LINA_USER_ID:
+        registry.seed(LINA_USER_ID, 'water', 'America/Vancouver')
+    if MOTHER_USER_ID:
+        registry.seed(MOTHER_USER_ID, 'medicine', 'Europe/Helsinki')
 
-        if MOTHER_USER_ID:
-            active_reminders.append("💊 Лекарства (Мама): 8:00, 8:30, 14:00, 20:00, 20:30")
 
-        active_reminders.append("🇫🇷 Французский: 22:15")
+def user_timezone(registry, user_id, reminder_type):
+    """Часовой пояс подписки пользователя (или пояс трекера по умолчанию)"""
+    for subscription in registry.user_subscriptions(user_id):
+        if subscription.reminder_type == reminder_type:
+            return pytz.timezone(subscription.timezone)
+    return pytz.timezone(TRACKERS[reminder_type].default_timezone)
 
-        msg = (
-                f"🤖 Бот запущен!\n\n"
+
+# 🌞 Стартовое сообщение
+async def send_startup_message(bot, registry):
+    try:
+        # Определяем активные напоминания по реестру подписок
+        counts = registry.count_by_type()
+        active_reminders = [
+            f"{tracker.description} — подписчиков: {counts[reminder_type]}"
+            for reminder_type, tracker in TRACKERS.items() if counts.get(reminder_type)
+        ]
+
+        # Статистика курения — только если трекер подключен (он уже загружен подписками)
+        smoking_stats = ""
+        if counts.get('smoking'):
+            smoking = TRACKERS.module('smoking')
+            await smoking.smoking_state.load()
+            days, money_saved, cigarettes_not_smoked = smoking.calculate_days_and_savings()
+            smoking_stats = (
                 f"📊 Статистика курения:\n"
                 f"🗓️ Дней без курения: {days}\n"
                 f"💰 Сэкономлено: ${money_saved:.2f}\n"
                 f"🚬 Не выкурено: {cigarettes_not_smoked} сигарет\n\n"
+            )
+
+        msg = (
+                f"🤖 Бот запущен!\n\n" +
+                smoking_stats +
                 f"⏰ Активные напоминания:\n" +
                 "\n".join([f"   {reminder}" for reminder in active_reminders]) +
                 f"\n\n🕒 Время Vancouver: {datetime.now(vancouver_tz).strftime('%H:%M:%S')}"
         )
-        await bot.send_message(chat_id=USER_ID, text=msg)
+        await send_message(bot, USER_ID, msg)
     except Exception as e:
         logger.error(f"Ошибка старта: {e}")
 
 
+# 📈 Метрики состояния: значения читаются только при запросе /metrics
+def register_gauges(scheduler, outbox):
+    metrics.gauge('process_resident_memory_bytes', 'RSS процесса', function=current_rss)
+    metrics.gauge('delivery_queue_depth', 'Сообщения в очереди доставки', function=delivery_engine.queue_depth)
+    metrics.gauge(
+        'job_queue_depth', 'Задачи, ожидающие слота, по классу приоритета', ('class',),
+        function=lambda: {(name,): stats['queued'] for name, stats in job_runner.stats().items()}
+    )
+    metrics.gauge(
+        'jobs_running', 'Выполняющиеся задачи по классу приоритета', ('class',),
+        function=lambda: {(name,): stats['running'] for name, stats in job_runner.stats().items()}
+    )
+    metrics.gauge(
+        'outbox_messages', 'Строки outbox по статусу', ('status',),
+        function=lambda: {(status,): total for status, total in outbox.stats().items()
+                          if status != 'duplicates_skipped'}
+    )
+    metrics.gauge('outbox_duplicates_skipped', 'Повторы слотов, не попавшие в outbox',
+                  function=lambda: outbox.duplicates)
+    metrics.gauge('scheduler_slots', 'Слоты в диспетчере этого процесса', function=lambda: len(scheduler))
+    metrics.gauge('chat_cache_hit_ratio', 'Доля ответов чата из кэша', function=response_cache.hit_rate)
+    metrics.gauge(
+        'chat_cache_lookups', 'Обращения к кэшу ответов', ('result',),
+        function=lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses,
+                          ('shared',): response_cache.shared}
+    )
+
+
+# 🔘 Кнопки и команды трекеров: легкие модули без самих трекеров (их грузит TRACKERS по подпискам)
+def setup_tracker_handlers(application, registry):
+    # Отметки выпитой воды приходят в веб-процесс; граница дня — по часовому поясу подписки
+    from lina_water.intake import setup_water_handlers
+    setup_water_handlers(application, lambda user_id: user_timezone(registry, user_id, 'water'))
+    # Подтверждения приема лекарств; в процессе-лидере сразу отменяют запланированные повторы
+    from medicine_reminder.adherence import setup_medicine_handlers
+    setup_medicine_handlers(application, lambda user_id: user_timezone(registry, user_id, 'medicine'),
+                            on_taken=cancel_medicine_followups)
+    # Повторение карточек французского (/quiz) и импорт колод файлом по /deck import
+    from french_reminder.srs import setup_french_handlers
+    setup_french_handlers(application)
+
+
+def cancel_medicine_followups(user_id, day, dose):
+    """Повторы планирует только загруженный трекер лекарств: если его нет в процессе, отменять нечего"""
+    if TRACKERS.is_loaded('medicine'):
+        TRACKERS.module('medicine').cancel_followups(user_id, day, dose)
+
+
 # 🌐 Основной запуск
-async def main():
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+async def main(role=ROLE_ALL):
+    builder = ApplicationBuilder().token(TELEGRAM_TOKEN)
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(TELEGRAM_BASE_URL)
+    application = builder.build()
 
     # Настройка обработчиков чата
-    setup_chat_handlers(application)
+    setup_chat_handlers(application, USER_ID)
+    # Профилирование памяти по запросу администратора (tracemalloc по умолчанию выключен)
+    setup_profiling_handlers(application, memory_profiler, USER_ID)
 
-    # Настройка планировщика
-    scheduler = AsyncIOScheduler(timezone=vancouver_tz)
+    # Настройка диспетчера: все слоты в одной куче, задачи выполняются корутинами на цикле main()
+    job_runner.configure(max_concurrency=REMINDER_MAX_CONCURRENCY, job_timeout=REMINDER_JOB_TIMEOUT)
+    # Режим сводки (/digest): близкие по времени напоминания пользователя — одним сообщением
+    digest_store = DigestStore(connect())
+    setup_digest_handlers(application, digest_store)
+    scheduler = Dispatcher(job_runner, store=JobStateStore(connect()), digest=digest_store)
 
-    # Настройка всех напоминаний
-    setup_smoking_scheduler(scheduler, application.bot, USER_ID)
+    # Реестр подписок: команды пишут в него в любом процессе, слоты заводит только лидер
+    registry = SubscriptionRegistry(connect())
+    seed_registry(registry)
+    subscriptions = SubscriptionManager(registry, scheduler, application.bot, TRACKERS)
+    setup_subscription_handlers(application, subscriptions, USER_ID)
 
-    if LINA_USER_ID:
-        setup_water_scheduler(scheduler, application.bot, LINA_USER_ID)
-        logger.info(f"✅ Настроены напоминания о воде для Lina (ID: {LINA_USER_ID})")
+    setup_tracker_handlers(application, registry)
 
-    if MOTHER_USER_ID:
-        setup_medicine_scheduler(scheduler, application.bot, MOTHER_USER_ID)
-        logger.info(f"✅ Настроены напоминания о лекарствах для мамы (ID: {MOTHER_USER_ID})")
+    # Курсоры колод сообщений (без повторов текстов) переживают рестарт
+    message_catalog.attach(CursorStore(connect()))
 
-    setup_french_scheduler(scheduler, application.bot, USER_ID)
-    logger.info(f"✅ Настроены напоминания о французском для основного пользователя (ID: {USER_ID})")
+    # Очередь доставки и outbox нужны всем процессам (ответы чата, напоминания лидера)
+    await delivery_engine.start()
+    outbox = Outbox(connect(), delivery_engine)
+    delivery_engine.outbox = outbox
+    register_gauges(scheduler, outbox)
 
-    # Запуск планировщика
-    scheduler.start()
+    async def on_elected():
+        subscriptions.load()
+        subscriptions.start_sync()
+        outbox.start(application.bot)
+        scheduler.start()
+        logger.info(
+            f"⏱️ Холодный старт: {time.perf_counter() - BOOT_STARTED:.2f} с, затраты плагинов:\n"
+            f"{TRACKERS.report()}"
+        )
+        await send_startup_message(application.bot, registry)
 
-    # Отправка стартового сообщения
-    await send_startup_message(application.bot)
+    async def on_demoted():
+        await scheduler.stop()
+        scheduler.clear()
+        await subscriptions.stop_sync()
+        await outbox.stop()
+        await message_catalog.flush()
 
-    logger.info(f"🟢 Запуск через Webhook: {WEBHOOK_URL}")
-    await application.run_webhook(
-        listen="0.0.0.0",
-        port=int(os.getenv("PORT", 10000)),
-        webhook_url=WEBHOOK_URL,
-        drop_pending_updates=True
-    )
+    elector = None
+    if role in (ROLE_WORKER, ROLE_ALL):
+        elector = LeaderElector(LeaseStore(connect()), on_elected, on_demoted)
+        elector.start()
+
+    if role == ROLE_WORKER:
+        logger.info("🟢 Запуск воркера напоминаний (без вебхука)")
+        async with application:
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await elector.stop()
+        return
+
+    logger.info(f"🟢 Запуск через Webhook: {WEBHOOK_URL} (роль: {role}), метрики: /metrics")
+    # Без своего лидера веб-процесс следит, что лидер пишет в ту же базу
+    watcher = asyncio.create_task(watch_leader(LeaseStore(connect()))) if elector is None else None
+    try:
+        await run_webhook(
+            application,
+            listen="0.0.0.0",
+            port=int(os.getenv("PORT", 10000)),
+            webhook_url=WEBHOOK_URL,
+            drop_pending_updates=True,
+            metrics_token=METRICS_TOKEN
+        )
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if elector is not None:
+            await elector.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,6 @@
+# benchmarks/__init__.py
+"""
+Офлайн-бенчмарки: поддельные Telegram Bot API и OpenAI, сценарии рассылок, чата и холодного старта.
+
+Запуск: python -m benchmarks [сценарий ...] [--users N] [--tg-rate N]
+"""
@@ -0,0 +1,66 @@
+import os
+import sys
+import asyncio
+import argparse
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Бенчмарки никогда не открывают рабочую базу, даже через модули, импортированные до сценария
+os.environ['REMINDER_DB'] = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'reminders.db')
+
+from benchmarks.results import OUTPUT_FILE, format_result, previous_result, save_result  # noqa: E402
+from benchmarks.scenarios import SCENARIOS  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Офлайн-бенчмарки напоминаний и чата на поддельных Telegram и OpenAI"
+    )
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument('--users', type=int, help="число пользователей в сценарии")
+    parser.add_argument('--tg-rate', type=int, help="лимит поддельного Telegram, сообщ./с (0 — без лимита)")
+    parser.add_argument('--repeat', type=int, help="повторы для cold_start")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="файл результатов (JSON-строки)")
+    parser.add_argument('--no-save', action='store_true', help="не записывать результат")
+    parser.add_argument('--verbose', action='store_true', help="логи бота в консоль")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    return args
+
+
+def scenario_kwargs(name, args):
+    kwargs = {}
+    if args.users is not None and name != 'cold_start':
+        kwargs['users'] = args.users
+    if args.tg_rate is not None and name != 'cold_start':
+        kwargs['tg_rate'] = args.tg_rate
+    if args.repeat is not None and name == 'cold_start':
+        kwargs['repeat'] = args.repeat
+    return kwargs
+
+
+async def run(args):
+    for name in args.scenarios or list(SCENARIOS):
+        result = await SCENARIOS[name](**scenario_kwargs(name, args))
+        previous = previous_result(result, args.output)
+        print(format_result(result, previous), flush=True)
+        if not args.no_save:
+            save_result(result, args.output)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
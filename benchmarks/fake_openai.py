@@ -0,0 +1,110 @@
+import json
+import time
+import asyncio
+import logging
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class FakeOpenAIState:
+    """Настройки поддельного OpenAI: задержка до первого токена, темп и длина ответа"""
+
+    def __init__(self, first_token_latency=0.3, token_interval=0.02, tokens=20):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.tokens = tokens
+        self.requests = 0
+
+    def answer_tokens(self):
+        return [f"слово{i} " for i in range(self.tokens)]
+
+
+def _chunk(model, content=None, finish_reason=None):
+    delta = {'content': content} if content is not None else {}
+    return {
+        'id': 'chatcmpl-bench',
+        'object': 'chat.completion.chunk',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }
+
+
+class ChatCompletionsHandler(tornado.web.RequestHandler):
+    """POST /v1/chat/completions — обычный ответ или поток SSE"""
+
+    def initialize(self, state):
+        self.state = state
+
+    async def post(self):
+        self.state.requests += 1
+        body = json.loads(self.request.body or b'{}')
+        model = body.get('model', 'bench')
+        tokens = self.state.answer_tokens()
+        await asyncio.sleep(self.state.first_token_latency)
+
+        if not body.get('stream'):
+            await asyncio.sleep(self.state.token_interval * len(tokens))
+            self.write({
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': len(tokens), 'total_tokens': 10 + len(tokens)},
+            })
+            return
+
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(self.state.token_interval)
+            self.write(f"data: {json.dumps(_chunk(model, token), ensure_ascii=False)}\n\n")
+            await self.flush()
+        self.write(f"data: {json.dumps(_chunk(model, finish_reason='stop'))}\n\n")
+        self.write("data: [DONE]\n\n")
+        await self.flush()
+
+
+class FakeOpenAIServer:
+    """Поддельный OpenAI API на 127.0.0.1 со случайным портом"""
+
+    def __init__(self, **settings):
+        self.state = FakeOpenAIState(**settings)
+        self.port = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        """Значение для OPENAI_BASE_URL"""
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def start(self):
+        app = tornado.web.Application([(r'/v1/chat/completions', ChatCompletionsHandler, {'state': self.state})])
+        sockets = bind_sockets(0, '127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        self._server = HTTPServer(app)
+        self._server.add_sockets(sockets)
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
@@ -0,0 +1,163 @@
+import json
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque, namedtuple
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Запись о принятом сообщении: время приема, чат, метод и текст
+Received = namedtuple('Received', ['at', 'chat_id', 'method', 'text'])
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+def update_payload(update_id, user_id, text, date=None, username=None):
+    """Telegram Update с текстовым сообщением (формат тела вебхука)"""
+    sender = {'id': user_id, 'is_bot': False, 'first_name': username or 'Bench'}
+    if username and username != 'NoUsername':
+        sender['username'] = username
+    message = {
+        'message_id': update_id,
+        'date': int(date or time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': sender,
+        'text': text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return {'update_id': update_id, 'message': message}
+
+
+class FakeTelegramState:
+    """Состояние поддельного Bot API: принятые сообщения и лимиты как у Telegram
+
+    global_rate — сообщений в секунду на бота, per_chat_interval — минимальный
+    интервал между сообщениями в один чат; при превышении отвечаем 429 с retry_after.
+    """
+
+    def __init__(self, global_rate=30, per_chat_interval=None, retry_after=1, latency=0.0):
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.retry_after = retry_after
+        self.latency = latency
+        self.received = []
+        self.rejected = 0
+        self._window = deque()
+        self._chat_last = {}
+        self._message_ids = itertools.count(1)
+
+    def reset(self):
+        self.received.clear()
+        self.rejected = 0
+        self._window.clear()
+        self._chat_last.clear()
+
+    def admit(self, chat_id):
+        """True — сообщение принято, False — лимит превышен (429)"""
+        now = time.monotonic()
+        while self._window and now - self._window[0] >= 1.0:
+            self._window.popleft()
+        if self.global_rate and len(self._window) >= self.global_rate:
+            self.rejected += 1
+            return False
+        if self.per_chat_interval and now - self._chat_last.get(chat_id, -1e9) < self.per_chat_interval:
+            self.rejected += 1
+            return False
+        self._window.append(now)
+        self._chat_last[chat_id] = now
+        return True
+
+    def message(self, chat_id, text):
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text,
+        }
+
+
+class BotApiHandler(tornado.web.RequestHandler):
+    """POST /bot<token>/<метод>: параметры приходят формой или JSON"""
+
+    def initialize(self, state):
+        self.state = state
+
+    def _params(self):
+        if self.request.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(self.request.body or b'{}')
+        return {name: self.get_body_argument(name) for name in self.request.body_arguments}
+
+    def _reply(self, result=None, error=None):
+        if error is None:
+            self.write({'ok': True, 'result': result})
+        else:
+            self.set_status(error['error_code'])
+            self.write({'ok': False, **error})
+
+    async def post(self, token, method):
+        if self.state.latency:
+            await asyncio.sleep(self.state.latency)
+        params = self._params()
+        method = method.lower()
+        if method == 'getme':
+            return self._reply(BOT_USER)
+        if method in ('setwebhook', 'deletewebhook', 'sendchataction', 'answercallbackquery'):
+            return self._reply(True)
+        if method in ('sendmessage', 'editmessagetext'):
+            chat_id = int(params.get('chat_id', 0))
+            if method == 'sendmessage' and not self.state.admit(chat_id):
+                return self._reply(error={
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.state.retry_after}",
+                    'parameters': {'retry_after': self.state.retry_after},
+                })
+            text = params.get('text', '')
+            self.state.received.append(Received(time.time(), chat_id, method, text))
+            message = self.state.message(chat_id, text)
+            if 'message_id' in params:
+                message['message_id'] = int(params['message_id'])
+            return self._reply(message)
+        return self._reply(error={'error_code': 404, 'description': f"Not Found: method {method}"})
+
+
+class FakeTelegramServer:
+    """Поддельный Bot API на 127.0.0.1 со случайным портом"""
+
+    def __init__(self, **limits):
+        self.state = FakeTelegramState(**limits)
+        self.port = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        """Значение для Bot(base_url=...)"""
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self):
+        app = tornado.web.Application([(r'/bot([^/]+)/(\w+)', BotApiHandler, {'state': self.state})])
+        sockets = bind_sockets(0, '127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        self._server = HTTPServer(app)
+        self._server.add_sockets(sockets)
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import tempfile
+import itertools
+from collections import deque, namedtuple
+from datetime import datetime
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_telegram import update_payload  # noqa: E402
+from benchmarks.results import (  # noqa: E402
+    OUTPUT_FILE, format_result, percentile, previous_result, save_result, summarize,
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Входящее событие: смещение от начала записи (с), пользователь, имя и текст
+ReplayEvent = namedtuple('ReplayEvent', ['offset', 'user_id', 'username', 'text'])
+
+# Строки вида "2025-06-10 21:54:39,109 [INFO] [NoUsername | ID: 6718957938] -> Привет"
+# и "... [name | ID: 1] sent /start" (команды)
+MESSAGE_PATTERN = (
+    r'\[(?P<username>[^|\]]+?) \| ID: (?P<user_id>\d+)\] '
+    r'(?:-> (?P<text>.*)|sent (?P<command>/\w+))$'
+)
+LOG_LINE = re.compile(r'^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:,(?P<ms>\d{3}))?.*?' + MESSAGE_PATTERN)
+# Поле message JSON-записи (LOG_FORMAT=json)
+LOG_MESSAGE = re.compile(r'^' + MESSAGE_PATTERN)
+
+MAX_IN_FLIGHT = 200
+METRICS_INTERVAL = 1.0
+# Клоны пользователя получают ID со сдвигом, чтобы не попадать под лимиты одного чата
+CLONE_ID_STEP = 10_000_000_000
+# Сколько ждать новых ответов бота после последнего события (ответы видны только в поддельном Telegram)
+REPLY_TIMEOUT = 30.0
+
+
+def parse_log(path):
+    """События из logs/agent.log: текстовые строки или JSON-строки (время — из меток записей)"""
+    events, first = [], None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('{'):
+                # JSON-строки (LOG_FORMAT=json): время — поле ts, текст — message
+                try:
+                    record = json.loads(line)
+                    match = LOG_MESSAGE.match(record.get('message', ''))
+                    stamp = datetime.fromisoformat(record['ts']).timestamp() if match else None
+                except (ValueError, KeyError):
+                    continue
+            else:
+                match = LOG_LINE.match(line)
+                stamp = match and (datetime.strptime(match['ts'], '%Y-%m-%d %H:%M:%S').timestamp()
+                                   + int(match['ms'] or 0) / 1000)
+            if not match:
+                continue
+            first = stamp if first is None else first
+            text = match['text'] if match['text'] is not None else match['command']
+            events.append(ReplayEvent(stamp - first, int(match['user_id']), match['username'], text))
+    return events
+
+
+def parse_updates(path):
+    """События из сохраненных Update: JSON-массив или JSON-строки (время — message.date)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = f.read().strip()
+    updates = json.loads(raw) if raw.startswith('[') else [json.loads(line) for line in raw.splitlines() if line.strip()]
+    events, first = [], None
+    for update in updates:
+        message = update.get('message') or update.get('edited_message')
+        if not message or 'text' not in message:
+            continue
+        first = message['date'] if first is None else first
+        sender = message.get('from') or {}
+        events.append(ReplayEvent(message['date'] - first, message['chat']['id'],
+                                  sender.get('username', 'NoUsername'), message['text']))
+    return events
+
+
+def load_events(path):
+    if path.endswith(('.json', '.jsonl')):
+        return parse_updates(path)
+    return parse_log(path)
+
+
+def amplify(events, repeat=1, clones=1, gap=1.0):
+    """Усиление нагрузки: повтор записи подряд и клоны каждого пользователя"""
+    events = sorted(events, key=lambda event: event.offset)
+    if not events:
+        return []
+    span = events[-1].offset + gap
+    amplified = []
+    for round_number in range(repeat):
+        for event in events:
+            for clone in range(clones):
+                amplified.append(event._replace(
+                    offset=event.offset + round_number * span,
+                    user_id=event.user_id + clone * CLONE_ID_STEP,
+                ))
+    amplified.sort(key=lambda event: event.offset)
+    return amplified
+
+
+def compress_idle(events, max_gap):
+    """Длинные паузы (ночь, перезапуски) сокращаются до max_gap секунд"""
+    compressed, shift, previous = [], 0.0, None
+    for event in events:
+        if previous is not None and event.offset - previous > max_gap:
+            shift += event.offset - previous - max_gap
+        previous = event.offset
+        compressed.append(event._replace(offset=event.offset - shift))
+    return compressed
+
+
+def match_replies(sent, received):
+    """Задержка обработчика: от отправки апдейта до первого ответа бота в тот же чат
+
+    sent — [(время отправки, chat_id)], received — Received поддельного Telegram (время — time.time()).
+    Сообщения, склеенные дебаунсом в один ответ, получают каждое свою задержку до этого ответа.
+    Возвращает (задержки, число апдейтов без ответа).
+    """
+    pending = {}
+    for at, chat_id in sorted(sent):
+        pending.setdefault(chat_id, deque()).append(at)
+    latencies = []
+    for reply in sorted(received, key=lambda reply: reply.at):
+        queue = pending.get(reply.chat_id)
+        if reply.method != 'sendmessage' or not queue:
+            continue
+        while queue and queue[0] <= reply.at:
+            latencies.append(reply.at - queue.popleft())
+    return latencies, sum(len(queue) for queue in pending.values())
+
+
+async def _wait_replies(sent, received, timeout):
+    """Ожидание ответов на все апдейты; останавливается, если новых ответов нет timeout секунд"""
+    seen, idle_since = len(received), time.monotonic()
+    while match_replies(sent, received)[1] and time.monotonic() - idle_since < timeout:
+        await asyncio.sleep(0.1)
+        if len(received) != seen:
+            seen, idle_since = len(received), time.monotonic()
+
+
+async def _scrape_rss(client, metrics_url, samples, stop):
+    """Периодический съем RSS приложения из /metrics (если эндпоинт есть)"""
+    while not stop.is_set():
+        try:
+            response = await client.get(metrics_url)
+            for line in response.text.splitlines():
+                if line.startswith('process_resident_memory_bytes '):
+                    samples.append(float(line.split()[1]))
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=METRICS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def replay(events, url, speed=1.0, secret_token=None, max_in_flight=MAX_IN_FLIGHT, received=None,
+                 reply_timeout=REPLY_TIMEOUT):
+    """Отправка событий вебхуком с сохранением интервалов (speed=0 — максимально быстро)
+
+    Нагрузка "открытая": следующее событие уходит по расписанию, не дожидаясь ответа на предыдущее.
+    Вебхук только ставит апдейт в очередь, поэтому время POST — задержка постановки в очередь.
+    С received (принятые поддельным Telegram сообщения) задержки — до ответа бота пользователю,
+    а время POST уходит в extra (post_p50/post_p95).
+    """
+    headers = {'Content-Type': 'application/json'}
+    if secret_token:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret_token
+    update_ids = itertools.count(int(time.time()))
+    latencies, errors, lags, sent = [], 0, [], []
+    semaphore = asyncio.Semaphore(max_in_flight)
+    rss_samples, stop = [], asyncio.Event()
+    metrics_url = url.rstrip('/') + '/metrics'
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        scraper = asyncio.create_task(_scrape_rss(client, metrics_url, rss_samples, stop))
+
+        async def post(event, payload):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                sent.append((time.time(), event.user_id))
+                try:
+                    response = await client.post(url, content=json.dumps(payload, ensure_ascii=False).encode(),
+                                                 headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError as e:
+                    errors += 1
+                    logger.warning(f"Ошибка отправки события {event.user_id}: {e}")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        tasks = []
+        for event in events:
+            if speed:
+                delay = event.offset / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lags.append(max(0.0, -delay))
+            payload = update_payload(next(update_ids), event.user_id, event.text, username=event.username)
+            tasks.append(asyncio.create_task(post(event, payload)))
+        await asyncio.gather(*tasks)
+        if received is not None:
+            await _wait_replies(sent, received, reply_timeout)
+        duration = time.perf_counter() - started
+        stop.set()
+        await scraper
+
+    extra = {'errors': errors}
+    if received is not None:
+        post_latencies = latencies
+        latencies, extra['unanswered'] = match_replies(sent, received)
+        extra['post_p50'] = round(percentile(post_latencies, 0.50), 4) if post_latencies else None
+        extra['post_p95'] = round(percentile(post_latencies, 0.95), 4) if post_latencies else None
+    if lags:
+        extra['schedule_lag_max'] = round(max(lags), 4)
+    if rss_samples:
+        extra['rss_start_mb'] = round(rss_samples[0] / 2 ** 20, 1)
+        extra['rss_max_mb'] = round(max(rss_samples) / 2 ** 20, 1)
+        extra['rss_end_mb'] = round(rss_samples[-1] / 2 ** 20, 1)
+    return latencies, duration, extra
+
+
+async def _start_local_agent(port, workdir):
+    """agent.py в отдельном процессе на поддельных Telegram и OpenAI"""
+    from benchmarks.fake_openai import FakeOpenAIServer
+    from benchmarks.fake_telegram import FakeTelegramServer
+    from benchmarks.scenarios import BENCH_TOKEN, REPO_ROOT
+
+    fake_telegram = await FakeTelegramServer(global_rate=0).start()
+    fake_openai = await FakeOpenAIServer().start()
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN=BENCH_TOKEN, USER_ID='1', OPENAI_API_KEY='replay',
+        TELEGRAM_BASE_URL=fake_telegram.base_url, OPENAI_BASE_URL=fake_openai.base_url,
+        WEBHOOK_URL=f"http://127.0.0.1:{port}/", PORT=str(port),
+        REMINDER_DB=os.path.join(workdir, 'replay.db'),
+    )
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, 'agent.py', cwd=REPO_ROOT, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    async with httpx.AsyncClient(timeout=1) as client:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                await client.get(f"http://127.0.0.1:{port}/metrics")
+                break
+            except httpx.HTTPError:
+                if process.returncode is not None or time.monotonic() > deadline:
+                    raise RuntimeError("локальный agent.py не запустился")
+                await asyncio.sleep(0.2)
+    return process, fake_telegram, fake_openai
+
+
+def parse_speed(value):
+    if value in ('max', 'asap', '0'):
+        return 0.0
+    return float(value.rstrip('x×'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.replay',
+        description="Воспроизведение записанного трафика вебхуком (лог agent.log или JSON с Update)"
+    )
+    parser.add_argument('source', help="logs/agent.log или файл .json/.jsonl с Update")
+    parser.add_argument('--url', default='http://127.0.0.1:10000/', help="адрес вебхука")
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help="1, 10x, ... или max")
+    parser.add_argument('--repeat', type=int, default=1, help="повторить запись N раз подряд")
+    parser.add_argument('--clones', type=int, default=1, help="клонов каждого пользователя")
+    parser.add_argument('--max-gap', type=float, default=60.0, help="сократить паузы длиннее (с)")
+    parser.add_argument('--secret-token', help="X-Telegram-Bot-Api-Secret-Token")
+    parser.add_argument('--local', action='store_true',
+                        help="запустить agent.py локально на поддельных Telegram и OpenAI")
+    parser.add_argument('--port', type=int, default=18080, help="порт локального agent.py (--local)")
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--no-save', action='store_true')
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    events = compress_idle(amplify(load_events(args.source), args.repeat, args.clones), args.max_gap)
+    if not events:
+        raise SystemExit(f"В {args.source} нет входящих сообщений")
+    url = args.url
+    local = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.local:
+            local = await _start_local_agent(args.port, workdir)
+            url = f"http://127.0.0.1:{args.port}/"
+        try:
+            # Локально ответы бота видны в поддельном Telegram: меряем задержку до ответа, а не только POST
+            received = local[1].state.received if local is not None else None
+            latencies, duration, extra = await replay(events, url, args.speed, args.secret_token, received=received)
+        finally:
+            if local is not None:
+                process, fake_telegram, fake_openai = local
+                process.terminate()
+                await process.wait()
+                await fake_telegram.stop()
+                await fake_openai.stop()
+
+    params = {'source': os.path.basename(args.source), 'speed': args.speed or 'max',
+              'repeat': args.repeat, 'clones': args.clones,
+              'latency': 'handler' if args.local else 'webhook_post'}
+    result = summarize('replay', params, latencies, duration, **extra)
+    print(format_result(result, previous_result(result, args.output)), flush=True)
+    if not args.no_save:
+        save_result(result, args.output)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+import time
+import logging
+import subprocess
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Результаты дописываются JSON-строками — так прогоны разных коммитов можно сравнивать
+OUTPUT_FILE = "bench_output.txt"
+
+
+def percentile(values, fraction):
+    """Перцентиль с линейной интерполяцией (values не обязаны быть отсортированы)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(scenario, params, latencies, duration, **extra):
+    """Итог сценария: пропускная способность и p50/p95/p99 задержки (в секундах)"""
+    return {
+        'scenario': scenario,
+        'params': params,
+        'count': len(latencies),
+        'duration': round(duration, 4),
+        'throughput': round(len(latencies) / duration, 2) if duration > 0 else None,
+        'p50': _round(percentile(latencies, 0.50)),
+        'p95': _round(percentile(latencies, 0.95)),
+        'p99': _round(percentile(latencies, 0.99)),
+        'max': _round(max(latencies) if latencies else None),
+        **extra,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_result(result, path=OUTPUT_FILE):
+    record = dict(result, commit=git_revision(), recorded_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+def previous_result(result, path=OUTPUT_FILE):
+    """Последний сохраненный прогон того же сценария с теми же параметрами"""
+    previous = None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('scenario') == result['scenario'] and record.get('params') == result['params']:
+                    previous = record
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def format_result(result, previous=None):
+    def fmt(key, unit=' с'):
+        value = result.get(key)
+        line = f"{key}={value}{unit}" if value is not None else f"{key}=—"
+        if previous and previous.get(key) and value is not None:
+            change = (value - previous[key]) / previous[key] * 100
+            line += f" ({change:+.0f}%)"
+        return line
+
+    params = ", ".join(f"{k}={v}" for k, v in result['params'].items())
+    lines = [
+        f"▶ {result['scenario']} ({params})",
+        f"   сообщений: {result['count']} за {result['duration']} с, " + fmt('throughput', '/с'),
+        "   " + "  ".join(fmt(key) for key in ('p50', 'p95', 'p99', 'max')),
+    ]
+    extra = {k: v for k, v in result.items()
+             if k not in ('scenario', 'params', 'count', 'duration', 'throughput', 'p50', 'p95', 'p99', 'max',
+                          'commit', 'recorded_at')}
+    if extra:
+        lines.append("   " + ", ".join(f"{k}={v}" for k, v in extra.items()))
+    if previous:
+        lines.append(f"   сравнение с {previous.get('commit') or '?'} от {previous.get('recorded_at')}")
+    return "\n".join(lines)
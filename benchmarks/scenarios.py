@@ -0,0 +1,276 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import importlib
+import contextlib
+import subprocess
+
+from telegram import Bot, Update
+
+from reminder_core import storage
+from reminder_core.catalog import CursorStore, message_catalog
+from reminder_core.delivery import delivery_engine
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.job_store import JobStateStore
+from reminder_core.jobs import CHAT, JobRunner, make_job_id
+from reminder_core.outbox import Outbox
+from reminder_core.storage import connect
+
+from .fake_openai import FakeOpenAIServer
+from .fake_telegram import FakeTelegramServer, update_payload
+from .results import summarize
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+BENCH_TOKEN = "123456:BENCH"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Чаты второй группы пользователей (вода в сценарии medicine_burst)
+SECOND_GROUP_OFFSET = 1_000_000
+# Хранилища трекеров, которые открывают общую базу лениво: (модуль, глобальная переменная)
+TRACKER_STORES = (
+    ('lina_water.intake', '_intake_log'),
+    ('medicine_reminder.adherence', '_adherence_log'),
+    ('french_reminder.srs', '_card_store'),
+)
+
+
+@contextlib.contextmanager
+def isolated_storage(db_path):
+    """Все хранилища процесса, включая синглтоны трекеров и курсоры каталога, — во временной базе
+
+    Рабочая база не открывается; после сценария прежние хранилища возвращаются на место.
+    """
+    modules = [(importlib.import_module(name), attr) for name, attr in TRACKER_STORES]
+    saved = [getattr(module, attr) for module, attr in modules]
+    saved_path = storage.DB_PATH
+    saved_catalog = (message_catalog._store, message_catalog._cursors)
+    storage.DB_PATH = db_path
+    for module, attr in modules:
+        setattr(module, attr, None)
+    message_catalog.attach(CursorStore(connect(db_path)))
+    try:
+        yield
+    finally:
+        message_catalog.flush_sync()
+        message_catalog._store, message_catalog._cursors = saved_catalog
+        storage.DB_PATH = saved_path
+        for (module, attr), value in zip(modules, saved):
+            setattr(module, attr, value)
+
+
+class EngineCounters:
+    """Счетчики очереди доставки общие для процесса: сценарий видит только свой прирост"""
+
+    def __init__(self):
+        self.retried = delivery_engine.retried
+        self.sent = delivery_engine.sent
+
+    def delta(self):
+        return {'retried': delivery_engine.retried - self.retried, 'sent': delivery_engine.sent - self.sent}
+
+
+def _slot_when(slots, slot_id):
+    for candidate_id, _, when, _ in slots:
+        if candidate_id == slot_id:
+            return when
+    raise KeyError(slot_id)
+
+
+async def _wait_until(condition, timeout, interval=0.05):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("сценарий не завершился вовремя")
+        await asyncio.sleep(interval)
+
+
+class ReminderPipeline:
+    """Боевой путь напоминаний: диспетчер -> классы приоритета -> outbox -> очередь доставки -> Bot API"""
+
+    def __init__(self, fake, workdir):
+        self.fake = fake
+        self.db_path = os.path.join(workdir, 'bench.db')
+        self.bot = Bot(BENCH_TOKEN, base_url=fake.base_url)
+        self.store = JobStateStore(connect(self.db_path))
+        self.runner = JobRunner()
+        self.dispatcher = Dispatcher(self.runner, self.store)
+        self.outbox = None
+        self.counters = None
+        self._storage = isolated_storage(self.db_path)
+
+    def due_now(self, reminder_type, slots, slot_id, user_ids, planned):
+        """Слот пользователей "пропущен" ровно сейчас — диспетчер запустит его сразу после старта"""
+        when = _slot_when(slots, slot_id)
+        self.store.save([(make_job_id(reminder_type, user_id, slot_id), when, None, planned) for user_id in user_ids])
+
+    async def __aenter__(self):
+        self._storage.__enter__()
+        self.counters = EngineCounters()
+        await self.bot.initialize()
+        await delivery_engine.start()
+        self.outbox = Outbox(connect(self.db_path), delivery_engine)
+        delivery_engine.outbox = self.outbox
+        self.outbox.start(self.bot)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.dispatcher.stop()
+        await self.outbox.stop()
+        delivery_engine.outbox = None
+        await delivery_engine.stop()
+        await self.bot.shutdown()
+        self._storage.__exit__(*exc_info)
+
+    def drained(self):
+        stats = self.runner.stats()
+        if any(state['running'] or state['queued'] for state in stats.values()):
+            return False
+        outbox = self.outbox.stats()
+        return not outbox.get('pending') and not outbox.get('sending') and not delivery_engine.queue_depth()
+
+
+async def water_fanout(users=300, tg_rate=30, retry_after=1, timeout=600):
+    """Ежечасная рассылка о воде N пользователям в один момент"""
+    from lina_water.water_reminder import WATER_SLOTS, setup_water_scheduler, vancouver_tz
+
+    with tempfile.TemporaryDirectory() as workdir:
+        async with FakeTelegramServer(global_rate=tg_rate, retry_after=retry_after) as fake:
+            async with ReminderPipeline(fake, workdir) as pipeline:
+                user_ids = range(1, users + 1)
+                planned = time.time()
+                pipeline.due_now('water', WATER_SLOTS, 'morning', user_ids, planned)
+                for user_id in user_ids:
+                    setup_water_scheduler(pipeline.dispatcher, pipeline.bot, user_id, vancouver_tz)
+
+                started = time.perf_counter()
+                pipeline.dispatcher.start()
+                await _wait_until(lambda: len(fake.state.received) >= users and pipeline.drained(), timeout)
+                duration = time.perf_counter() - started
+
+            latencies = [received.at - planned for received in fake.state.received]
+            return summarize(
+                'water_fanout', {'users': users, 'tg_rate': tg_rate}, latencies, duration,
+                rejected_429=fake.state.rejected, retried=pipeline.counters.delta()['retried']
+            )
+
+
+async def medicine_burst(users=100, water_users=300, tg_rate=30, retry_after=1, timeout=600):
+    """Утренние лекарства N пользователей одновременно с рассылкой о воде (приоритет лекарств)"""
+    from lina_water.water_reminder import WATER_SLOTS, setup_water_scheduler, vancouver_tz
+    from medicine_reminder.medicine_tracker import MEDICINE_SLOTS, helsinki_tz, setup_medicine_scheduler
+
+    with tempfile.TemporaryDirectory() as workdir:
+        async with FakeTelegramServer(global_rate=tg_rate, retry_after=retry_after) as fake:
+            async with ReminderPipeline(fake, workdir) as pipeline:
+                medicine_ids = range(1, users + 1)
+                water_ids = range(SECOND_GROUP_OFFSET, SECOND_GROUP_OFFSET + water_users)
+                planned = time.time()
+                pipeline.due_now('water', WATER_SLOTS, 'morning', water_ids, planned)
+                pipeline.due_now('medicine', MEDICINE_SLOTS, 'morning', medicine_ids, planned)
+                for user_id in water_ids:
+                    setup_water_scheduler(pipeline.dispatcher, pipeline.bot, user_id, vancouver_tz)
+                for user_id in medicine_ids:
+                    setup_medicine_scheduler(pipeline.dispatcher, pipeline.bot, user_id, helsinki_tz)
+
+                total = users + water_users
+                started = time.perf_counter()
+                pipeline.dispatcher.start()
+                await _wait_until(lambda: len(fake.state.received) >= total and pipeline.drained(), timeout)
+                duration = time.perf_counter() - started
+
+            medicine = [r.at - planned for r in fake.state.received if r.chat_id < SECOND_GROUP_OFFSET]
+            water = summarize('water', {}, [r.at - planned for r in fake.state.received
+                                            if r.chat_id >= SECOND_GROUP_OFFSET], duration)
+            return summarize(
+                'medicine_burst', {'users': users, 'water_users': water_users, 'tg_rate': tg_rate},
+                medicine, duration,
+                water_p95=water['p95'], rejected_429=fake.state.rejected,
+                retried=pipeline.counters.delta()['retried']
+            )
+
+
+async def chat_flood(users=50, repeated_share=0.2, first_token_latency=0.3, token_interval=0.02,
+                     tokens=20, tg_rate=0, timeout=600):
+    """Одновременные вопросы N пользователей; часть — одинаковые короткие (попадание в кэш)"""
+    from bot_chat import llm
+    from bot_chat.chat_handler import chat_message
+    from reminder_core.jobs import job_runner
+
+    saved_env = os.environ.get('OPENAI_BASE_URL')
+    saved_llm = (llm.OPENAI_API_KEY, llm._openai_client)
+    with tempfile.TemporaryDirectory() as workdir, isolated_storage(os.path.join(workdir, 'bench.db')):
+        async with FakeTelegramServer(global_rate=tg_rate) as fake, \
+                FakeOpenAIServer(first_token_latency=first_token_latency, token_interval=token_interval,
+                                 tokens=tokens) as fake_openai:
+            try:
+                os.environ['OPENAI_BASE_URL'] = fake_openai.base_url
+                llm.OPENAI_API_KEY = llm.OPENAI_API_KEY or 'bench'
+                # Клиент создается лениво; сбрасываем, чтобы он взял адрес поддельного сервера
+                llm._openai_client = None
+
+                bot = Bot(BENCH_TOKEN, base_url=fake.base_url)
+                await bot.initialize()
+                repeated = int(users * repeated_share)
+                updates = [
+                    Update.de_json(update_payload(index + 1, index + 1,
+                                                  "Привет!" if index < repeated else f"Вопрос номер {index}"), bot)
+                    for index in range(users)
+                ]
+                shed_before = job_runner.stats()[CHAT]['shed']
+
+                async def ask(update):
+                    started = time.perf_counter()
+                    await chat_message(update, None)
+                    return time.perf_counter() - started
+
+                started = time.perf_counter()
+                latencies = await asyncio.wait_for(asyncio.gather(*(ask(update) for update in updates)), timeout)
+                duration = time.perf_counter() - started
+                await bot.shutdown()
+            finally:
+                if saved_env is None:
+                    os.environ.pop('OPENAI_BASE_URL', None)
+                else:
+                    os.environ['OPENAI_BASE_URL'] = saved_env
+                llm.OPENAI_API_KEY, llm._openai_client = saved_llm
+
+    return summarize(
+        'chat_flood', {'users': users, 'repeated_share': repeated_share, 'ttft': first_token_latency},
+        latencies, duration,
+        openai_requests=fake_openai.state.requests, shed=job_runner.stats()[CHAT]['shed'] - shed_before
+    )
+
+
+async def cold_start(repeat=5, timeout=120):
+    """Время импорта agent.py в чистом процессе (то, что пользователь ждет после сна контейнера)"""
+    code = "import time; t = time.perf_counter(); import agent; print(time.perf_counter() - t)"
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, TELEGRAM_TOKEN=BENCH_TOKEN, USER_ID='1',
+                   REMINDER_DB=os.path.join(workdir, 'bench.db'))
+        imports, walls = [], []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run_started = time.perf_counter()
+            process = await asyncio.to_thread(
+                subprocess.run, [sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                capture_output=True, text=True, timeout=timeout
+            )
+            walls.append(time.perf_counter() - run_started)
+            if process.returncode != 0:
+                raise RuntimeError(f"импорт agent завершился ошибкой:\n{process.stderr[-2000:]}")
+            imports.append(float(process.stdout.strip().splitlines()[-1]))
+        duration = time.perf_counter() - started
+    wall = summarize('wall', {}, walls, duration)
+    return summarize('cold_start', {'repeat': repeat}, imports, duration, process_p50=wall['p50'])
+
+
+SCENARIOS = {
+    'water_fanout': water_fanout,
+    'medicine_burst': medicine_burst,
+    'chat_flood': chat_flood,
+    'cold_start': cold_start,
+}
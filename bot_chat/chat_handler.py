@@ -1,26 +1,32 @@
 import os
-import logging
-import random
 import time
-from collections import defaultdict
-from openai import OpenAI
+import asyncio
+import logging
+from datetime import datetime
 from telegram import Update
-from telegram.ext import CommandHandler, ContextTypes
-from dotenv import load_dotenv
+from telegram.constants import ChatAction
+from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
+
+from reminder_core.catalog import message_catalog
+from reminder_core.jobs import CHAT, WorkShed, job_runner
+from reminder_core.logs import bind_log_context, log_ring
+from .llm import OPENAI_MODEL, SYSTEM_PROMPT, build_messages, stream_chat_completion, summarize_conversation
+from .memory import QUESTION_TOKEN_LIMIT, ConversationMemory, truncate_to_tokens
+from .response_cache import response_cache
+from .streaming import StreamingReply
+from .throttle import ADMITTED, BUSY, MERGED, ChatAdmission
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Загрузка переменных окружения
-load_dotenv(dotenv_path='secrets/keys.env')
+# Состояние запросов по пользователям (токены, склейка серий, активные запросы)
+chat_admission = ChatAdmission()
+# Память диалогов с ограниченным бюджетом токенов
+conversation_memory = ConversationMemory()
+_background_tasks = set()
 
-# Получение API ключей
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY не найден в файле .env")
-
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-last_user_request = defaultdict(lambda: 0)
+# Цитаты для /quote: messages/<язык>.json
+message_catalog.register('chat', os.path.join(os.path.dirname(__file__), 'messages'))
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -30,25 +36,157 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("👋 Привет! Просто напиши сообщение, и я постараюсь ответить как умный бот!")
 
 async def quote_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    quotes = [
-        "Не знаешь как поступать? Поступай как знаешь.",
-        "Если заблудился, то иди домой.",
-        "Если тонешь, то плыви к берегу.",
-        "Главное - не паниковать и идти вперед.",
-        "Каждый день - новая возможность стать лучше.",
-        "Успех - это идти от неудачи к неудаче, не теряя энтузиазма.",
-        "Не бойся медленно идти, бойся стоять на месте.",
-        "Лучший способ предсказать будущее - создать его."
-    ]
-    await update.message.reply_text(random.choice(quotes))
-
-async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
-        "🧾 Логи доступны только в Render → Logs → All logs.\n"
-        "Бот работает на Render, поэтому лог-файлы не сохраняются локально."
-    )
-
-def setup_chat_handlers(application):
+    await update.message.reply_text(message_catalog.draw(update.effective_user.id, 'chat.quote'))
+
+LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING,
+              'warn': logging.WARNING, 'error': logging.ERROR, 'critical': logging.CRITICAL}
+LOGS_DEFAULT_LIMIT = 20
+LOGS_MAX_LIMIT = 100
+LOGS_MAX_CHARS = 4000
+
+
+def parse_logs_args(args):
+    """Разбор /logs [уровень] [логгер] [N]: порядок аргументов не важен"""
+    min_level, logger_prefix, limit = logging.INFO, None, LOGS_DEFAULT_LIMIT
+    for arg in args:
+        if arg.lower() in LOG_LEVELS:
+            min_level = LOG_LEVELS[arg.lower()]
+        elif arg.isdigit():
+            limit = min(LOGS_MAX_LIMIT, int(arg))
+        else:
+            logger_prefix = arg
+    return min_level, logger_prefix, limit
+
+
+def format_log_entries(entries):
+    lines = []
+    for entry in entries:
+        fields = " ".join(f"{name}={value}" for name, value in entry.fields.items())
+        line = (f"{datetime.fromtimestamp(entry.created).strftime('%H:%M:%S')} {entry.level[0]} "
+                f"{entry.logger}: {entry.message.splitlines()[0] if entry.message else ''}")
+        lines.append(f"{line} [{fields}]" if fields else line)
+    # Не больше одного сообщения Telegram; при обрезке оставляем самые свежие строки
+    text, total = [], 0
+    for line in reversed(lines):
+        line = line[:500]
+        if total + len(line) + 1 > LOGS_MAX_CHARS:
+            break
+        text.append(line)
+        total += len(line) + 1
+    return "\n".join(reversed(text))
+
+
+def make_logs_command(admin_id):
+    async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Последние записи из кольцевого буфера логов (только для администратора)"""
+        if update.effective_user.id != admin_id:
+            await update.message.reply_text("⛔ Команда доступна только администратору")
+            return
+        min_level, logger_prefix, limit = parse_logs_args(context.args or [])
+        entries = log_ring.query(min_level, logger_prefix, limit)
+        if not entries:
+            counts = ", ".join(f"{level}: {count}" for level, count in log_ring.counts().items())
+            await update.message.reply_text(f"🧾 Подходящих записей нет. В буфере: {counts or 'пусто'}")
+            return
+        await update.message.reply_text(format_log_entries(entries))
+
+    return logs_command
+
+async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    conversation_memory.forget(update.effective_user.id)
+    await update.message.reply_text("🧹 Начнем разговор с чистого листа!")
+
+async def chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ответ на свободный текст потоковой генерацией с постепенной правкой сообщения"""
+    if update.message is None:
+        # Правка уже отправленного сообщения — не новый вопрос
+        return
+    user = update.effective_user
+    username = user.username or "NoUsername"
+    bind_log_context(user_id=user.id)
+    logger.info(f"[{username} | ID: {user.id}] -> {update.message.text}")
+
+    # Быстрая серия сообщений склеивается в один запрос к модели
+    status, question = await chat_admission.admit(user.id, update.message.text)
+    if status == MERGED:
+        return
+    if status == BUSY:
+        await update.message.reply_text("⏳ Я еще отвечаю на предыдущее сообщение, подожди немного.")
+        return
+    if status != ADMITTED:
+        await update.message.reply_text(
+            f"⏳ Слишком много сообщений подряд. Попробуй через {chat_admission.retry_in(user.id)} с."
+        )
+        return
+
+    question = truncate_to_tokens(question, QUESTION_TOKEN_LIMIT)
+    logger.info(f"User question: {question}")
+    from_cache = False
+    try:
+        # Чат — самый низкий приоритет: при нагрузке напоминания идут первыми
+        from_cache = await job_runner.submit(CHAT, answer_question, update, question, job_id=f"chat:{user.id}")
+    except WorkShed as e:
+        logger.warning(f"Запрос чата от {user.id} отброшен: {e}")
+        await update.message.reply_text("⏳ Сейчас много работы, повтори вопрос через минутку.")
+    except asyncio.TimeoutError:
+        logger.error(f"Ответ для {user.id} не уложился в таймаут")
+        await update.message.reply_text("😔 Ответ занял слишком много времени, попробуй спросить короче.")
+    finally:
+        # Ответ из кэша не стоит запроса к API — токен возвращаем
+        chat_admission.release(user.id, refund=from_cache)
+
+
+async def answer_question(update, question):
+    """Ответ на вопрос; возвращает True, если ответ взят из кэша"""
+    user_id = update.effective_user.id
+    started = time.perf_counter()
+
+    # Повторяющиеся короткие вопросы (приветствия, FAQ) отдаем из кэша,
+    # но только вне диалога — с историей ответ зависит от контекста
+    cache_key = None
+    if not conversation_memory.has_context(user_id):
+        cache_key = response_cache.make_key(OPENAI_MODEL, SYSTEM_PROMPT, question)
+    # Такой же вопрос уже генерируется для другого пользователя — ждем его ответ
+    cached = response_cache.get(cache_key) or await response_cache.wait(cache_key)
+    if cached:
+        await update.message.reply_text(cached)
+        conversation_memory.add_exchange(user_id, question, cached)
+        logger.info(f"Cached response: {cached}", extra={'latency': round(time.perf_counter() - started, 4)})
+        return True
+
+    summary, history = conversation_memory.context(user_id)
+    response_cache.begin(cache_key)
+    answer = None
+    reply = StreamingReply(update.message)
+    try:
+        await update.message.chat.send_action(ChatAction.TYPING)
+        async for fragment in stream_chat_completion(build_messages(question, summary, history)):
+            await reply.append(fragment)
+        await reply.finish()
+        answer = reply.text.strip()
+        conversation_memory.add_exchange(user_id, question, answer)
+        if conversation_memory.needs_compaction(user_id):
+            # Сводка строится в фоне и не задерживает ответ
+            task = asyncio.create_task(conversation_memory.compact(user_id, summarize_conversation))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        logger.info(f"OpenAI response: {reply.text}", extra={'latency': round(time.perf_counter() - started, 4)})
+    except Exception as e:
+        logger.error(f"Ошибка OpenAI для {update.effective_user.id}: {e}")
+        await update.message.reply_text("😔 Не получилось ответить, попробуй еще раз чуть позже.")
+    finally:
+        # И при ошибке, и при отмене по таймауту ожидающие не должны зависнуть
+        response_cache.finish(cache_key, answer)
+    return False
+
+
+def setup_chat_handlers(application, admin_id=None):
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("quote", quote_command))
-    application.add_handler(CommandHandler("logs", logs_command))
\ No newline at end of file
+    application.add_handler(CommandHandler("logs", make_logs_command(admin_id)))
+    application.add_handler(CommandHandler("reset", reset_command))
+    # block=False: длинная генерация не задерживает другие обновления и напоминания;
+    # только новые сообщения — правки (edited_message) не вызывают повторный ответ
+    application.add_handler(MessageHandler(
+        filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND, chat_message, block=False
+    ))
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+from dotenv import load_dotenv
+
+from reminder_core.metrics import ERRORS, OPENAI_LATENCY, OPENAI_TTFT
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Загрузка переменных окружения
+load_dotenv(dotenv_path='secrets/keys.env')
+
+# Получение API ключей
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+SYSTEM_PROMPT = "Ты дружелюбный и полезный ассистент в Telegram. Отвечай кратко и по делу."
+
+_openai_client = None
+
+
+def get_openai_client():
+    """Клиент OpenAI создается при первом запросе: импорт openai не замедляет холодный старт"""
+    global _openai_client
+    if _openai_client is None:
+        if not OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY не найден в файле .env")
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
+
+SUMMARY_PROMPT = (
+    "Сожми диалог в краткую сводку (до 5 предложений) на языке диалога: "
+    "факты о пользователе, темы и договоренности. Без вступлений."
+)
+
+
+def build_messages(user_text, summary="", history=()):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if summary:
+        messages.append({"role": "system", "content": f"Сводка предыдущего разговора:\n{summary}"})
+    messages.extend(history)
+    messages.append({"role": "user", "content": user_text})
+    return messages
+
+
+async def summarize_conversation(previous_summary, turns):
+    """Скользящая сводка: прежняя сводка + вытесняемые реплики -> новая сводка"""
+    lines = []
+    if previous_summary:
+        lines.append(f"Прежняя сводка:\n{previous_summary}\n")
+    for role, text in turns:
+        lines.append(f"{'Пользователь' if role == 'user' else 'Ассистент'}: {text}")
+    started = time.perf_counter()
+    try:
+        response = await get_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": "\n".join(lines)},
+            ],
+            max_tokens=200
+        )
+    except Exception as e:
+        ERRORS.labels('openai', type(e).__name__).inc()
+        raise
+    OPENAI_LATENCY.labels('summary').observe(time.perf_counter() - started)
+    return response.choices[0].message.content or previous_summary
+
+
+async def stream_chat_completion(messages):
+    """Асинхронный поток фрагментов ответа модели"""
+    started = time.perf_counter()
+    first_token = True
+    try:
+        stream = await get_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            stream=True
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    first_token = False
+                    OPENAI_TTFT.observe(time.perf_counter() - started)
+                yield delta
+    except Exception as e:
+        ERRORS.labels('openai', type(e).__name__).inc()
+        raise
+    OPENAI_LATENCY.labels('chat').observe(time.perf_counter() - started)
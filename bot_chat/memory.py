@@ -0,0 +1,178 @@
+import time
+import logging
+from collections import deque
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Бюджет контекста на один запрос (история + сводка), в токенах
+CONTEXT_TOKEN_BUDGET = 1200
+SUMMARY_TOKEN_LIMIT = 250
+QUESTION_TOKEN_LIMIT = 1000
+# Сколько реплик храним дословно (кольцевой буфер)
+MAX_TURNS = 16
+# Неактивные диалоги забываются
+IDLE_TTL = 6 * 3600
+SWEEP_INTERVAL = 600
+# Служебные токены на каждое сообщение в формате chat completions
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """Грубая оценка числа токенов (кириллица ~3 символа на токен)"""
+    return len(text) // 3 + MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text, tokens):
+    max_chars = max(0, (tokens - MESSAGE_OVERHEAD) * 3)
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+class Conversation:
+    """Память одного пользователя: последние реплики дословно + сводка более старых"""
+    __slots__ = ('turns', 'summary', 'last_active', 'compacting', 'folded')
+
+    def __init__(self):
+        self.turns = deque(maxlen=MAX_TURNS)
+        self.summary = ""
+        self.last_active = time.monotonic()
+        self.compacting = False
+        # Реплики, ушедшие в запасную сводку, пока шло сжатие
+        self.folded = []
+
+    def tokens(self):
+        return sum(tokens for _, _, tokens in self.turns)
+
+
+class ConversationMemory:
+    """Ограниченная память диалогов с бюджетом токенов и скользящей сводкой"""
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, idle_ttl=IDLE_TTL):
+        self.budget = budget
+        self.idle_ttl = idle_ttl
+        self._conversations = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def has_context(self, user_id):
+        conversation = self._conversations.get(user_id)
+        return bool(conversation and (conversation.turns or conversation.summary))
+
+    def context(self, user_id):
+        """Сводка и реплики, умещающиеся в бюджет (новые реплики в приоритете)"""
+        self._sweep()
+        conversation = self._conversations.get(user_id)
+        if conversation is None:
+            return "", []
+        conversation.last_active = time.monotonic()
+        remaining = self.budget
+        summary = conversation.summary
+        if summary:
+            remaining -= estimate_tokens(summary)
+        history = []
+        for role, text, tokens in reversed(conversation.turns):
+            if tokens > remaining:
+                break
+            history.append({"role": role, "content": text})
+            remaining -= tokens
+        history.reverse()
+        return summary, history
+
+    def add_exchange(self, user_id, question, answer):
+        conversation = self._conversations.get(user_id)
+        if conversation is None:
+            conversation = self._conversations[user_id] = Conversation()
+        if len(conversation.turns) >= MAX_TURNS - 1:
+            # Буфер полон, а сжатие еще идет: самые старые реплики сразу уходят в сводку
+            oldest = self._pop_oldest(conversation, 2)
+            if conversation.compacting:
+                conversation.folded.extend(oldest)
+            self._fold_into_summary(conversation, oldest)
+        conversation.turns.append(("user", question, estimate_tokens(question)))
+        conversation.turns.append(("assistant", answer, estimate_tokens(answer)))
+        conversation.last_active = time.monotonic()
+
+    def needs_compaction(self, user_id):
+        conversation = self._conversations.get(user_id)
+        if conversation is None or conversation.compacting:
+            return False
+        return conversation.tokens() > self.budget or len(conversation.turns) >= MAX_TURNS - 2
+
+    async def compact(self, user_id, summarize):
+        """Сжатие старых реплик в сводку, пока дословная часть не уложится в половину бюджета и буфера
+
+        summarize(previous_summary, turns) -> новая сводка (корутина, обычно запрос к модели).
+        Пока идет запрос, реплики остаются в буфере; после успеха сводка подменяется и реплики
+        удаляются без await между этими шагами. При ошибке или отмене не меняется ничего.
+        """
+        conversation = self._conversations.get(user_id)
+        if conversation is None or conversation.compacting:
+            return
+        old_turns = self._compactable(conversation)
+        if not old_turns:
+            return
+        conversation.compacting = True
+        conversation.folded = []
+        try:
+            summary = await summarize(conversation.summary, [(role, text) for role, text, _ in old_turns])
+        except Exception as e:
+            logger.error(f"Ошибка при сжатии диалога {user_id}: {e}")
+        else:
+            compacted = {id(turn) for turn in old_turns}
+            while conversation.turns and id(conversation.turns[0]) in compacted:
+                conversation.turns.popleft()
+            # Реплики, которые запасная сводка успела забрать сверх сжатых, дописываются к новой сводке
+            extra = [turn for turn in conversation.folded if id(turn) not in compacted]
+            conversation.summary = truncate_to_tokens(summary.strip(), SUMMARY_TOKEN_LIMIT)
+            if extra:
+                self._fold_into_summary(conversation, extra)
+        finally:
+            conversation.compacting = False
+            conversation.folded = []
+
+    def _compactable(self, conversation):
+        """Самые старые реплики, без которых дословная часть укладывается в половину бюджета и буфера"""
+        tokens, count = conversation.tokens(), len(conversation.turns)
+        old_turns = []
+        for turn in conversation.turns:
+            if tokens <= self.budget // 2 and count <= MAX_TURNS // 2:
+                break
+            old_turns.append(turn)
+            tokens -= turn[2]
+            count -= 1
+        return old_turns
+
+    def forget(self, user_id):
+        return self._conversations.pop(user_id, None) is not None
+
+    @staticmethod
+    def _pop_oldest(conversation, count):
+        return [conversation.turns.popleft() for _ in range(min(count, len(conversation.turns)))]
+
+    @staticmethod
+    def _fold_into_summary(conversation, turns):
+        """Запасной вариант без модели: первые строки старых реплик добавляются к сводке"""
+        lines = [conversation.summary] if conversation.summary else []
+        for role, text, _ in turns:
+            prefix = "Пользователь" if role == "user" else "Ассистент"
+            lines.append(f"{prefix}: {text.splitlines()[0] if text else ''}")
+        # Обрезаем с начала: свежие реплики важнее
+        summary = "\n".join(lines)
+        max_chars = (SUMMARY_TOKEN_LIMIT - MESSAGE_OVERHEAD) * 3
+        conversation.summary = summary[-max_chars:]
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        stale = [
+            user_id for user_id, conversation in self._conversations.items()
+            if not conversation.compacting and now - conversation.last_active > self.idle_ttl
+        ]
+        for user_id in stale:
+            del self._conversations[user_id]
+        if stale:
+            logger.debug(f"Забыто неактивных диалогов: {len(stale)}")
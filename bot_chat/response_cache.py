@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+
+from reminder_core.storage import write_json_atomic
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки кэша ответов
+CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '1000'))
+CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', str(24 * 3600)))
+CACHE_FILE = os.getenv('CHAT_CACHE_FILE')  # например data/chat_cache.json; не задан — кэш только в памяти
+# Длинные уникальные вопросы почти не повторяются — кэшируем только короткие
+CACHE_MAX_PROMPT_LENGTH = 200
+
+
+def normalize_prompt(text):
+    """Нормализация вопроса: регистр, пробелы и пунктуация не влияют на ключ"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return ' '.join(text.split())
+
+
+class ResponseCache:
+    """LRU-кэш ответов модели с TTL на запись и счетчиками попаданий
+
+    Одинаковые вопросы, пришедшие одновременно, не идут в модель по отдельности:
+    первый запрос отмечается через begin(), остальные ждут его ответ через wait().
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, path=CACHE_FILE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._dirty = False
+        # Ответы, которые сейчас генерируются: ключ -> future с текстом (None при ошибке)
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def make_key(model, system_prompt, text):
+        """Ключ = модель + системный промпт + нормализованный вопрос, либо None если не кэшируем"""
+        normalized = normalize_prompt(text)
+        if not normalized or len(normalized) > CACHE_MAX_PROMPT_LENGTH:
+            return None
+        raw = f"{model}\x00{system_prompt}\x00{normalized}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, response):
+        if key is None or not response:
+            return
+        self._entries[key] = (time.time() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def begin(self, key):
+        """Отметка, что ответ на ключ генерируется; повторные вопросы подождут его в wait()"""
+        if key is None or key in self._pending:
+            return
+        self._pending[key] = asyncio.get_running_loop().create_future()
+
+    def finish(self, key, response):
+        """Ответ сгенерирован (или None при ошибке): сохраняем и будим ожидающих"""
+        future = self._pending.pop(key, None)
+        self.set(key, response)
+        if future is not None and not future.done():
+            future.set_result(response or None)
+
+    async def wait(self, key):
+        """Ответ на такой же вопрос, который уже генерируется, или None если ждать нечего"""
+        future = self._pending.get(key) if key is not None else None
+        if future is None:
+            return None
+        # shield: отмена ожидающего не должна отменять общий future для остальных
+        response = await asyncio.shield(future)
+        if response:
+            self.shared += 1
+        return response
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def load(self):
+        """Загрузка сохраненного кэша (просроченные записи отбрасываются)"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            now = time.time()
+            for key, expires_at, response in stored[-self.max_entries:]:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, response)
+            logger.info(f"Кэш ответов загружен: {len(self._entries)} записей")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке кэша ответов: {e}")
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        try:
+            stored = [[key, expires_at, response] for key, (expires_at, response) in self._entries.items()]
+            write_json_atomic(self.path, stored, indent=None)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении кэша ответов: {e}")
+
+
+response_cache = ResponseCache()
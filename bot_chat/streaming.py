@@ -0,0 +1,72 @@
+import time
+import asyncio
+import logging
+from telegram.error import BadRequest, RetryAfter
+
+from reminder_core.delivery import retry_after_seconds
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Telegram ограничивает частоту правок и длину сообщения
+EDIT_INTERVAL = 1.0
+MAX_MESSAGE_LENGTH = 4096
+CURSOR = " ▌"
+
+
+def split_text(text, limit=MAX_MESSAGE_LENGTH):
+    """Разбиение длинного ответа на части по границам строк"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text:
+        parts.append(text)
+    return parts
+
+
+class StreamingReply:
+    """Ответ, который постепенно дописывается правками одного сообщения"""
+
+    def __init__(self, message, edit_interval=EDIT_INTERVAL):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.reply = None
+        self.text = ""
+        self._shown = ""
+        self._last_edit = 0.0
+
+    async def append(self, fragment):
+        self.text += fragment
+        if time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._show(self.text[:MAX_MESSAGE_LENGTH - len(CURSOR)] + CURSOR)
+
+    async def finish(self):
+        """Финальный текст без курсора; хвост длинного ответа — отдельными сообщениями"""
+        parts = split_text(self.text.strip()) or ["🤷 Пустой ответ"]
+        await self._show(parts[0], final=True)
+        for part in parts[1:]:
+            await self.message.reply_text(part)
+
+    async def _show(self, text, final=False):
+        if text == self._shown:
+            return
+        self._last_edit = time.monotonic()
+        try:
+            if self.reply is None:
+                self.reply = await self.message.reply_text(text)
+            else:
+                await self.reply.edit_text(text)
+            self._shown = text
+        except RetryAfter as e:
+            # Промежуточную правку можно пропустить, финальную — повторяем после паузы
+            logger.warning(f"Правка сообщения отложена Telegram: {e}")
+            if final:
+                await asyncio.sleep(retry_after_seconds(e))
+                await self._show(text, final=True)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
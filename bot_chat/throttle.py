@@ -0,0 +1,127 @@
+import time
+import asyncio
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки допуска запросов к модели
+REQUESTS_PER_MINUTE = 6
+BURST = 3
+DEBOUNCE = 0.8
+MAX_IN_FLIGHT = 1
+IDLE_TTL = 3600
+SWEEP_INTERVAL = 300
+
+# Результаты допуска
+ADMITTED = 'admitted'
+MERGED = 'merged'
+THROTTLED = 'throttled'
+BUSY = 'busy'
+
+
+class UserBucket:
+    """Состояние одного пользователя: токены, накопленная пачка сообщений, активные запросы"""
+    __slots__ = ('tokens', 'updated', 'pending', 'last_message', 'collecting', 'in_flight')
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.pending = []
+        self.last_message = 0.0
+        self.collecting = False
+        self.in_flight = 0
+
+
+class ChatAdmission:
+    """Допуск сообщений к модели: склейка быстрых серий, токен-бакет и лимит активных запросов"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST, debounce=DEBOUNCE,
+                 max_in_flight=MAX_IN_FLIGHT, idle_ttl=IDLE_TTL):
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.debounce = debounce
+        self.max_in_flight = max_in_flight
+        self.idle_ttl = idle_ttl
+        self.users = {}
+        self._last_sweep = time.monotonic()
+        self.merged = 0
+        self.throttled = 0
+
+    def _bucket(self, user_id):
+        bucket = self.users.get(user_id)
+        if bucket is None:
+            bucket = self.users[user_id] = UserBucket(self.burst)
+        return bucket
+
+    def _refill(self, bucket, now):
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+
+    def retry_in(self, user_id):
+        """Через сколько секунд у пользователя появится следующий токен"""
+        bucket = self.users.get(user_id)
+        if bucket is None or bucket.tokens >= 1:
+            return 0
+        return int((1 - bucket.tokens) / self.rate) + 1
+
+    async def admit(self, user_id, text):
+        """Возвращает (статус, текст); при ADMITTED текст — вся склеенная серия сообщений"""
+        self._sweep()
+        bucket = self._bucket(user_id)
+        bucket.pending.append(text)
+        bucket.last_message = time.monotonic()
+        if bucket.collecting:
+            # Серия уже собирается первым сообщением — это станет его частью
+            self.merged += 1
+            return MERGED, None
+
+        bucket.collecting = True
+        try:
+            while True:
+                wait = bucket.last_message + self.debounce - time.monotonic()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            merged_text = "\n".join(bucket.pending)
+            bucket.pending.clear()
+        finally:
+            bucket.collecting = False
+
+        if bucket.in_flight >= self.max_in_flight:
+            return BUSY, merged_text
+
+        now = time.monotonic()
+        self._refill(bucket, now)
+        if bucket.tokens < 1:
+            self.throttled += 1
+            return THROTTLED, merged_text
+        bucket.tokens -= 1
+        bucket.in_flight += 1
+        return ADMITTED, merged_text
+
+    def release(self, user_id, refund=False):
+        """Завершение запроса, допущенного через admit(); refund возвращает токен (ответ из кэша)"""
+        bucket = self.users.get(user_id)
+        if bucket is None:
+            return
+        if bucket.in_flight > 0:
+            bucket.in_flight -= 1
+        if refund:
+            bucket.tokens = min(self.burst, bucket.tokens + 1)
+
+    def _sweep(self):
+        """Удаление давно неактивных пользователей, чтобы словарь не рос бесконечно"""
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        stale = [
+            user_id for user_id, bucket in self.users.items()
+            if not bucket.collecting and not bucket.in_flight
+            and now - max(bucket.last_message, bucket.updated) > self.idle_ttl
+        ]
+        for user_id in stale:
+            del self.users[user_id]
+        if stale:
+            logger.debug(f"Удалено неактивных пользователей из лимитера: {len(stale)}")
@@ -1,5 +1,6 @@
 import asyncio
-from agent import main
+from agent import main, ROLE_WEB
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Веб-процесс только принимает вебхуки; напоминания рассылает лидер-воркер с тем же REMINDER_DB
+    asyncio.run(main(role=ROLE_WEB))
\ No newline at end of file
@@ -0,0 +1,343 @@
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from collections import namedtuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+
+from reminder_core.storage import connect
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+# SM-2: начальная и минимальная легкость, интервалы первых повторений (дни)
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVALS = (1, 6)
+# Забытая карточка возвращается в ту же сессию через 10 минут
+RELEARN_DELAY = 10 * 60
+# Размер пакета вставки при импорте колоды
+IMPORT_BATCH = 1000
+STARTER_DECK = os.path.join(os.path.dirname(__file__), 'decks', 'tfsl_basics.tsv')
+DECK_EXTENSIONS = ('tsv', 'csv', 'txt', 'jsonl')
+# Сколько ждать файл после /deck import
+IMPORT_WAIT = 10 * 60
+
+CALLBACK_PREFIX = 'fr:'
+# Оценки ответа: (кнопка, качество SM-2)
+GRADES = (("🔁 Снова", 1), ("😓 Трудно", 3), ("🙂 Хорошо", 4), ("😎 Легко", 5))
+
+# Карточка: интервал в днях, due — UTC timestamp следующего показа
+Card = namedtuple('Card', ['card_id', 'user_id', 'deck', 'front', 'back', 'ease', 'interval', 'repetitions',
+                           'lapses', 'due'])
+
+# Индекс (user_id, due): "следующие N к повторению" — поиск по B-дереву и N шагов, размер колоды не важен
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS french_cards (
+    card_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    deck TEXT NOT NULL,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    ease REAL NOT NULL,
+    interval REAL NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    due REAL NOT NULL,
+    UNIQUE (user_id, deck, front)
+);
+CREATE INDEX IF NOT EXISTS idx_french_cards_due ON french_cards (user_id, due);
+"""
+
+
+def _row_to_card(row):
+    return Card(row['card_id'], row['user_id'], row['deck'], row['front'], row['back'], row['ease'],
+                row['interval'], row['repetitions'], row['lapses'], row['due'])
+
+
+def sm2(card, quality, now=None):
+    """Новое состояние карточки после ответа с качеством 0-5 (алгоритм SM-2)"""
+    now = now or time.time()
+    ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return card._replace(ease=ease, interval=0, repetitions=0, lapses=card.lapses + 1,
+                             due=now + RELEARN_DELAY)
+    repetitions = card.repetitions + 1
+    if repetitions <= len(FIRST_INTERVALS):
+        interval = FIRST_INTERVALS[repetitions - 1]
+    else:
+        interval = round(card.interval * ease)
+    return card._replace(ease=ease, interval=interval, repetitions=repetitions, due=now + interval * DAY)
+
+
+def parse_deck(lines):
+    """Потоковый разбор колоды: строки 'лицо<TAB>оборот' (или через ';' / ','), либо JSON-строки
+
+    Принимает любой итератор строк (открытый файл) и выдает пары (лицо, оборот),
+    не держа файл в памяти целиком. Пустые строки и строки с '#' пропускаются.
+    """
+    lines = (line for line in lines if line.strip() and not line.lstrip().startswith('#'))
+    first = next(lines, None)
+    if first is None:
+        return
+    if first.lstrip().startswith('{'):
+        for line in _chain(first, lines):
+            item = json.loads(line)
+            yield item['front'].strip(), item['back'].strip()
+        return
+    delimiter = '\t' if '\t' in first else ';' if ';' in first else ','
+    for row in csv.reader(_chain(first, lines), delimiter=delimiter):
+        if len(row) >= 2 and row[0].strip() and row[1].strip():
+            yield row[0].strip(), row[1].strip()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+class CardStore:
+    """Карточки всех пользователей в SQLite с индексом по сроку повторения"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def add_cards(self, user_id, deck, pairs, now=None):
+        """Пакетная вставка (лицо, оборот); повторы в колоде пропускаются. Возвращает число новых"""
+        now = now or time.time()
+        added, batch = 0, []
+        for front, back in pairs:
+            batch.append((user_id, deck, front, back, INITIAL_EASE, now))
+            if len(batch) >= IMPORT_BATCH:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, batch):
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO french_cards (user_id, deck, front, back, ease, due) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            return self.conn.total_changes - before
+
+    def get(self, card_id):
+        row = self.conn.execute("SELECT * FROM french_cards WHERE card_id = ?", (card_id,)).fetchone()
+        return _row_to_card(row) if row else None
+
+    def due_cards(self, user_id, limit=1, now=None):
+        """Ближайшие limit карточек, срок которых наступил"""
+        rows = self.conn.execute(
+            "SELECT * FROM french_cards WHERE user_id = ? AND due <= ? ORDER BY due LIMIT ?",
+            (user_id, now or time.time(), limit)
+        )
+        return [_row_to_card(row) for row in rows]
+
+    def due_count(self, user_id, now=None):
+        row = self.conn.execute(
+            "SELECT COUNT(*) AS total FROM french_cards WHERE user_id = ? AND due <= ?",
+            (user_id, now or time.time())
+        ).fetchone()
+        return row['total']
+
+    def total(self, user_id):
+        row = self.conn.execute("SELECT COUNT(*) AS total FROM french_cards WHERE user_id = ?",
+                                (user_id,)).fetchone()
+        return row['total']
+
+    def review(self, card, quality, now=None):
+        """Оценка ответа: новое расписание карточки по SM-2
+
+        Применяется, только если карточка в базе не изменилась с момента чтения (тот же due);
+        повторное нажатие той же кнопки возвращает None и расписание не трогает.
+        """
+        updated = sm2(card, quality, now)
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE french_cards SET ease = ?, interval = ?, repetitions = ?, lapses = ?, due = ? "
+                "WHERE card_id = ? AND due = ?",
+                (updated.ease, updated.interval, updated.repetitions, updated.lapses, updated.due, card.card_id,
+                 card.due)
+            )
+        return updated if cursor.rowcount else None
+
+
+def import_deck(store, user_id, path, deck=None):
+    """Импорт файла колоды построчно; имя колоды по умолчанию — имя файла"""
+    deck = deck or os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        added = store.add_cards(user_id, deck, parse_deck(f))
+    logger.info(f"Колода {deck} ({user_id}): добавлено карточек {added}")
+    return deck, added
+
+
+_card_store = None
+
+
+def get_card_store():
+    """Карточки на общей базе напоминаний (соединение открывается при первом обращении)"""
+    global _card_store
+    if _card_store is None:
+        _card_store = CardStore(connect())
+    return _card_store
+
+
+def _show_keyboard(card_id):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("👀 Показать ответ", callback_data=f"{CALLBACK_PREFIX}show:{card_id}")
+    ]])
+
+
+def _review_stamp(card):
+    """Отметка состояния карточки в кнопках оценки: после оценки due меняется, и старые кнопки не действуют"""
+    return str(int(card.due))
+
+
+def _grade_keyboard(card):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(label, callback_data=f"{CALLBACK_PREFIX}grade:{card.card_id}:{quality}:"
+                                                  f"{_review_stamp(card)}")
+        for label, quality in GRADES
+    ]])
+
+
+def _deck_request(args):
+    """Имя колоды из аргументов '/deck import [имя]' ('' — имя файла) или None, если это не импорт"""
+    if not args or args[0].lower() != 'import':
+        return None
+    return ' '.join(args[1:])
+
+
+def format_interval(card):
+    if card.interval == 0:
+        return f"через {RELEARN_DELAY // 60} мин"
+    return "завтра" if card.interval == 1 else f"через {int(card.interval)} дн."
+
+
+def setup_french_handlers(application, card_store=None):
+    """Режим повторения: /quiz, кнопки оценки и импорт колоды файлом (.tsv, .csv, .txt, .jsonl)
+
+    Файл импортируется только по запросу: после /deck import [имя] или с подписью "/deck import [имя]";
+    остальные документы бот не трогает.
+    """
+    # user_id -> (имя колоды, до какого момента ждем файл)
+    import_requests = {}
+
+    def store():
+        return card_store or get_card_store()
+
+    async def send_next_card(message, user_id):
+        cards_store = store()
+        cards = cards_store.due_cards(user_id, 1)
+        if not cards and not cards_store.total(user_id):
+            deck, added = await asyncio.to_thread(import_deck, cards_store, user_id, STARTER_DECK)
+            await message.reply_text(f"📦 Добавлена стартовая колода {deck}: {added} карточек")
+            cards = cards_store.due_cards(user_id, 1)
+        if not cards:
+            await message.reply_text("🎉 Все карточки на сегодня повторены! Возвращайся завтра")
+            return
+        card = cards[0]
+        due = cards_store.due_count(user_id)
+        await message.reply_text(f"🇫🇷 {card.front}\n\n(осталось: {due})", reply_markup=_show_keyboard(card.card_id))
+
+    async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await send_next_card(update.message, update.effective_user.id)
+
+    async def card_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        user_id = query.from_user.id
+        action, *params = query.data[len(CALLBACK_PREFIX):].split(':')
+        card = store().get(int(params[0]))
+        if card is None or card.user_id != user_id:
+            await query.answer("Карточка не найдена")
+            return
+        if action == 'show':
+            await query.answer()
+            await query.edit_message_text(f"🇫🇷 {card.front}\n\n🇷🇺 {card.back}\n\nКак вспомнилось?",
+                                          reply_markup=_grade_keyboard(card))
+            return
+        # Кнопки старой сессии или второе нажатие: карточка уже оценена
+        if len(params) > 2 and params[2] != _review_stamp(card):
+            await query.answer("Оценка уже учтена")
+            return
+        card = store().review(card, int(params[1]))
+        if card is None:
+            await query.answer("Оценка уже учтена")
+            return
+        await query.answer(f"Следующий показ {format_interval(card)}")
+        await query.edit_message_text(f"🇫🇷 {card.front}\n\n🇷🇺 {card.back}\n\n⏭ {format_interval(card)}")
+        await send_next_card(query.message, user_id)
+
+    async def deck_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        deck = _deck_request(context.args)
+        if deck is None:
+            await update.message.reply_text("Использование: /deck import [имя колоды], затем пришли файл "
+                                            f"({', '.join('.' + extension for extension in DECK_EXTENSIONS)})")
+            return
+        import_requests[user_id] = (deck, time.monotonic() + IMPORT_WAIT)
+        logger.info(f"[ID: {user_id}] /deck import {deck}")
+        await update.message.reply_text(f"📥 Жду файл колоды в течение {IMPORT_WAIT // 60} мин")
+
+    async def deck_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.message
+        user_id = update.effective_user.id
+        caption = (message.caption or '').split()
+        if caption and caption[0].split('@')[0].lower() == '/deck':
+            deck = _deck_request(caption[1:])
+        else:
+            deck, expires = import_requests.pop(user_id, (None, 0))
+            if expires < time.monotonic():
+                deck = None
+        if deck is None:
+            return
+        document = message.document
+        file = await document.get_file()
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, os.path.basename(document.file_name or 'deck.tsv'))
+            await file.download_to_drive(path)
+            try:
+                deck, added = await asyncio.to_thread(import_deck, store(), user_id, path, deck or None)
+            except (ValueError, KeyError, UnicodeDecodeError, csv.Error) as e:
+                logger.warning(f"[ID: {user_id}] Колода {document.file_name} не разобрана: {e}")
+                await message.reply_text(f"❌ Не удалось разобрать колоду: {e}")
+                return
+        await message.reply_text(f"✅ Колода {deck}: добавлено {added} карточек. Начать: /quiz")
+
+    deck_files = filters.Document.FileExtension(DECK_EXTENSIONS[0])
+    for extension in DECK_EXTENSIONS[1:]:
+        deck_files = deck_files | filters.Document.FileExtension(extension)
+    application.add_handler(CommandHandler("quiz", quiz_command))
+    application.add_handler(CommandHandler("deck", deck_command))
+    application.add_handler(CallbackQueryHandler(card_callback, pattern=rf"^{CALLBACK_PREFIX}(show|grade):"))
+    application.add_handler(MessageHandler(deck_files, deck_document))
+
+
+def main(argv=None):
+    """python -m french_reminder.srs <user_id> <файл колоды> [имя колоды]"""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print(main.__doc__)
+        return 2
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    started = time.perf_counter()
+    deck, added = import_deck(get_card_store(), int(argv[0]), argv[1], argv[2] if len(argv) > 2 else None)
+    print(f"{deck}: добавлено {added} карточек за {time.perf_counter() - started:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
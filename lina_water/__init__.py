@@ -1,15 +1,6 @@
 """
 Модуль напоминания о воде для Лины
-"""
-
-from .water_reminder import (
-    setup_water_scheduler,
-    send_water_reminder,
-    test_water_reminder,
-)
 
-_all_ = [
-    'setup_water_scheduler',
-    'send_water_reminder',
-    'test_water_reminder',
-]
\ No newline at end of file
+Трекер (water_reminder) загружается реестром плагинов только при подписке;
+кнопки и /water — в intake, без импорта трекера.
+"""
@@ -0,0 +1,180 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from collections import namedtuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
+
+from reminder_core.storage import connect
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Один стакан по кнопке и дневная цель
+GLASS_ML = 250
+# Объемы, которые принимает кнопка: callback_data приходит от клиента, остальное отбрасываем
+GLASS_SIZES = (GLASS_ML,)
+DAILY_TARGET_ML = 2000
+# Активные часы: цель распределяется по ним равномерно
+DAY_START_HOUR = 7
+DAY_END_HOUR = 22
+# Напоминание не нужно, если пользователь пил недавно и идет не хуже графика
+RECENT_WINDOW = 45 * 60
+
+CALLBACK_PREFIX = 'water:drink:'
+
+# Итог дня: сумма и число отметок
+DailyTotal = namedtuple('DailyTotal', ['day', 'total_ml', 'entries'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS water_intake (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    amount_ml INTEGER NOT NULL,
+    logged_at REAL NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_water_intake_user_time ON water_intake (user_id, logged_at);
+CREATE TABLE IF NOT EXISTS water_daily (
+    user_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    total_ml INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    last_at REAL NOT NULL,
+    PRIMARY KEY (user_id, day)
+);
+"""
+
+
+def intake_keyboard(amount_ml=GLASS_ML):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(f"💧 Я выпила {amount_ml} мл", callback_data=f"{CALLBACK_PREFIX}{amount_ml}")
+    ]])
+
+
+def expected_by(local_now, target_ml=DAILY_TARGET_ML):
+    """Сколько по графику должно быть выпито к этому времени"""
+    hours = local_now.hour + local_now.minute / 60
+    share = (hours - DAY_START_HOUR) / (DAY_END_HOUR - DAY_START_HOUR)
+    return int(target_ml * min(1.0, max(0.0, share)))
+
+
+class IntakeLog:
+    """Журнал выпитой воды: записи только добавляются, итоги дня ведутся инкрементально
+
+    Каждая отметка в одной транзакции дописывается в water_intake и прибавляется
+    к строке water_daily, поэтому статистика дня и недели читается по ключу без пересчета.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def record(self, user_id, amount_ml, tz, at=None):
+        """Новая отметка; возвращает итог дня после нее"""
+        at = at or time.time()
+        day = datetime.fromtimestamp(at, tz).date().isoformat()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO water_intake (user_id, amount_ml, logged_at, day) VALUES (?, ?, ?, ?)",
+                (user_id, amount_ml, at, day)
+            )
+            self.conn.execute(
+                "INSERT INTO water_daily (user_id, day, total_ml, entries, last_at) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (user_id, day) DO UPDATE SET total_ml = total_ml + excluded.total_ml, "
+                "entries = entries + 1, last_at = MAX(last_at, excluded.last_at)",
+                (user_id, day, amount_ml, at)
+            )
+        return self.daily(user_id, day)
+
+    def daily(self, user_id, day):
+        row = self.conn.execute(
+            "SELECT total_ml, entries FROM water_daily WHERE user_id = ? AND day = ?", (user_id, day)
+        ).fetchone()
+        return DailyTotal(day, row['total_ml'], row['entries']) if row else DailyTotal(day, 0, 0)
+
+    def week(self, user_id, today):
+        """Итоги за 7 дней по today включительно (от старых к новым)"""
+        days = [(today - timedelta(days=offset)).isoformat() for offset in range(6, -1, -1)]
+        rows = self.conn.execute(
+            "SELECT day, total_ml, entries FROM water_daily WHERE user_id = ? AND day BETWEEN ? AND ?",
+            (user_id, days[0], days[-1])
+        )
+        found = {row['day']: DailyTotal(row['day'], row['total_ml'], row['entries']) for row in rows}
+        return [found.get(day, DailyTotal(day, 0, 0)) for day in days]
+
+    def suppress_reason(self, user_id, tz, now=None, target_ml=DAILY_TARGET_ML):
+        """Причина не отправлять напоминание: 'target', 'on_track' или None (отправлять)"""
+        now = now or time.time()
+        local_now = datetime.fromtimestamp(now, tz)
+        day = local_now.date().isoformat()
+        row = self.conn.execute(
+            "SELECT total_ml, last_at FROM water_daily WHERE user_id = ? AND day = ?", (user_id, day)
+        ).fetchone()
+        if row is None:
+            return None
+        if row['total_ml'] >= target_ml:
+            return 'target'
+        if now - row['last_at'] < RECENT_WINDOW and row['total_ml'] >= expected_by(local_now, target_ml):
+            return 'on_track'
+        return None
+
+
+_intake_log = None
+
+
+def get_intake_log():
+    """Журнал на общей базе напоминаний (соединение открывается при первом обращении)"""
+    global _intake_log
+    if _intake_log is None:
+        _intake_log = IntakeLog(connect())
+    return _intake_log
+
+
+def format_stats(user_id, tz, intake_log=None, target_ml=DAILY_TARGET_ML):
+    intake_log = intake_log or get_intake_log()
+    today = datetime.now(tz).date()
+    week = intake_log.week(user_id, today)
+    total = sum(day.total_ml for day in week)
+    reached = sum(day.total_ml >= target_ml for day in week)
+    lines = [f"💧 Сегодня: {week[-1].total_ml} / {target_ml} мл ({week[-1].entries} отметок)", "",
+             "📅 Неделя:"]
+    for day in week:
+        mark = "✅" if day.total_ml >= target_ml else "▫️"
+        lines.append(f"   {mark} {datetime.fromisoformat(day.day).strftime('%d.%m')}: {day.total_ml} мл")
+    lines.append(f"\nВ среднем: {total // 7} мл в день, цель выполнена {reached}/7")
+    return "\n".join(lines)
+
+
+def setup_water_handlers(application, timezone_for, intake_log=None):
+    """Кнопка "Я выпила" под напоминаниями и команда /water со статистикой
+
+    timezone_for(user_id) — часовой пояс пользователя (граница дня для итогов).
+    """
+
+    async def drink_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        user_id = query.from_user.id
+        amount_ml = int(query.data[len(CALLBACK_PREFIX):])
+        if amount_ml not in GLASS_SIZES:
+            logger.warning(f"[ID: {user_id}] неизвестный объем в кнопке воды: {query.data}")
+            await query.answer("Неизвестный объем")
+            return
+        tz = timezone_for(user_id)
+        # Запись в SQLite — вне цикла событий, как в outbox
+        daily = await asyncio.to_thread((intake_log or get_intake_log()).record, user_id, amount_ml, tz)
+        logger.info(f"[ID: {user_id}] выпила {amount_ml} мл, за день {daily.total_ml} мл")
+        done = " 🎉 Цель дня выполнена!" if daily.total_ml >= DAILY_TARGET_ML else ""
+        await query.answer(f"+{amount_ml} мл. Сегодня: {daily.total_ml} / {DAILY_TARGET_ML} мл{done}")
+
+    async def water_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        await update.message.reply_text(
+            format_stats(user_id, timezone_for(user_id), intake_log), reply_markup=intake_keyboard()
+        )
+
+    application.add_handler(CallbackQueryHandler(drink_callback, pattern=rf"^{CALLBACK_PREFIX}\d+$"))
+    application.add_handler(CommandHandler("water", water_command))
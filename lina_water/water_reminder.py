@@ -1,9 +1,13 @@
+import os
 import random
 import logging
 from datetime import datetime
-from apscheduler.triggers.cron import CronTrigger
 import pytz
-import asyncio
+
+from reminder_core.catalog import message_catalog
+from reminder_core.delivery import send_message
+from reminder_core.metrics import metrics
+from .intake import get_intake_log, intake_keyboard
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -11,84 +15,62 @@ logger = logging.getLogger(__name__)
 # Временная зона
 vancouver_tz = pytz.timezone('America/Vancouver')
 
+SUPPRESSED = metrics.counter('water_reminders_suppressed_total',
+                             'Напоминания о воде, пропущенные из-за недавней отметки', ('reason',))
+
+# Тексты напоминаний: messages/<язык>.json
+message_catalog.register('water', os.path.join(os.path.dirname(__file__), 'messages'))
+
+
+def get_water_reminder(user_id=None):
+    """Следующее напоминание о воде из колоды пользователя"""
+    return message_catalog.draw(user_id, 'water.reminder')
+
+
+def get_motivational_water_message(user_id=None):
+    """Напоминание о воде с фактом"""
+    return message_catalog.render(user_id, 'water.with_fact')
+
+
+def is_suppressed(user_id, tz):
+    """Пропустить ли напоминание: цель дня выполнена или пользователь пил недавно"""
+    try:
+        reason = get_intake_log().suppress_reason(user_id, tz)
+    except Exception as e:
+        logger.error(f"Ошибка чтения журнала воды: {e}")
+        return False
+    if reason is None:
+        return False
+    SUPPRESSED.labels(reason).inc()
+    logger.info(f"Напоминание о воде пропущено ({user_id}): {reason}")
+    return True
+
 
-def get_water_reminder():
-    """Получение случайного напоминания о воде"""
-    water_quotes = [
-        "💧 Пить нужно часто! Глотни водички 😊",
-        "🌊 А не засохнешь? Время попить воды!",
-        "💦 Твой организм просит воды! Не забывай пить",
-        "🥤 Гидратация - это важно! Выпей стаканчик воды",
-        "💧 Вода - источник жизни! Время освежиться",
-        "🌊 Почки скажут спасибо за стакан воды!",
-        "💦 Кожа будет благодарна за глоток воды",
-        "🥛 Не дай себе засохнуть! Пей больше воды",
-        "💧 Время водной паузы! Выпей немного воды",
-        "🌊 Вода помогает мозгу работать лучше! Попей",
-        "💦 Маленький глоток - большая польза!",
-        "🥤 Помни: 8 стаканов в день - это норма!",
-        "💧 Каждая клеточка твоего тела просит воды!",
-        "🌊 Выпей воды и почувствуй прилив энергии!",
-        "💦 Водичка поможет коже сиять! ✨",
-        "🥛 Глоток воды = забота о себе 💕",
-        "💧 Не забывай: ты на 60% состоишь из воды!",
-        "🌊 Время гидратации! Твой организм скажет спасибо",
-        "💦 Вода - лучший напиток для красоты и здоровья!",
-        "🥤 Маленький перерыв на воду - большая польза!",
-        "💧 Пей воду и будь здоровой! 🌸",
-        "🌊 Каждый глоток воды - инвестиция в здоровье!",
-        "💦 Время освежиться! Попей водички 😌",
-        "🥛 Вода - твой лучший друг для хорошего самочувствия!"
-    ]
-    return random.choice(water_quotes)
-
-
-def get_motivational_water_message():
-    """Получение мотивационного сообщения о воде с фактами"""
-    facts = [
-        "💧 Факт: Даже 2% обезвоживания может снизить концентрацию на 30%!",
-        "🌊 Знала ли ты? Вода помогает выводить токсины через почки!",
-        "💦 Интересно: Достаточное количество воды улучшает настроение!",
-        "🥤 Факт: Вода ускоряет метаболизм на 30% в течение часа!",
-        "💧 Знала ли ты? Недостаток воды - частая причина усталости!",
-        "🌊 Факт: Кожа на 64% состоит из воды - пей для красоты!",
-        "💦 Интересно: Мозг на 75% состоит из воды!",
-        "🥛 Факт: Вода помогает суставам оставаться здоровыми!"
-    ]
-
-    reminder = get_water_reminder()
-    fact = random.choice(facts)
-
-    return f"{reminder}\n\n{fact}"
-
-
-async def send_water_reminder(bot, user_id):
+async def send_water_reminder(bot, user_id, tz=vancouver_tz):
     """Отправка напоминания о воде"""
     try:
         # Случайно выбираем обычное или мотивационное сообщение
         if random.random() < 0.3:  # 30% шанс на мотивационное сообщение
-            message = get_motivational_water_message()
+            message = get_motivational_water_message(user_id)
         else:
-            message = get_water_reminder()
+            message = get_water_reminder(user_id)
 
-        await bot.send_message(chat_id=user_id, text=message)
-        current_time = datetime.now(vancouver_tz)
+        await send_message(bot, user_id, message, reply_markup=intake_keyboard())
+        current_time = datetime.now(tz)
         logger.info(f"Напоминание о воде отправлено в {current_time}")
 
     except Exception as e:
         logger.error(f"Ошибка при отправке напоминания о воде: {e}")
 
 
-async def send_special_water_reminder(bot, user_id):
+async def send_special_water_reminder(bot, user_id, tz=vancouver_tz):
     """Специальное напоминание о воде в определенное время"""
-    special_messages = [
-        "🌅 Доброе утро! Начни день со стакана воды! 💧",
-        "☀️ Обеденное время! Не забудь про водичку! 🥤",
-        "🌇 Вечер - время расслабиться с чашкой травяного чая или воды! 💦",
-        "🌙 Перед сном - последний глоток воды для хорошего сна! 😴"
-    ]
+    if is_suppressed(user_id, tz):
+        return
+    # Тексты по времени суток: утро, день, вечер, ночь
+    special_messages = message_catalog.pool('water.special')
 
-    current_hour = datetime.now(vancouver_tz).hour
+    current_hour = datetime.now(tz).hour
 
     if 6 <= current_hour < 12:
         message = special_messages[0]  # Утро
@@ -100,89 +82,38 @@ async def send_special_water_reminder(bot, user_id):
         message = special_messages[3]  # Ночь
 
     try:
-        await bot.send_message(chat_id=user_id, text=message)
+        await send_message(bot, user_id, message, reply_markup=intake_keyboard())
         logger.info(f"Специальное напоминание о воде отправлено: {current_hour}:00")
     except Exception as e:
         logger.error(f"Ошибка при отправке специального напоминания: {e}")
 
 
-def should_send_reminder():
-    """Определение, нужно ли отправлять напоминание (исключаем ночные часы)"""
-    current_hour = datetime.now(vancouver_tz).hour
-    # Отправляем напоминания только с 7:00 до 22:00
-    return 7 <= current_hour <= 22
+async def hourly_water_check(bot, user_id, tz=vancouver_tz):
+    """Проверка каждый час - отправлять ли напоминание
 
-
-async def hourly_water_check(bot, user_id):
-    """Проверка каждый час - отправлять ли напоминание"""
-    if should_send_reminder():
-        await send_water_reminder(bot, user_id)
-    else:
-        logger.info("Ночное время - напоминание о воде пропущено")
-
-
-# Обёртки для планировщика
-def hourly_water_wrapper(bot, user_id):
-    """Синхронная обёртка для ежечасного напоминания"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(hourly_water_check(bot, user_id))
-    finally:
-        loop.close()
+    Ночные часы и тихие часы пользователя отсекает сам слот: в это время задача не запускается.
+    """
+    if is_suppressed(user_id, tz):
+        return
+    await send_water_reminder(bot, user_id, tz)
 
 
-def special_water_wrapper(bot, user_id):
-    """Синхронная обёртка для специального напоминания"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(send_special_water_reminder(bot, user_id))
-    finally:
-        loop.close()
+# Слоты напоминаний: (ID слота, обработчик, время, название)
+WATER_SLOTS = [
+    # Основные ежечасные напоминания (с 7:00 до 22:00)
+    ('hourly', hourly_water_check, {'hour': '7-22', 'minute': 0}, 'Ежечасное напоминание о воде'),
+    # Специальные напоминания в ключевые моменты дня
+    ('morning', send_special_water_reminder, {'hour': 7, 'minute': 30}, 'Утреннее напоминание о воде'),
+    ('lunch', send_special_water_reminder, {'hour': 12, 'minute': 30}, 'Обеденное напоминание о воде'),
+    ('evening', send_special_water_reminder, {'hour': 18, 'minute': 30}, 'Вечернее напоминание о воде'),
+]
 
 
-def setup_water_scheduler(scheduler, bot, user_id):
+def setup_water_scheduler(scheduler, bot, user_id, tz=vancouver_tz, schedule=None):
     """Настройка планировщика для напоминаний о воде"""
+    scheduler.add_slots('water', WATER_SLOTS, bot, user_id, tz, schedule)
 
-    # Основные ежечасные напоминания (с 7:00 до 22:00)
-    scheduler.add_job(
-        hourly_water_wrapper,
-        CronTrigger(minute=0, timezone=vancouver_tz),
-        args=[bot, user_id],
-        id='hourly_water_reminder',
-        name='Ежечасное напоминание о воде'
-    )
-
-    # Специальные напоминания в ключевые моменты дня
-    # Утреннее напоминание (7:30)
-    scheduler.add_job(
-        special_water_wrapper,
-        CronTrigger(hour=7, minute=30, timezone=vancouver_tz),
-        args=[bot, user_id],
-        id='morning_water_reminder',
-        name='Утреннее напоминание о воде'
-    )
-
-    # Обеденное напоминание (12:30)
-    scheduler.add_job(
-        special_water_wrapper,
-        CronTrigger(hour=12, minute=30, timezone=vancouver_tz),
-        args=[bot, user_id],
-        id='lunch_water_reminder',
-        name='Обеденное напоминание о воде'
-    )
-
-    # Вечернее напоминание (18:30)
-    scheduler.add_job(
-        special_water_wrapper,
-        CronTrigger(hour=18, minute=30, timezone=vancouver_tz),
-        args=[bot, user_id],
-        id='evening_water_reminder',
-        name='Вечернее напоминание о воде'
-    )
-
-    logger.info("Планировщик напоминаний о воде настроен:")
+    logger.info(f"Планировщик напоминаний о воде настроен ({user_id}, {tz}):")
     logger.info("- Ежечасно с 7:00 до 22:00")
     logger.info("- Специальные: 7:30, 12:30, 18:30")
 
@@ -1,16 +1,7 @@
 # medicine_reminder/__init__.py
 """
 Модуль напоминаний о лекарствах для мамы
-"""
-
-from .medicine_tracker import (
-    setup_medicine_scheduler,
-    send_medicine_reminder,
-    test_medicine_reminder
-)
 
-__all__ = [
-    'setup_medicine_scheduler',
-    'send_medicine_reminder',
-    'test_medicine_reminder'
-]
+Трекер (medicine_tracker) загружается реестром плагинов только при подписке;
+кнопка "Приняла ✅", журнал приема и /meds — в adherence, без импорта трекера.
+"""
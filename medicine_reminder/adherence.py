@@ -0,0 +1,195 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from collections import namedtuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
+
+from reminder_core.storage import connect
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Приемы лекарств за день (порядок — для истории "✅✅❌")
+DOSES = ('morning', 'afternoon', 'evening')
+DOSE_LABELS = {'morning': 'утренний', 'afternoon': 'дневной', 'evening': 'вечерний'}
+
+CALLBACK_PREFIX = 'med:taken:'
+
+# Прием лекарства: время напоминания, повторного напоминания, подтверждения и эскалации (UTC timestamp)
+Dose = namedtuple('Dose', ['user_id', 'day', 'dose', 'sent_at', 'followup_at', 'taken_at', 'escalated_at'])
+
+# Одна строка на прием без rowid: ~40 байт, около тысячи строк в год на пользователя
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS medicine_doses (
+    user_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    dose TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    followup_at REAL,
+    taken_at REAL,
+    escalated_at REAL,
+    PRIMARY KEY (user_id, day, dose)
+) WITHOUT ROWID;
+"""
+
+
+def taken_keyboard(day, dose):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("Приняла ✅", callback_data=f"{CALLBACK_PREFIX}{day}:{dose}")
+    ]])
+
+
+def _row_to_dose(row):
+    return Dose(row['user_id'], row['day'], row['dose'], row['sent_at'], row['followup_at'],
+                row['taken_at'], row['escalated_at'])
+
+
+class AdherenceLog:
+    """История приема лекарств: каждая доза — отслеживаемое событие"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def open_dose(self, user_id, day, dose, at=None):
+        """Напоминание о дозе отправлено; повторное открытие не сбрасывает подтверждение"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO medicine_doses (user_id, day, dose, sent_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, day, dose) DO NOTHING",
+                (user_id, day, dose, at or time.time())
+            )
+        return self.get(user_id, day, dose)
+
+    def get(self, user_id, day, dose):
+        row = self.conn.execute(
+            "SELECT * FROM medicine_doses WHERE user_id = ? AND day = ? AND dose = ?", (user_id, day, dose)
+        ).fetchone()
+        return _row_to_dose(row) if row else None
+
+    def mark_followup(self, user_id, day, dose, at=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE medicine_doses SET followup_at = ? WHERE user_id = ? AND day = ? AND dose = ?",
+                (at or time.time(), user_id, day, dose)
+            )
+
+    def mark_escalated(self, user_id, day, dose, at=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE medicine_doses SET escalated_at = ? WHERE user_id = ? AND day = ? AND dose = ?",
+                (at or time.time(), user_id, day, dose)
+            )
+
+    def acknowledge(self, user_id, day, dose, at=None):
+        """Подтверждение приема; False — доза уже была подтверждена (повторное нажатие)"""
+        at = at or time.time()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO medicine_doses (user_id, day, dose, sent_at, taken_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, day, dose) DO UPDATE SET taken_at = excluded.taken_at "
+                "WHERE medicine_doses.taken_at IS NULL",
+                (user_id, day, dose, at, at)
+            )
+        return cursor.rowcount > 0
+
+    def pending(self, user_id, since_day):
+        """Неподтвержденные дозы без эскалации (для восстановления задач после рестарта)"""
+        rows = self.conn.execute(
+            "SELECT * FROM medicine_doses WHERE user_id = ? AND day >= ? "
+            "AND taken_at IS NULL AND escalated_at IS NULL",
+            (user_id, since_day)
+        )
+        return [_row_to_dose(row) for row in rows]
+
+    def history(self, user_id, today, days=7):
+        """{день: {доза: Dose}} за последние days дней"""
+        first = (today - timedelta(days=days - 1)).isoformat()
+        rows = self.conn.execute(
+            "SELECT * FROM medicine_doses WHERE user_id = ? AND day BETWEEN ? AND ?",
+            (user_id, first, today.isoformat())
+        )
+        history = {}
+        for row in rows:
+            history.setdefault(row['day'], {})[row['dose']] = _row_to_dose(row)
+        return history
+
+
+_adherence_log = None
+
+
+def get_adherence_log():
+    """Журнал на общей базе напоминаний (соединение открывается при первом обращении)"""
+    global _adherence_log
+    if _adherence_log is None:
+        _adherence_log = AdherenceLog(connect())
+    return _adherence_log
+
+
+def dose_mark(dose):
+    if dose is None:
+        return "▫️"
+    if dose.taken_at is not None:
+        return "✅"
+    return "❌" if dose.escalated_at is not None else "⏳"
+
+
+def format_history(user_id, tz, days=7, adherence_log=None):
+    """Строки вида '18.10 ✅✅⏳' и доля подтвержденных доз"""
+    adherence_log = adherence_log or get_adherence_log()
+    today = datetime.now(tz).date()
+    history = adherence_log.history(user_id, today, days)
+    lines, sent, taken = [], 0, 0
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        doses = history.get(day.isoformat(), {})
+        sent += len(doses)
+        taken += sum(dose.taken_at is not None for dose in doses.values())
+        lines.append(f"   {day.strftime('%d.%m')} {''.join(dose_mark(doses.get(name)) for name in DOSES)}")
+    share = f"{taken * 100 // sent}%" if sent else "—"
+    return "\n".join(lines) + f"\nПодтверждено: {taken} из {sent} ({share})"
+
+
+def setup_medicine_handlers(application, timezone_for, on_taken=None, adherence_log=None):
+    """Кнопка "Приняла ✅" под напоминаниями и команда /meds с историей приема
+
+    on_taken(user_id, day, dose) — отмена запланированных повторов в этом процессе (если он лидер);
+    лидер в другом процессе увидит подтверждение в базе в момент повтора.
+    Нажатия под сообщениями прошедших дней игнорируются: день уже закрыт.
+    """
+
+    async def taken_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        user_id = query.from_user.id
+        day, dose = query.data[len(CALLBACK_PREFIX):].split(':', 1)
+        if day < datetime.now(timezone_for(user_id)).date().isoformat():
+            await query.answer("Этот день уже закрыт")
+            return
+        first = (adherence_log or get_adherence_log()).acknowledge(user_id, day, dose)
+        if on_taken is not None:
+            on_taken(user_id, day, dose)
+        if not first:
+            await query.answer("Уже отмечено ✅")
+            return
+        logger.info(f"[ID: {user_id}] подтвердила прием: {day} {dose}")
+        await query.answer("Спасибо! Прием отмечен ✅")
+        if query.message is None:
+            return
+        taken_time = datetime.now(timezone_for(user_id)).strftime('%H:%M')
+        try:
+            await query.edit_message_text(f"{query.message.text}\n\n✅ Принято в {taken_time}")
+        except Exception as e:
+            logger.debug(f"Не удалось обновить сообщение о лекарствах: {e}")
+
+    async def meds_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        await update.message.reply_text(
+            "💊 Прием лекарств за неделю (утро, день, вечер):\n"
+            + format_history(user_id, timezone_for(user_id), adherence_log=adherence_log)
+        )
+
+    application.add_handler(CallbackQueryHandler(taken_callback, pattern=rf"^{CALLBACK_PREFIX}[\d-]+:\w+$"))
+    application.add_handler(CommandHandler("meds", meds_command))
@@ -1,9 +1,15 @@
+import os
+import time
 import random
 import logging
-from datetime import datetime
-from apscheduler.triggers.cron import CronTrigger
+from datetime import datetime, timedelta
 import pytz
-import asyncio
+
+from reminder_core.catalog import message_catalog
+from reminder_core.delivery import send_message
+from reminder_core.jobs import make_job_id, priority_for
+from reminder_core.metrics import metrics
+from .adherence import DOSE_LABELS, format_history, get_adherence_log, taken_keyboard
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -11,192 +17,219 @@ logger = logging.getLogger(__name__)
 # Временная зона
 helsinki_tz = pytz.timezone('Europe/Helsinki')
 
+# Тексты напоминаний: messages/<язык>.json
+message_catalog.register('medicine', os.path.join(os.path.dirname(__file__), 'messages'))
+
+# Повтор, если доза не подтверждена, и сколько после повтора ждать перед сводкой опекуну
+FOLLOWUP_DELAY = 30 * 60
+ESCALATION_WINDOW = 60 * 60
+
+
+def load_caregivers(environ=os.environ):
+    """Опекуны подопечных: {user_id подопечного: user_id опекуна}
+
+    MEDICINE_CAREGIVERS="подопечный:опекун,..."; по умолчанию — мама (MOTHER_USER_ID) и администратор
+    (USER_ID). Остальные подписчики /subscribe medicine получают повторы, но без сводки опекуну.
+    MEDICINE_CAREGIVER_DIGEST=0 — выключить сводки совсем.
+    """
+    if environ.get("MEDICINE_CAREGIVER_DIGEST", "1") == "0":
+        return {}
+    mapping = environ.get("MEDICINE_CAREGIVERS")
+    if mapping is None:
+        mother, admin = environ.get("MOTHER_USER_ID"), environ.get("USER_ID")
+        mapping = f"{mother}:{admin}" if mother and admin else ""
+    caregivers = {}
+    for pair in filter(None, (item.strip() for item in mapping.split(','))):
+        user_id, caregiver_id = (int(value) for value in pair.split(':'))
+        if caregiver_id != user_id:
+            caregivers[user_id] = caregiver_id
+    return caregivers
+
+
+CAREGIVERS = load_caregivers()
 
-def get_medicine_reminder():
+FOLLOWUPS = metrics.counter('medicine_followups_total', 'Повторные напоминания о лекарствах', ('outcome',))
+ESCALATIONS = metrics.counter('medicine_escalations_total', 'Сводки опекуну о неподтвержденных дозах')
+
+# Диспетчер, в котором планируются повторы (задается при настройке трекера)
+_scheduler = None
+
+
+def get_medicine_reminder(user_id=None):
     """Получение напоминания о лекарствах"""
-    medicine_reminders = [
-        "💊 Мамочка, время принять лекарства! Не забывай о своем здоровье ❤️",
-        "🩺 Напоминание: пора принять препараты! Твое здоровье важно 💕",
-        "💊 Время лекарств! Береги себя, дорогая мама 🌸",
-        "🩺 Не забудь про таблетки! Здоровье - это главное 💖",
-        "💊 Мама, пора принять лекарства! Заботься о себе 🤗",
-        "🩺 Время препаратов! Твое самочувствие очень важно ❤️",
-        "💊 Напоминание о лекарствах! Будь здорова, мамуля 💐",
-        "🩺 Пора принять таблетки! Береги свое здоровье 🌺",
-        "💊 Время лечения! Не пропускай прием лекарств 💝",
-        "🩺 Мамочка, твои препараты ждут! Заботься о себе 🌹"
-    ]
-    return random.choice(medicine_reminders)
-
-
-def get_motivational_medicine_message():
+    return message_catalog.draw(user_id, 'medicine.reminder')
+
+
+def get_motivational_medicine_message(user_id=None):
     """Получение мотивационного сообщения о важности лекарств"""
-    motivational_messages = [
-        "💊 Регулярный прием лекарств - залог хорошего самочувствия! 🌟\nТвое здоровье бесценно ❤️",
-        "🩺 Каждая таблетка - это забота о твоем будущем! 💖\nПродолжай заботиться о себе 🌸",
-        "💊 Постоянство в лечении приводит к отличным результатам! 🎯\nТы молодец, что следишь за здоровьем! 💕",
-        "🩺 Твое здоровье - это подарок всей семье! 🎁\nСпасибо, что заботишься о себе ❤️",
-        "💊 Регулярность - ключ к успешному лечению! 🗝️\nПродолжай в том же духе! 🌺",
-    ]
-    return random.choice(motivational_messages)
+    return message_catalog.draw(user_id, 'medicine.motivational')
 
 
-def get_health_tips():
+def get_health_tips(user_id=None):
     """Получение полезных советов о здоровье"""
-    health_tips = [
-        "💡 Совет: принимай лекарства в одно и то же время для лучшего эффекта!",
-        "💡 Помни: запивай таблетки достаточным количеством воды!",
-        "💡 Совет: веди дневник приема лекарств - это поможет врачу!",
-        "💡 Важно: не пропускай прием, даже если чувствуешь себя хорошо!",
-        "💡 Помни: если есть вопросы о лекарствах - обращайся к врачу!",
-        "💡 Совет: храни препараты в прохладном сухом месте!",
-        "💡 Важно: проверяй срок годности лекарств регулярно!"
-    ]
-    return random.choice(health_tips)
-
-
-async def send_medicine_reminder(bot, user_id):
+    return message_catalog.draw(user_id, 'medicine.tip')
+
+
+def get_followup_message(user_id=None):
+    """Обычное напоминание: 70% короткое, 30% с мотивацией или советом"""
+    if random.random() < 0.7:
+        return get_medicine_reminder(user_id)
+    if random.random() < 0.5:
+        return get_motivational_medicine_message(user_id)
+    return message_catalog.render(user_id, 'medicine.with_tip')
+
+
+async def send_medicine_reminder(bot, user_id, tz=helsinki_tz):
     """Отправка обычного напоминания о лекарствах"""
     try:
-        # 70% обычное напоминание, 30% с мотивацией или советом
-        if random.random() < 0.7:
-            message = get_medicine_reminder()
-        else:
-            if random.random() < 0.5:
-                message = get_motivational_medicine_message()
-            else:
-                base_reminder = get_medicine_reminder()
-                tip = get_health_tips()
-                message = f"{base_reminder}\n\n{tip}"
-
-        await bot.send_message(chat_id=user_id, text=message)
-        current_time = datetime.now(helsinki_tz)
+        await send_message(bot, user_id, get_followup_message(user_id))
+        current_time = datetime.now(tz)
         logger.info(f"Напоминание о лекарствах отправлено в {current_time}")
 
     except Exception as e:
         logger.error(f"Ошибка при отправке напоминания о лекарствах: {e}")
 
 
-async def send_morning_medicine_reminder(bot, user_id):
-    """Утреннее напоминание о лекарствах"""
-    morning_messages = [
-        "🌅 Доброе утро, мамочка! Начни день с заботы о здоровье - прими утренние лекарства! ☀️💊",
-        "🌄 Утро - лучшее время для заботы о себе! Не забудь про препараты! 💕",
-        "☀️ Новый день начинается с заботы о здоровье! Время утренних лекарств! 🌸",
-        "🌅 Доброе утро! Пусть день начнется с правильной заботы о себе! 💊❤️"
-    ]
+def _dose_message(user_id, dose):
+    if dose == 'morning':
+        return message_catalog.draw(user_id, 'medicine.morning')
+    if dose == 'evening':
+        return message_catalog.draw(user_id, 'medicine.evening')
+    return get_followup_message(user_id)
 
-    try:
-        message = random.choice(morning_messages)
-        await bot.send_message(chat_id=user_id, text=message)
-        logger.info("Утреннее напоминание о лекарствах отправлено")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке утреннего напоминания: {e}")
 
+def _job_id(user_id, day, dose, stage):
+    # День в ID: повтор вчерашней дозы не заменяет и не отменяет сегодняшний
+    return make_job_id('medicine', user_id, f"{day}_{dose}_{stage}")
 
-async def send_evening_medicine_reminder(bot, user_id):
-    """Вечернее напоминание о лекарствах"""
-    evening_messages = [
-        "🌆 Вечер - время позаботиться о здоровье! Прими вечерние лекарства! 💊✨",
-        "🌙 Заверши день заботой о себе - время вечерних препаратов! 💕",
-        "🌇 Вечернее напоминание: твое здоровье в твоих руках! 💊🌟",
-        "🌆 Пусть вечер пройдет с пользой для здоровья! Время лекарств! ❤️"
-    ]
 
-    try:
-        message = random.choice(evening_messages)
-        await bot.send_message(chat_id=user_id, text=message)
-        logger.info("Вечернее напоминание о лекарствах отправлено")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке вечернего напоминания: {e}")
+def _schedule(coro_func, at, bot, user_id, tz, day, dose, stage):
+    if _scheduler is None:
+        return
+    _scheduler.add_once(
+        coro_func, datetime.fromtimestamp(at, pytz.utc), args=(bot, user_id, tz, day, dose),
+        job_id=_job_id(user_id, day, dose, stage), name=f"Лекарства: {stage} {dose} {day} ({user_id})",
+        priority=priority_for('medicine')
+    )
 
 
-# Обёртки для планировщика
-def medicine_reminder_wrapper(bot, user_id):
-    """Синхронная обёртка для обычного напоминания"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(send_medicine_reminder(bot, user_id))
-    finally:
-        loop.close()
+async def send_dose_reminder(dose, bot, user_id, tz=helsinki_tz):
+    """Напоминание о дозе с кнопкой подтверждения; повтор планируется только на случай без ответа"""
+    day = datetime.now(tz).date().isoformat()
+    record = get_adherence_log().open_dose(user_id, day, dose)
+    if record.taken_at is not None:
+        logger.info(f"Доза {dose} ({user_id}) уже подтверждена — напоминание не нужно")
+        return
+    await send_message(bot, user_id, _dose_message(user_id, dose), reply_markup=taken_keyboard(day, dose))
+    _schedule(send_followup_reminder, record.sent_at + FOLLOWUP_DELAY, bot, user_id, tz, day, dose, 'followup')
+    logger.info(f"Напоминание о лекарствах ({dose}) отправлено, повтор через {FOLLOWUP_DELAY // 60} мин")
+
+
+async def send_followup_reminder(bot, user_id, tz, day, dose):
+    """Повтор, если доза так и не подтверждена"""
+    adherence_log = get_adherence_log()
+    record = adherence_log.get(user_id, day, dose)
+    if record is None or record.taken_at is not None:
+        FOLLOWUPS.labels('cancelled').inc()
+        logger.info(f"Повтор о дозе {dose} ({user_id}) не нужен — прием подтвержден")
+        return
+    await send_message(bot, user_id, get_followup_message(user_id), reply_markup=taken_keyboard(day, dose))
+    adherence_log.mark_followup(user_id, day, dose)
+    FOLLOWUPS.labels('sent').inc()
+    logger.info(f"Повторное напоминание о лекарствах ({dose}) отправлено")
+    if user_id in CAREGIVERS:
+        _schedule(check_dose_escalation, time.time() + ESCALATION_WINDOW, bot, user_id, tz, day, dose, 'escalation')
+
+
+async def check_dose_escalation(bot, user_id, tz, day, dose):
+    """Сводка опекуну, если доза не подтверждена и после повтора"""
+    caregiver_id = CAREGIVERS.get(user_id)
+    adherence_log = get_adherence_log()
+    record = adherence_log.get(user_id, day, dose)
+    if caregiver_id is None or record is None or record.taken_at is not None:
+        return
+    adherence_log.mark_escalated(user_id, day, dose)
+    ESCALATIONS.inc()
+    text = (
+        f"⚠️ {DOSE_LABELS.get(dose, dose).capitalize()} прием лекарств ({day}) у {user_id} не подтвержден.\n\n"
+        f"💊 За неделю (утро, день, вечер):\n{format_history(user_id, tz, adherence_log=adherence_log)}"
+    )
+    await send_message(bot, caregiver_id, text)
+    logger.warning(f"Доза {dose} ({user_id}, {day}) не подтверждена — сводка отправлена опекуну")
 
 
-def morning_medicine_wrapper(bot, user_id):
-    """Синхронная обёртка для утреннего напоминания"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(send_morning_medicine_reminder(bot, user_id))
-    finally:
-        loop.close()
+def cancel_followups(user_id, day, dose):
+    """Отмена запланированных повтора и эскалации дозы этого дня (доза подтверждена)"""
+    if _scheduler is not None:
+        for stage in ('followup', 'escalation'):
+            _scheduler.remove_job(_job_id(user_id, day, dose, stage))
 
 
-def evening_medicine_wrapper(bot, user_id):
-    """Синхронная обёртка для вечернего напоминания"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+async def send_morning_medicine_reminder(bot, user_id, tz=helsinki_tz):
+    """Утреннее напоминание о лекарствах"""
     try:
-        loop.run_until_complete(send_evening_medicine_reminder(bot, user_id))
-    finally:
-        loop.close()
+        await send_dose_reminder('morning', bot, user_id, tz)
+    except Exception as e:
+        logger.error(f"Ошибка при отправке утреннего напоминания: {e}")
 
 
-def setup_medicine_scheduler(scheduler, bot, user_id):
-    """Настройка планировщика для напоминаний о лекарствах"""
+async def send_afternoon_medicine_reminder(bot, user_id, tz=helsinki_tz):
+    """Дневное напоминание о лекарствах"""
+    try:
+        await send_dose_reminder('afternoon', bot, user_id, tz)
+    except Exception as e:
+        logger.error(f"Ошибка при отправке дневного напоминания: {e}")
 
-    # Утренние напоминания
-    # 8:00 - основное утреннее напоминание
-    scheduler.add_job(
-        morning_medicine_wrapper,
-        CronTrigger(hour=8, minute=0, timezone=helsinki_tz),
-        args=[bot, user_id],
-        id='morning_medicine_reminder',
-        name='Утреннее напоминание о лекарствах'
-    )
 
-    # 8:30 - дополнительное утреннее напоминание
-    scheduler.add_job(
-        medicine_reminder_wrapper,
-        CronTrigger(hour=8, minute=30, timezone=helsinki_tz),
-        args=[bot, user_id],
-        id='morning_medicine_reminder_2',
-        name='Дополнительное утреннее напоминание'
-    )
+async def send_evening_medicine_reminder(bot, user_id, tz=helsinki_tz):
+    """Вечернее напоминание о лекарствах"""
+    try:
+        await send_dose_reminder('evening', bot, user_id, tz)
+    except Exception as e:
+        logger.error(f"Ошибка при отправке вечернего напоминания: {e}")
 
-    # Дневные напоминания
-    # 14:00 - дневное напоминание
-    scheduler.add_job(
-        medicine_reminder_wrapper,
-        CronTrigger(hour=14, minute=0, timezone=helsinki_tz),
-        args=[bot, user_id],
-        id='afternoon_medicine_reminder',
-        name='Дневное напоминание о лекарствах'
-    )
 
-    # Вечерние напоминания
-    # 20:00 - основное вечернее напоминание
-    scheduler.add_job(
-        evening_medicine_wrapper,
-        CronTrigger(hour=20, minute=0, timezone=helsinki_tz),
-        args=[bot, user_id],
-        id='evening_medicine_reminder',
-        name='Вечернее напоминание о лекарствах'
-    )
+# Слоты напоминаний: (ID слота, обработчик, время, название).
+# Повторы (бывшие 8:30 и 20:30) планируются динамически и только для неподтвержденных доз.
+MEDICINE_SLOTS = [
+    ('morning', send_morning_medicine_reminder, {'hour': 8, 'minute': 0}, 'Утреннее напоминание о лекарствах'),
+    ('afternoon', send_afternoon_medicine_reminder, {'hour': 14, 'minute': 0}, 'Дневное напоминание о лекарствах'),
+    ('evening', send_evening_medicine_reminder, {'hour': 20, 'minute': 0}, 'Вечернее напоминание о лекарствах'),
+]
+
+
+def restore_followups(bot, user_id, tz):
+    """Повторы и эскалации неподтвержденных доз после рестарта (разовые задачи не сохраняются)"""
+    since = (datetime.now(tz).date() - timedelta(days=1)).isoformat()
+    restored = 0
+    for record in get_adherence_log().pending(user_id, since):
+        if record.followup_at is None:
+            _schedule(send_followup_reminder, record.sent_at + FOLLOWUP_DELAY, bot, user_id, tz,
+                      record.day, record.dose, 'followup')
+        elif user_id in CAREGIVERS:
+            _schedule(check_dose_escalation, record.followup_at + ESCALATION_WINDOW, bot, user_id, tz,
+                      record.day, record.dose, 'escalation')
+        else:
+            continue
+        restored += 1
+    return restored
 
-    # 20:30 - дополнительное вечернее напоминание
-    scheduler.add_job(
-        medicine_reminder_wrapper,
-        CronTrigger(hour=20, minute=30, timezone=helsinki_tz),
-        args=[bot, user_id],
-        id='evening_medicine_reminder_2',
-        name='Дополнительное вечернее напоминание'
-    )
 
-    logger.info("Планировщик напоминаний о лекарствах настроен:")
-    logger.info("- Утром: 8:00, 8:30")
-    logger.info("- Днем: 14:00")
-    logger.info("- Вечером: 20:00, 20:30")
+def setup_medicine_scheduler(scheduler, bot, user_id, tz=helsinki_tz, schedule=None):
+    """Настройка планировщика для напоминаний о лекарствах"""
+    global _scheduler
+    _scheduler = scheduler
+    scheduler.add_slots('medicine', MEDICINE_SLOTS, bot, user_id, tz, schedule)
+    try:
+        restored = restore_followups(bot, user_id, tz)
+    except Exception as e:
+        logger.error(f"Не удалось восстановить повторы о лекарствах ({user_id}): {e}")
+        restored = 0
+
+    logger.info(f"Планировщик напоминаний о лекарствах настроен ({user_id}, {tz}):")
+    logger.info("- Утром: 8:00, днем: 14:00, вечером: 20:00")
+    logger.info(f"- Повтор через {FOLLOWUP_DELAY // 60} мин, если прием не подтвержден"
+                + (f" (восстановлено: {restored})" if restored else ""))
 
 
 # Функция для ручного тестирования
@@ -0,0 +1,96 @@
+# reminder_core/__init__.py
+"""
+Общее ядро напоминаний: реестр подписок, единый диспетчер с выбором лидера, выполнение задач и доставка сообщений
+"""
+
+from .catalog import (
+    CursorStore,
+    MessageCatalog,
+    message_catalog,
+)
+from .delivery import (
+    DeliveryEngine,
+    delivery_engine,
+    send_message,
+)
+from .digest import (
+    DigestStore,
+    setup_digest_handlers,
+)
+from .dispatcher import Dispatcher
+from .job_store import (
+    JobStateStore,
+    MisfirePolicy,
+)
+from .jobs import (
+    JobRunner,
+    job_runner,
+    make_job_id,
+)
+from .leader import (
+    LeaderElector,
+    LeaseStore,
+    watch_leader,
+)
+from .logs import (
+    LogRingBuffer,
+    bind_log_context,
+    log_ring,
+    setup_logging,
+)
+from .metrics import (
+    MetricsRegistry,
+    metrics,
+)
+from .plugins import (
+    PluginRegistry,
+    TrackerSpec,
+)
+from .profiling import (
+    MemoryProfiler,
+    memory_profiler,
+    setup_profiling_handlers,
+)
+from .registry import (
+    Subscription,
+    SubscriptionRegistry,
+)
+from .subscriptions import (
+    SubscriptionManager,
+    setup_subscription_handlers,
+)
+
+__all__ = [
+    'CursorStore',
+    'MessageCatalog',
+    'message_catalog',
+    'DeliveryEngine',
+    'delivery_engine',
+    'send_message',
+    'DigestStore',
+    'setup_digest_handlers',
+    'Dispatcher',
+    'JobStateStore',
+    'MisfirePolicy',
+    'JobRunner',
+    'job_runner',
+    'make_job_id',
+    'LeaderElector',
+    'LeaseStore',
+    'watch_leader',
+    'LogRingBuffer',
+    'bind_log_context',
+    'log_ring',
+    'setup_logging',
+    'MetricsRegistry',
+    'metrics',
+    'PluginRegistry',
+    'TrackerSpec',
+    'MemoryProfiler',
+    'memory_profiler',
+    'setup_profiling_handlers',
+    'Subscription',
+    'SubscriptionRegistry',
+    'SubscriptionManager',
+    'setup_subscription_handlers',
+]
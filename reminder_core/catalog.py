@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import atexit
+import random
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from string import Formatter
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Язык сообщений по умолчанию; тексты другого языка лежат рядом: messages/<язык>.json
+DEFAULT_LOCALE = os.getenv("MESSAGE_LOCALE", "ru")
+# Задержка перед записью курсоров: выдачи за это время объединяются в одну запись
+FLUSH_DELAY = 2.0
+# Раунды сети Фейстеля, задающей перестановку колоды
+DECK_ROUNDS = 4
+_MASK64 = (1 << 64) - 1
+
+# Курсор колоды пользователя: перестановка задается seed, position — сколько карт уже выдано,
+# size — размер набора (при правке файла колода начинается заново), last — последний выданный индекс
+Cursor = namedtuple('Cursor', ['seed', 'position', 'size', 'last'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_cursors (
+    user_id INTEGER NOT NULL,
+    pool TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    last INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, pool)
+);
+"""
+
+
+def _mix(seed, round_no, value):
+    """Раундовая функция: 64-битное перемешивание (splitmix), одинаковое во всех процессах"""
+    x = (seed * 0x9E3779B97F4A7C15 + round_no * 0xBF58476D1CE4E5B9 + value) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def deck_index(seed, size, position):
+    """Индекс текста на позиции колоды: перестановка range(size), заданная seed, без ее построения
+
+    Сеть Фейстеля на 2k битах (4**k >= size) — биекция; значения за пределами колоды
+    шифруются повторно (cycle walking), в среднем меньше четырех шагов.
+    """
+    if size < 2:
+        return 0
+    half_bits = ((size - 1).bit_length() + 1) // 2
+    mask = (1 << half_bits) - 1
+    value = position
+    while True:
+        left, right = value >> half_bits, value & mask
+        for round_no in range(DECK_ROUNDS):
+            left, right = right, left ^ (_mix(seed, round_no, right) & mask)
+        value = (left << half_bits) | right
+        if value < size:
+            return value
+
+
+class MessageTemplate:
+    """Шаблон, разобранный один раз при загрузке: кортеж (текст, поле)"""
+
+    __slots__ = ('name', 'parts', 'fields')
+
+    def __init__(self, name, source):
+        self.name = name
+        self.parts = tuple((literal, field) for literal, field, _, _ in Formatter().parse(source))
+        self.fields = tuple(field for _, field in self.parts if field)
+
+    def render(self, values):
+        return ''.join(literal + (values[field] if field else '') for literal, field in self.parts)
+
+
+class CursorStore:
+    """Курсоры колод в SQLite: несколько чисел на пользователя и набор"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def load(self):
+        rows = self.conn.execute("SELECT user_id, pool, seed, position, size, last FROM message_cursors")
+        return {
+            (row['user_id'], row['pool']): Cursor(row['seed'], row['position'], row['size'], row['last'])
+            for row in rows
+        }
+
+    def save(self, cursors):
+        """Пакетная запись {(user_id, pool): Cursor}"""
+        if not cursors:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO message_cursors (user_id, pool, seed, position, size, last, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, pool) DO UPDATE SET seed = excluded.seed, "
+                "position = excluded.position, size = excluded.size, last = excluded.last, "
+                "updated_at = excluded.updated_at",
+                [(user_id, pool, *cursor, now) for (user_id, pool), cursor in cursors.items()]
+            )
+
+
+class MessageCatalog:
+    """Тексты напоминаний из файлов данных с выдачей "колодой" без повторов
+
+    Каждое пространство имен (water, medicine, ...) регистрирует свой каталог messages/
+    и читается с диска один раз при первом обращении. Наборы хранятся кортежами,
+    шаблоны разбираются при загрузке. Для каждого пользователя набор перемешивается
+    как колода: все тексты выдаются по одному разу, затем колода тасуется заново,
+    и первый текст новой колоды не совпадает с последним текстом предыдущей.
+    """
+
+    def __init__(self, locale=DEFAULT_LOCALE, flush_delay=FLUSH_DELAY):
+        self.default_locale = locale
+        self.flush_delay = flush_delay
+        self._directories = {}
+        self._pools = {}
+        self._templates = {}
+        self._loaded = set()
+        self._cursors = None
+        self._dirty = {}
+        self._store = None
+        self._flush_task = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush_sync)
+
+    def register(self, namespace, directory):
+        """Каталог с файлами <язык>.json для пространства имен"""
+        self._directories[namespace] = directory
+
+    def attach(self, store):
+        """Хранилище курсоров; без него колоды живут только в памяти процесса"""
+        self._store = store
+        self._cursors = None
+
+    # Загрузка текстов
+
+    def _load(self, namespace, locale):
+        if (namespace, locale) in self._loaded:
+            return
+        self._loaded.add((namespace, locale))
+        directory = self._directories.get(namespace)
+        if directory is None:
+            raise KeyError(f"Неизвестное пространство сообщений: {namespace}")
+        path = os.path.join(directory, f"{locale}.json")
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for name, texts in data.get('pools', {}).items():
+            self._pools[(f"{namespace}.{name}", locale)] = tuple(texts)
+        for name, source in data.get('templates', {}).items():
+            key = f"{namespace}.{name}"
+            self._templates[(key, locale)] = MessageTemplate(key, source)
+        logger.debug(f"Загружены сообщения {namespace} ({locale}) из {path}")
+
+    def _lookup(self, table, key, locale):
+        """Запись для языка с откатом на язык по умолчанию"""
+        namespace = key.split('.', 1)[0]
+        for candidate in (locale or self.default_locale, self.default_locale):
+            self._load(namespace, candidate)
+            value = table.get((key, candidate))
+            if value is not None:
+                return value
+        return None
+
+    def pool(self, key, locale=None):
+        """Неизменяемый набор текстов 'пространство.набор'"""
+        texts = self._lookup(self._pools, key, locale)
+        if texts is None:
+            raise KeyError(f"Нет набора сообщений {key}")
+        return texts
+
+    # Выдача без повторов
+
+    def _new_cursor(self, size, last):
+        while True:
+            seed = random.getrandbits(31)
+            if size < 2 or deck_index(seed, size, 0) != last:
+                return Cursor(seed, 0, size, last)
+
+    def _load_cursors(self):
+        if self._cursors is None:
+            self._cursors = {}
+            if self._store is not None:
+                try:
+                    self._cursors = self._store.load()
+                except Exception as e:
+                    logger.error(f"Ошибка загрузки курсоров сообщений: {e}")
+        return self._cursors
+
+    def draw_index(self, user_id, key, size):
+        """Следующий индекс колоды пользователя для набора из size текстов"""
+        with self._lock:
+            cursors = self._load_cursors()
+            cursor = cursors.get((user_id, key))
+            if cursor is None or cursor.size != size or cursor.position >= size:
+                cursor = self._new_cursor(size, cursor.last if cursor else None)
+            index = deck_index(cursor.seed, size, cursor.position)
+            cursor = cursors[(user_id, key)] = cursor._replace(position=cursor.position + 1, last=index)
+            if self._store is not None:
+                self._dirty[(user_id, key)] = cursor
+        if self._store is not None:
+            self._schedule_flush()
+        return index
+
+    def draw(self, user_id, key, locale=None):
+        """Следующий текст набора для пользователя (без повторов до конца колоды)"""
+        texts = self.pool(key, locale)
+        return texts[self.draw_index(user_id, key, len(texts))]
+
+    def render(self, user_id, key, locale=None, **values):
+        """Шаблон 'пространство.шаблон': незаданные поля вытягиваются из одноименных наборов"""
+        template = self._lookup(self._templates, key, locale)
+        if template is None:
+            raise KeyError(f"Нет шаблона сообщения {key}")
+        namespace = key.split('.', 1)[0]
+        for field in template.fields:
+            if field not in values:
+                values[field] = self.draw(user_id, f"{namespace}.{field}", locale)
+        return template.render(values)
+
+    # Запись курсоров
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    def _take_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    def _write(self, dirty):
+        try:
+            self._store.save(dirty)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения курсоров сообщений: {e}")
+
+    async def flush(self):
+        """Запись накопленных курсоров в фоновом потоке"""
+        dirty = self._take_dirty()
+        if dirty and self._store is not None:
+            await asyncio.to_thread(self._write, dirty)
+
+    def flush_sync(self):
+        dirty = self._take_dirty()
+        if dirty and self._store is not None:
+            self._write(dirty)
+
+
+# Общий каталог процесса: трекеры регистрируют в нем свои тексты при импорте
+message_catalog = MessageCatalog()
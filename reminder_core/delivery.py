@@ -0,0 +1,288 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from .jobs import CHAT, current_digest, current_fire, current_priority, priority_rank
+from .metrics import ERRORS, SEND_LATENCY
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений/с на бота и ~1 сообщение/с в один чат
+GLOBAL_RATE = 25
+PER_CHAT_INTERVAL = 1.0
+WORKERS = 8
+MAX_RETRIES = 3
+STATS_INTERVAL = 60
+
+
+class TokenBucket:
+    """Глобальный ограничитель скорости отправки"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Остановка отправки целиком (ответ 429 с retry_after)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Outgoing:
+    __slots__ = ('bot', 'chat_id', 'text', 'kwargs', 'future', 'rank', 'kind', 'attempts', 'reserved',
+                 'enqueued_at')
+
+    def __init__(self, bot, chat_id, text, kwargs, future, rank, kind):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.rank = rank
+        self.kind = kind
+        self.attempts = 0
+        self.reserved = False
+        self.enqueued_at = time.monotonic()
+
+
+def message_kind():
+    """Тип сообщения для метрик: тип напоминания текущего срабатывания, чат или прочее"""
+    fire = current_fire.get()
+    if fire is not None:
+        return fire.job_id.split(':', 1)[0]
+    return 'chat' if current_priority.get() == CHAT else 'other'
+
+
+def retry_after_seconds(error):
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class DeliveryEngine:
+    """Центральная очередь исходящих сообщений с учетом лимитов Telegram
+
+    Очередь приоритетная: напоминания о лекарствах уходят раньше остальных.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL,
+                 workers=WORKERS, max_retries=MAX_RETRIES):
+        self.bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.outbox = None
+        self._queue = None
+        self._counter = itertools.count()
+        self._tasks = []
+        self._chat_next_slot = {}
+        # Отложенные сообщения (пауза чата, повтор): сообщение -> таймер call_later
+        self._delayed = {}
+        self._sent_times = deque()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def started(self):
+        return bool(self._tasks)
+
+    async def start(self):
+        """Запуск воркеров на текущем цикле событий"""
+        if self.started:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._report_stats()))
+        logger.info(f"Очередь доставки запущена: {self.workers} воркеров, {self.bucket.rate} сообщ./с")
+
+    async def stop(self):
+        """Остановка воркеров; ожидающие send_now получают ошибку, а не висят вечно"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        pending = list(self._delayed)
+        for handle in self._delayed.values():
+            handle.cancel()
+        self._delayed.clear()
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait()[2])
+        for item in pending:
+            self._abandon(item)
+        if pending:
+            logger.warning(f"Очередь доставки остановлена, не отправлено сообщений: {len(pending)}")
+
+    @staticmethod
+    def _abandon(item):
+        if not item.future.done():
+            item.future.set_exception(RuntimeError("Очередь доставки остановлена"))
+
+    async def send(self, bot, chat_id, text, **kwargs):
+        """Отправка сообщения: напоминания диспетчера идут через outbox, остальное — сразу в очередь"""
+        digest = current_digest.get()
+        if digest is not None and digest.collect(bot, chat_id, text, kwargs):
+            return None
+        fire = current_fire.get()
+        if self.outbox is not None and fire is not None:
+            await self.outbox.enqueue(chat_id, fire, text, kwargs)
+            return None
+        return await self.send_now(bot, chat_id, text, **kwargs)
+
+    async def send_now(self, bot, chat_id, text, kind=None, **kwargs):
+        """Постановка сообщения в очередь и ожидание результата отправки
+
+        kind — тип сообщения для метрик (по умолчанию определяется по контексту).
+        """
+        if not self.started:
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        future = asyncio.get_running_loop().create_future()
+        self._put(_Outgoing(bot, chat_id, text, kwargs, future, priority_rank(current_priority.get()),
+                            SEND_LATENCY.labels(kind or message_kind())))
+        return await future
+
+    def _put(self, item):
+        self._queue.put_nowait((item.rank, next(self._counter), item))
+
+    def queue_depth(self):
+        if self._queue is None:
+            return 0
+        return self._queue.qsize() + len(self._delayed)
+
+    def messages_per_second(self, window=10):
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] > STATS_INTERVAL:
+            self._sent_times.popleft()
+        recent = sum(1 for t in self._sent_times if now - t <= window)
+        return recent / window
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth(),
+            'messages_per_second': self.messages_per_second(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+        }
+
+    def _requeue_later(self, item, delay):
+        def _put_delayed():
+            del self._delayed[item]
+            self._put(item)
+
+        self._delayed[item] = asyncio.get_running_loop().call_later(delay, _put_delayed)
+
+    def _reserve_chat_slot(self, chat_id):
+        """Резервирование ближайшего допустимого момента отправки в чат"""
+        now = time.monotonic()
+        slot = max(now, self._chat_next_slot.get(chat_id, 0.0))
+        self._chat_next_slot[chat_id] = slot + self.per_chat_interval
+        if len(self._chat_next_slot) > 10000:
+            self._chat_next_slot = {k: v for k, v in self._chat_next_slot.items() if v > now}
+        return slot - now
+
+    async def _worker(self, number):
+        while True:
+            _, _, item = await self._queue.get()
+            try:
+                if item.future.done():
+                    continue
+                if not item.reserved:
+                    item.reserved = True
+                    wait = self._reserve_chat_slot(item.chat_id)
+                    if wait > 0:
+                        # Чат еще "занят" — откладываем, не блокируя воркер
+                        self._requeue_later(item, wait)
+                        continue
+                await self.bucket.acquire()
+                await self._deliver(item)
+            except asyncio.CancelledError:
+                # Остановка посреди отправки: ожидающий не должен висеть
+                self._abandon(item)
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка воркера доставки {number}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item):
+        item.attempts += 1
+        started = time.perf_counter()
+        try:
+            message = await item.bot.send_message(chat_id=item.chat_id, text=item.text, **item.kwargs)
+        except RetryAfter as e:
+            ERRORS.labels('delivery', 'retry_after').inc()
+            delay = retry_after_seconds(e)
+            logger.warning(f"Telegram 429: пауза отправки на {delay:.0f} с")
+            self.bucket.pause(delay)
+            if item.attempts > self.max_retries:
+                self.failed += 1
+                item.future.set_exception(e)
+                return
+            self.retried += 1
+            self._requeue_later(item, delay)
+        except (TimedOut, NetworkError) as e:
+            ERRORS.labels('delivery', 'network').inc()
+            if item.attempts > self.max_retries:
+                self.failed += 1
+                item.future.set_exception(e)
+                return
+            self.retried += 1
+            self._requeue_later(item, 2 ** item.attempts)
+        except Exception as e:
+            ERRORS.labels('delivery', type(e).__name__).inc()
+            self.failed += 1
+            item.future.set_exception(e)
+        else:
+            item.kind.observe(time.perf_counter() - started)
+            self.sent += 1
+            self._sent_times.append(time.monotonic())
+            item.future.set_result(message)
+
+    async def _report_stats(self):
+        last_sent = 0
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            if self.sent == last_sent and not self.queue_depth():
+                continue
+            last_sent = self.sent
+            stats = self.stats()
+            logger.info(
+                f"Доставка: {stats['messages_per_second']:.1f} сообщ./с, "
+                f"в очереди {stats['queue_depth']}, отправлено {stats['sent']}, "
+                f"повторов {stats['retried']}, ошибок {stats['failed']}"
+            )
+
+
+# Общий экземпляр для всех трекеров
+delivery_engine = DeliveryEngine()
+
+
+async def send_message(bot, chat_id, text, **kwargs):
+    """Отправка сообщения через общую очередь доставки"""
+    return await delivery_engine.send(bot, chat_id, text, **kwargs)
@@ -0,0 +1,169 @@
+import time
+import asyncio
+import logging
+import threading
+
+from telegram import InlineKeyboardMarkup, Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from .delivery import send_message
+from .metrics import metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Окно сводки: напоминания, которые наступят в течение окна, уходят одним сообщением
+DEFAULT_WINDOW = 15 * 60
+MAX_WINDOW = 3 * 3600
+# Как часто лидер перечитывает настройки, измененные командой /digest в других процессах
+REFRESH_INTERVAL = 60
+# Разделитель напоминаний внутри сводки
+SEPARATOR = "\n\n➖➖➖\n\n"
+
+DIGESTS = metrics.counter('digest_messages_total', 'Отправленные сводки напоминаний')
+SENDS_SAVED = metrics.counter('digest_sends_saved_total', 'Вызовы send_message, сэкономленные сводками')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digest_settings (
+    user_id INTEGER PRIMARY KEY,
+    window INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class DigestStore:
+    """Пользователи в режиме сводки и их окна (секунды); команда пишет в любом процессе, лидер читает
+
+    Окна держатся в памяти: window() не ходит в базу, поэтому диспетчер может звать его на каждом тике.
+    enable/disable сразу обновляют кэш, изменения из других процессов подтягивает refresh().
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self._windows = {}
+        self._loaded_at = None
+        self.reload()
+
+    def enable(self, user_id, window=DEFAULT_WINDOW):
+        if not 0 < window <= MAX_WINDOW:
+            raise ValueError(f"Окно сводки — от 1 до {MAX_WINDOW // 60} минут")
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO digest_settings (user_id, window, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET window = excluded.window, updated_at = excluded.updated_at",
+                (user_id, int(window), time.time())
+            )
+            self._windows[user_id] = int(window)
+
+    def disable(self, user_id):
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM digest_settings WHERE user_id = ?", (user_id,))
+            self._windows.pop(user_id, None)
+        return cursor.rowcount > 0
+
+    def window(self, user_id):
+        """Окно сводки пользователя или None (режим выключен) — из памяти"""
+        return self._windows.get(user_id)
+
+    def reload(self):
+        """Синхронное чтение всех настроек; под той же блокировкой, что и запись, чтобы не затереть кэш"""
+        with self._lock:
+            rows = self.conn.execute("SELECT user_id, window FROM digest_settings").fetchall()
+            self._windows = {row['user_id']: row['window'] for row in rows}
+            self._loaded_at = time.monotonic()
+
+    async def refresh(self, max_age=REFRESH_INTERVAL):
+        """Перечитывание настроек в потоке, если кэш старше max_age секунд; ошибка оставляет старый кэш"""
+        if time.monotonic() - self._loaded_at < max_age:
+            return
+        try:
+            await asyncio.to_thread(self.reload)
+        except Exception as e:
+            # Следующая попытка — не раньше чем через max_age
+            self._loaded_at = time.monotonic()
+            logger.error(f"Не удалось перечитать настройки сводки: {e}")
+
+
+class DigestCollector:
+    """Сообщения пользователю от срабатываний одной сводки; остальные адресаты получают их как обычно"""
+    __slots__ = ('user_id', 'bot', 'messages', 'passthrough')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.bot = None
+        self.messages = []
+        # Параметры, кроме клавиатуры (parse_mode и т.п.), в общее сообщение не сводятся
+        self.passthrough = []
+
+    def collect(self, bot, chat_id, text, kwargs):
+        if chat_id != self.user_id:
+            return False
+        self.bot = bot
+        if set(kwargs) - {'reply_markup'}:
+            self.passthrough.append((text, kwargs))
+        else:
+            self.messages.append((text, kwargs.get('reply_markup')))
+        return True
+
+    @property
+    def sends(self):
+        return len(self.messages) + len(self.passthrough)
+
+    async def flush(self):
+        """Отправка собранного: одна сводка вместо отдельных сообщений"""
+        if len(self.messages) == 1:
+            text, reply_markup = self.messages[0]
+            await self._send(text, {'reply_markup': reply_markup} if reply_markup else {})
+        elif self.messages:
+            text, kwargs = compose_digest(self.messages)
+            await self._send(text, kwargs)
+            DIGESTS.labels().inc()
+            SENDS_SAVED.labels().inc(len(self.messages) - 1)
+            logger.info(f"Сводка для {self.user_id}: {len(self.messages)} напоминаний одним сообщением")
+        for text, kwargs in self.passthrough:
+            await self._send(text, kwargs)
+
+    async def _send(self, text, kwargs):
+        await send_message(self.bot, self.user_id, text, **kwargs)
+
+
+def compose_digest(messages):
+    """Текст сводки и общая клавиатура: кнопки всех напоминаний, по порядку"""
+    rows = []
+    for _, reply_markup in messages:
+        if isinstance(reply_markup, InlineKeyboardMarkup):
+            rows.extend(list(row) for row in reply_markup.inline_keyboard)
+    text = f"📬 Напоминания ({len(messages)}):{SEPARATOR}" + SEPARATOR.join(text for text, _ in messages)
+    return text, ({'reply_markup': InlineKeyboardMarkup(rows)} if rows else {})
+
+
+def setup_digest_handlers(application, store):
+    """Команда /digest: on [минуты], off или текущий режим"""
+
+    async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        args = context.args or []
+        action = args[0].lower() if args else 'status'
+        try:
+            if action == 'off':
+                await asyncio.to_thread(store.disable, user_id)
+                reply = "🔔 Сводка выключена: каждое напоминание приходит отдельно"
+            elif action == 'on' or action.isdigit():
+                value = args[1] if action == 'on' and len(args) > 1 else action
+                minutes = int(value) if value.isdigit() else DEFAULT_WINDOW // 60
+                await asyncio.to_thread(store.enable, user_id, minutes * 60)
+                reply = f"📬 Сводка включена: напоминания в пределах {minutes} мин приходят одним сообщением"
+            else:
+                window = store.window(user_id)
+                reply = (f"📬 Сводка включена, окно {window // 60} мин" if window
+                         else "Сводка выключена") + "\nИспользование: /digest on [минуты] или /digest off"
+        except ValueError as e:
+            reply = f"❌ {e}"
+        logger.info(f"[ID: {user_id}] /digest {' '.join(args)}")
+        await update.message.reply_text(reply)
+
+    application.add_handler(CommandHandler("digest", digest_command))
@@ -0,0 +1,378 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+
+import pytz
+
+from .digest import DigestCollector
+from .jobs import REMINDER, FireContext, current_digest, current_fire, job_user_id, make_job_id, priority_for, \
+    priority_rank
+from .job_store import dump_when, misfire_policy
+from .metrics import FIRE_LAG, metrics
+from .triggers import WINDOW_KEYS, next_fire_time
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Максимальный сон между пробуждениями (защита от сна контейнера и сдвига часов)
+MAX_SLEEP = 60
+# Опоздание, начиная с которого срабатывание считается пропущенным (для логов и статистики)
+MISFIRE_LOG_THRESHOLD = 30
+
+MISFIRES = metrics.counter('scheduler_misfires_total', 'Пропущенные срабатывания слотов', ('outcome',))
+
+
+class ScheduledEntry:
+    """Одна подписка на слот: хранится в куче ровно один раз"""
+    __slots__ = ('job_id', 'user_id', 'coro_func', 'when', 'tz', 'args', 'name', 'priority', 'next_fire',
+                 'cancelled', 'misfire_grace')
+
+    def __init__(self, job_id, coro_func, when, tz, args, name, priority):
+        self.job_id = job_id
+        self.user_id = job_user_id(job_id)
+        self.coro_func = coro_func
+        self.when = when
+        self.tz = tz
+        self.args = args
+        self.name = name
+        self.priority = priority
+        self.next_fire = None
+        self.cancelled = False
+        self.misfire_grace = misfire_policy(job_id).grace
+
+
+class Dispatcher:
+    """Единый диспетчер напоминаний: ближайшие срабатывания всех пользователей в одной куче
+
+    С store состояние слотов (последнее и следующее срабатывание) сохраняется в SQLite:
+    после рестарта пропущенные слоты отправляются, если опоздание в пределах политики типа.
+    С digest (DigestStore) напоминания пользователя в режиме сводки, наступающие в пределах
+    его окна, срабатывают вместе и уходят одним сообщением.
+    """
+
+    def __init__(self, runner, store=None, digest=None):
+        self.runner = runner
+        self.store = store
+        self.digest = digest
+        self._restored = None
+        self.misfires_caught_up = 0
+        self.misfires_dropped = 0
+        self._heap = []
+        self._entries = {}
+        # Слоты по пользователям: поиск напоминаний для сводки без обхода всей кучи
+        self._user_entries = {}
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._wakeup = None
+        self._task = None
+        self._running_jobs = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_job(self, coro_func, when, tz, args, job_id, name, priority=REMINDER):
+        """Добавление (или замена) слота; стоимость O(log n)"""
+        self.remove_job(job_id)
+        entry = self._register(ScheduledEntry(job_id, coro_func, when, tz, args, name, priority))
+        state = self._restored_state(job_id)
+        if state is not None and state.when == dump_when(when):
+            # Теплый рестарт: берем сохраненное время, даже если оно уже прошло
+            self._push(entry, datetime.fromtimestamp(state.next_fire, pytz.utc))
+        else:
+            self._schedule(entry, datetime.now(pytz.utc))
+            self._save([entry])
+        return entry
+
+    def add_once(self, coro_func, at, args, job_id, name, priority=REMINDER):
+        """Разовая задача на момент at (aware datetime): после срабатывания удаляется
+
+        Такие задачи не сохраняются в store — трекер сам восстанавливает их из своих данных.
+        """
+        self.remove_job(job_id)
+        entry = self._register(ScheduledEntry(job_id, coro_func, None, None, args, name, priority))
+        self._push(entry, at.astimezone(pytz.utc))
+        return entry
+
+    def add_slots(self, reminder_type, slots, bot, user_id, tz, schedule=None):
+        """Регистрация слотов трекера для одного пользователя
+
+        slots — список (ID слота, корутина, время срабатывания, название);
+        schedule позволяет переопределить время отдельных слотов из реестра,
+        а его ключи quiet/active (тихие часы и активное окно) применяются ко всем слотам.
+        """
+        schedule = schedule or {}
+        windows = {key: schedule[key] for key in WINDOW_KEYS if schedule.get(key)}
+        for slot_id, coro_func, when, name in slots:
+            when = schedule.get(slot_id, when)
+            if windows:
+                when = {**when, **windows}
+            self.add_job(
+                coro_func,
+                when,
+                tz,
+                args=(bot, user_id, tz),
+                job_id=make_job_id(reminder_type, user_id, slot_id),
+                name=f"{name} ({user_id})",
+                priority=priority_for(reminder_type)
+            )
+
+    def remove_job(self, job_id):
+        entry = self._entries.pop(job_id, None)
+        if entry is None:
+            return False
+        self._user_entries[entry.user_id].pop(job_id, None)
+        # Ленивое удаление: запись остается в куче, но пропускается
+        entry.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) // 2:
+            self._compact()
+        return True
+
+    def remove_user_jobs(self, reminder_type, user_id):
+        """Удаление всех слотов пользователя для одного типа напоминаний"""
+        prefix = make_job_id(reminder_type, user_id, '')
+        job_ids = [job_id for job_id in self._entries if job_id.startswith(prefix)]
+        for job_id in job_ids:
+            self.remove_job(job_id)
+        if self.store is not None and job_ids:
+            self.store.forget(job_ids)
+        return len(job_ids)
+
+    def clear(self):
+        """Удаление всех слотов (процесс перестал быть лидером)"""
+        self._heap = []
+        self._entries = {}
+        self._user_entries = {}
+        self._cancelled = 0
+        self._restored = None
+
+    def next_fire(self, job_id):
+        entry = self._entries.get(job_id)
+        return entry.next_fire if entry else None
+
+    def start(self):
+        """Запуск цикла диспетчера на текущем цикле событий"""
+        if self._task is None:
+            if self.store is not None:
+                # Сохраненное время нужно только при загрузке; дальше слоты считаются от текущего момента
+                self.store.prune(self._entries)
+                self._restored = {}
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Диспетчер напоминаний запущен: {len(self._entries)} слотов")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _register(self, entry):
+        self._entries[entry.job_id] = entry
+        self._user_entries.setdefault(entry.user_id, {})[entry.job_id] = entry
+        return entry
+
+    def _restored_state(self, job_id):
+        if self.store is None:
+            return None
+        if self._restored is None:
+            self._restored = self.store.load()
+        return self._restored.get(job_id)
+
+    def _save(self, entries, fired=None):
+        """Запись следующего (и последнего) срабатывания; fired — {job_id: planned}"""
+        if self.store is None or not entries:
+            return
+        fired = fired or {}
+        suppressed = [entry.job_id for entry in entries if entry.next_fire is None]
+        try:
+            if suppressed:
+                # Иначе после рестарта подавленный слот поднялся бы по старому времени
+                self.store.forget(suppressed)
+            self.store.save([
+                (entry.job_id, entry.when,
+                 fired[entry.job_id].timestamp() if entry.job_id in fired else None,
+                 entry.next_fire.timestamp())
+                for entry in entries if entry.next_fire is not None
+            ])
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояние диспетчера: {e}")
+
+    def _schedule(self, entry, after):
+        next_fire = next_fire_time(entry.when, entry.tz, after)
+        if next_fire is None:
+            # Слот целиком в тихих часах пользователя: в кучу не попадает и диспетчер не будит
+            entry.next_fire = None
+            logger.info(f"Слот {entry.job_id} подавлен окнами пользователя")
+            return
+        self._push(entry, next_fire)
+
+    def _push(self, entry, next_fire):
+        entry.next_fire = next_fire
+        heapq.heappush(self._heap, (entry.next_fire.timestamp(), next(self._counter), entry))
+        if self._wakeup is not None and self._heap[0][2] is entry:
+            self._wakeup.set()
+
+    @staticmethod
+    def _is_stale(item):
+        """Запись кучи устарела: слот удален или уже перенесен (сработал досрочно в сводке)"""
+        ts, _, entry = item
+        return entry.cancelled or entry.next_fire is None or entry.next_fire.timestamp() != ts
+
+    def _compact(self):
+        self._heap = [item for item in self._heap if not self._is_stale(item)]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def _pop_due(self, now_ts):
+        """Извлечение всех записей, время которых уже наступило"""
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            item = heapq.heappop(self._heap)
+            entry = item[2]
+            if entry.cancelled:
+                self._cancelled -= 1
+                continue
+            if self._is_stale(item):
+                continue
+            due.append(entry)
+        return due
+
+    async def _run_entry(self, entry, planned):
+        current_fire.set(FireContext(entry.job_id, planned))
+        await self.runner.run(entry.job_id, self._timed_call, entry, planned.timestamp(), priority=entry.priority)
+
+    @staticmethod
+    async def _timed_call(entry, planned_ts):
+        # Опоздание считается в момент фактического запуска — с учетом ожидания в очереди классов
+        # Метка — тип напоминания: ID задачи содержит ID пользователя Telegram
+        FIRE_LAG.labels(entry.job_id.split(':', 1)[0]).observe(max(0.0, time.time() - planned_ts))
+        await entry.coro_func(*entry.args)
+
+    def _fire(self, entry, planned):
+        self._track(asyncio.create_task(self._run_entry(entry, planned)))
+
+    def _track(self, task):
+        self._running_jobs.add(task)
+        task.add_done_callback(self._running_jobs.discard)
+
+    def _coalesce(self, launches, now):
+        """Срабатывания пользователей в режиме сводки: к наступившим добавляются слоты из их окна
+
+        Окна берутся из кэша DigestStore, без обращения к базе.
+        Возвращает (отдельные срабатывания, {user_id: срабатывания сводки}, досрочные записи).
+        """
+        by_user = {}
+        for entry, planned in launches:
+            by_user.setdefault(entry.user_id, []).append((entry, planned))
+        singles, digests, pulled = [], {}, []
+        for user_id, items in by_user.items():
+            window = self.digest.window(user_id)
+            if window is None:
+                singles.extend(items)
+                continue
+            horizon = now.timestamp() + window
+            launched = {entry.job_id for entry, _ in items}
+            for entry in self._user_entries.get(user_id, {}).values():
+                if (entry.job_id not in launched and entry.next_fire is not None
+                        and entry.next_fire.timestamp() <= horizon):
+                    items.append((entry, entry.next_fire))
+                    pulled.append(entry)
+            if len(items) == 1:
+                singles.extend(items)
+            else:
+                digests[user_id] = sorted(items, key=lambda item: item[1])
+        return singles, digests, pulled
+
+    def _fire_digest(self, user_id, items):
+        self._track(asyncio.create_task(self._run_digest(user_id, items)))
+
+    async def _run_digest(self, user_id, items):
+        planned = items[0][1]
+        job_id = make_job_id('digest', user_id, 'batch')
+        priority = min((entry.priority for entry, _ in items), key=priority_rank)
+        current_fire.set(FireContext(job_id, planned))
+        await self.runner.run(job_id, self._digest_call, user_id, items, priority=priority)
+
+    async def _digest_call(self, user_id, items):
+        """Все слоты сводки выполняются как обычно, но их сообщения пользователю копятся и уходят одним"""
+        collector = DigestCollector(user_id)
+        current_digest.set(collector)
+        results = await asyncio.gather(
+            *(self._collect_entry(entry, planned) for entry, planned in items), return_exceptions=True
+        )
+        current_digest.set(None)
+        for (entry, _), result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка слота {entry.job_id} в сводке: {result}")
+        await collector.flush()
+
+    @classmethod
+    async def _collect_entry(cls, entry, planned):
+        current_fire.set(FireContext(entry.job_id, planned))
+        await cls._timed_call(entry, planned.timestamp())
+
+    def _advance(self, entry, now):
+        """Перенос сработавшего слота; разовая задача удаляется"""
+        if entry.when is None:
+            # Разовая задача выполнена (или устарела); ее запись в куче, если осталась, станет устаревшей
+            entry.next_fire = None
+            if self._entries.get(entry.job_id) is entry:
+                del self._entries[entry.job_id]
+                del self._user_entries[entry.user_id][entry.job_id]
+            return
+        # Несколько пропущенных срабатываний схлопываются: следующее — после текущего момента
+        self._schedule(entry, max(now, entry.next_fire))
+
+    async def _run(self):
+        while True:
+            if self.digest is not None:
+                # Изменения /digest из других процессов; чтение базы — в потоке и не чаще REFRESH_INTERVAL
+                await self.digest.refresh()
+            now = datetime.now(pytz.utc)
+            due = self._pop_due(now.timestamp())
+            fired = {}
+            launches = []
+            for entry in due:
+                lag = (now - entry.next_fire).total_seconds()
+                if lag <= entry.misfire_grace:
+                    if lag > MISFIRE_LOG_THRESHOLD:
+                        self.misfires_caught_up += 1
+                        MISFIRES.labels('caught_up').inc()
+                        logger.warning(f"Пропущенный слот {entry.job_id} отправлен с опозданием {lag:.0f} с")
+                    launches.append((entry, entry.next_fire))
+                    fired[entry.job_id] = entry.next_fire
+                else:
+                    self.misfires_dropped += 1
+                    MISFIRES.labels('dropped').inc()
+                    logger.warning(f"Слот {entry.job_id} устарел на {lag:.0f} с — пропущен")
+                self._advance(entry, now)
+            pulled = []
+            if self.digest is not None and launches:
+                launches, digests, pulled = self._coalesce(launches, now)
+                for entry in pulled:
+                    fired[entry.job_id] = entry.next_fire
+                    self._advance(entry, now)
+                for user_id, items in digests.items():
+                    self._fire_digest(user_id, items)
+            for entry, planned in launches:
+                self._fire(entry, planned)
+            if due:
+                self._save([entry for entry in due + pulled if entry.when is not None], fired)
+                logger.debug(f"Диспетчер: запущено {len(fired)} из {len(due) + len(pulled)} напоминаний")
+
+            while self._heap and self._is_stale(self._heap[0]):
+                if heapq.heappop(self._heap)[2].cancelled:
+                    self._cancelled -= 1
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(MAX_SLEEP, max(0.0, self._heap[0][0] - datetime.now(pytz.utc).timestamp()))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,90 @@
+import json
+import time
+import logging
+from collections import namedtuple
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Политика пропущенного срабатывания: grace — насколько поздно (в секундах) слот еще можно отправить.
+# Пропущенные подряд срабатывания всегда схлопываются в одно.
+MisfirePolicy = namedtuple('MisfirePolicy', ['grace'])
+
+DEFAULT_MISFIRE = MisfirePolicy(grace=5 * 60)
+
+MISFIRE_POLICIES = {
+    # Лекарство важно принять и с опозданием
+    'medicine': MisfirePolicy(grace=3 * 3600),
+    # Ежечасное напоминание о воде через час уже бесполезно
+    'water': MisfirePolicy(grace=10 * 60),
+    'french': MisfirePolicy(grace=2 * 3600),
+    'smoking': MisfirePolicy(grace=2 * 3600),
+}
+
+# Состояние задачи: последнее срабатывание и следующее плановое (UTC timestamp)
+JobState = namedtuple('JobState', ['job_id', 'when', 'last_fired', 'next_fire'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_state (
+    job_id TEXT PRIMARY KEY,
+    reminder_when TEXT NOT NULL,
+    last_fired REAL,
+    next_fire REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def misfire_policy(job_id):
+    """Политика по типу напоминания (первая часть ID задачи)"""
+    return MISFIRE_POLICIES.get(job_id.split(':', 1)[0], DEFAULT_MISFIRE)
+
+
+def dump_when(when):
+    return json.dumps(when, sort_keys=True)
+
+
+class JobStateStore:
+    """Постоянное состояние диспетчера: переживает передеплой и сон контейнера"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def load(self):
+        """Все сохраненные состояния одним запросом (теплый рестарт)"""
+        rows = self.conn.execute("SELECT job_id, reminder_when, last_fired, next_fire FROM job_state")
+        return {
+            row['job_id']: JobState(row['job_id'], row['reminder_when'], row['last_fired'], row['next_fire'])
+            for row in rows
+        }
+
+    def save(self, states):
+        """Пакетная запись состояний [(job_id, when, last_fired, next_fire), ...]"""
+        if not states:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO job_state (job_id, reminder_when, last_fired, next_fire, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_id) DO UPDATE SET reminder_when = excluded.reminder_when, "
+                "last_fired = COALESCE(excluded.last_fired, job_state.last_fired), "
+                "next_fire = excluded.next_fire, updated_at = excluded.updated_at",
+                [(job_id, dump_when(when), last_fired, next_fire, now)
+                 for job_id, when, last_fired, next_fire in states]
+            )
+
+    def forget(self, job_ids):
+        with self.conn:
+            self.conn.executemany("DELETE FROM job_state WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+
+    def prune(self, keep_job_ids):
+        """Удаление состояний задач, которых больше нет в диспетчере"""
+        stale = [job_id for job_id, in self.conn.execute("SELECT job_id FROM job_state")
+                 if job_id not in keep_job_ids]
+        if stale:
+            self.forget(stale)
+            logger.info(f"Удалено устаревших состояний задач: {len(stale)}")
+        return len(stale)
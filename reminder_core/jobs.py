@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import time
+import contextvars
+from collections import deque, namedtuple
+
+from .metrics import ERRORS
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки выполнения задач
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_JOB_TIMEOUT = 60
+
+# Класс приоритета: чем меньше priority, тем важнее.
+# queue_slo — допустимое ожидание в очереди; shed — при перегрузке задача отбрасывается.
+PriorityClass = namedtuple(
+    'PriorityClass', ['name', 'priority', 'max_concurrency', 'queue_slo', 'timeout', 'max_queue', 'shed']
+)
+
+MEDICATION = 'medication'
+REMINDER = 'reminder'
+CHAT = 'chat'
+
+PRIORITY_CLASSES = {
+    MEDICATION: PriorityClass(MEDICATION, 0, 10, 1.0, DEFAULT_JOB_TIMEOUT, None, False),
+    REMINDER: PriorityClass(REMINDER, 1, DEFAULT_MAX_CONCURRENCY, 30.0, DEFAULT_JOB_TIMEOUT, None, False),
+    CHAT: PriorityClass(CHAT, 2, 8, 10.0, 120, 50, True),
+}
+
+# Класс приоритета для типов напоминаний (по умолчанию REMINDER)
+REMINDER_PRIORITIES = {
+    'medicine': MEDICATION,
+}
+
+# Класс текущей задачи — по нему очередь доставки выбирает порядок отправки
+current_priority = contextvars.ContextVar('current_priority', default=REMINDER)
+
+
+class FireContext:
+    """Срабатывание слота диспетчера: ключ идемпотентности для исходящих сообщений"""
+    __slots__ = ('job_id', 'planned', 'sends')
+
+    def __init__(self, job_id, planned):
+        self.job_id = job_id
+        self.planned = planned
+        self.sends = 0
+
+    def next_slot_key(self):
+        """Ключ слота для очередного сообщения этого срабатывания"""
+        key = self.planned.isoformat()
+        if self.sends:
+            key = f"{key}#{self.sends}"
+        self.sends += 1
+        return key
+
+
+# Текущее срабатывание (None — сообщение отправлено вне диспетчера)
+current_fire = contextvars.ContextVar('current_fire', default=None)
+# Сборщик сводки: сообщения срабатываний пользователя в режиме сводки копятся в нем, а не отправляются
+current_digest = contextvars.ContextVar('current_digest', default=None)
+
+
+def make_job_id(reminder_type, user_id, slot_id):
+    """Уникальный ID задачи для пары пользователь × слот напоминания"""
+    return f"{reminder_type}:{user_id}:{slot_id}"
+
+
+def job_user_id(job_id):
+    """ID пользователя из ID задачи (тип:пользователь:слот)"""
+    return int(job_id.split(':', 2)[1])
+
+
+def priority_for(reminder_type):
+    return REMINDER_PRIORITIES.get(reminder_type, REMINDER)
+
+
+def priority_rank(name):
+    return PRIORITY_CLASSES[name].priority
+
+
+class WorkShed(Exception):
+    """Задача отброшена из-за перегрузки"""
+
+
+class _ClassState:
+    __slots__ = ('spec', 'running', 'waiting', 'completed', 'shed', 'slo_violations')
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.running = 0
+        self.waiting = deque()
+        self.completed = 0
+        self.shed = 0
+        self.slo_violations = 0
+
+
+class JobRunner:
+    """Единый слой выполнения задач на основном цикле событий с классами приоритета
+
+    У каждого класса свой лимит параллельности и SLO на ожидание в очереди.
+    Пока более важный класс ждет слота, менее важные не запускаются;
+    чат при переполнении очереди или нарушении SLO отбрасывается.
+    """
+
+    def __init__(self, classes=None):
+        self._classes = {}
+        self._ordered = []
+        self.configure(classes=classes or PRIORITY_CLASSES)
+
+    def configure(self, max_concurrency=None, job_timeout=None, classes=None):
+        """Изменение лимитов до запуска диспетчера"""
+        classes = dict(classes or {name: state.spec for name, state in self._classes.items()})
+        if max_concurrency:
+            classes[REMINDER] = classes[REMINDER]._replace(max_concurrency=max_concurrency)
+        if job_timeout:
+            for name in (MEDICATION, REMINDER):
+                classes[name] = classes[name]._replace(timeout=job_timeout)
+        self._classes = {name: _ClassState(spec) for name, spec in classes.items()}
+        self._ordered = sorted(self._classes.values(), key=lambda state: state.spec.priority)
+
+    @property
+    def running(self):
+        return sum(state.running for state in self._classes.values())
+
+    def stats(self):
+        return {
+            name: {
+                'running': state.running,
+                'queued': len(state.waiting),
+                'completed': state.completed,
+                'shed': state.shed,
+                'slo_violations': state.slo_violations,
+            }
+            for name, state in self._classes.items()
+        }
+
+    def _blocked_by_higher(self, state):
+        for other in self._ordered:
+            if other is state:
+                return False
+            if other.waiting:
+                return True
+        return False
+
+    def _pump(self):
+        """Выдача освободившихся слотов ожидающим — строго по приоритету"""
+        for state in self._ordered:
+            while state.waiting and state.running < state.spec.max_concurrency:
+                if self._blocked_by_higher(state):
+                    return
+                future = state.waiting.popleft()
+                if future.done():
+                    continue
+                state.running += 1
+                future.set_result(None)
+
+    async def _acquire(self, state, job_id):
+        spec = state.spec
+        if (state.running < spec.max_concurrency and not state.waiting
+                and not self._blocked_by_higher(state)):
+            state.running += 1
+            return
+        if spec.shed and spec.max_queue is not None and len(state.waiting) >= spec.max_queue:
+            state.shed += 1
+            raise WorkShed(f"очередь {spec.name} переполнена")
+
+        future = asyncio.get_running_loop().create_future()
+        state.waiting.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=spec.queue_slo)
+        except asyncio.TimeoutError:
+            state.slo_violations += 1
+            if spec.shed:
+                self._cancel_waiter(state, future)
+                state.shed += 1
+                raise WorkShed(f"{spec.name}: ожидание в очереди дольше {spec.queue_slo} с")
+            logger.warning(f"Задача {job_id} ждет в очереди {spec.name} дольше SLO ({spec.queue_slo} с)")
+            await future
+        except asyncio.CancelledError:
+            self._cancel_waiter(state, future)
+            raise
+
+    def _cancel_waiter(self, state, future):
+        if future.done() and not future.cancelled():
+            # Слот уже был выдан — возвращаем его
+            state.running -= 1
+            self._pump()
+            return
+        future.cancel()
+        try:
+            state.waiting.remove(future)
+        except ValueError:
+            pass
+        self._pump()
+
+    def _release(self, state):
+        state.running -= 1
+        state.completed += 1
+        self._pump()
+
+    async def submit(self, priority, coro_func, *args, job_id=None):
+        """Выполнение корутины в своем классе приоритета; ошибки и WorkShed пробрасываются"""
+        state = self._classes[priority]
+        job_id = job_id or getattr(coro_func, '__name__', 'job')
+        await self._acquire(state, job_id)
+        token = current_priority.set(priority)
+        try:
+            return await asyncio.wait_for(coro_func(*args), timeout=state.spec.timeout)
+        finally:
+            current_priority.reset(token)
+            self._release(state)
+
+    async def run(self, job_id, coro_func, *args, priority=REMINDER):
+        """Выполнение задачи диспетчера: ошибки логируются и не выходят наружу"""
+        started = time.monotonic()
+        try:
+            await self.submit(priority, coro_func, *args, job_id=job_id)
+            latency = time.monotonic() - started
+            logger.debug(f"Задача {job_id} выполнена за {latency:.3f} с",
+                         extra={'job_id': job_id, 'latency': round(latency, 4)})
+        except asyncio.TimeoutError:
+            ERRORS.labels('job', 'timeout').inc()
+            logger.error(f"Задача {job_id} прервана по таймауту ({self._classes[priority].spec.timeout} с)")
+        except WorkShed as e:
+            ERRORS.labels('job', 'shed').inc()
+            logger.warning(f"Задача {job_id} отброшена: {e}")
+        except Exception as e:
+            ERRORS.labels('job', 'error').inc()
+            logger.error(f"Ошибка в задаче {job_id}: {e}")
+
+
+# Общий экземпляр для всех трекеров и чата
+job_runner = JobRunner()
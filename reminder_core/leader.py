@@ -0,0 +1,146 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки аренды лидерства
+LEASE_NAME = 'reminder-dispatcher'
+LEASE_TTL = 10
+RENEW_INTERVAL = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    acquired_at REAL NOT NULL
+);
+"""
+
+
+class LeaseStore:
+    """Аренда лидерства в SQLite: строка с владельцем и сроком действия"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def try_acquire(self, name, holder, ttl):
+        """Захват или продление аренды; True — этот процесс лидер"""
+        now = time.time()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            row = self.conn.execute(
+                "SELECT holder, expires_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            if row is not None and row['holder'] != holder and row['expires_at'] > now:
+                self.conn.rollback()
+                return False
+            acquired_at = now if row is None or row['holder'] != holder else None
+            self.conn.execute(
+                "INSERT INTO leases (name, holder, expires_at, acquired_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at, "
+                "acquired_at = COALESCE(?, leases.acquired_at)",
+                (name, holder, now + ttl, now, acquired_at)
+            )
+            self.conn.commit()
+            return True
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def release(self, name, holder):
+        with self.conn:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def holder(self, name):
+        row = self.conn.execute(
+            "SELECT holder, expires_at FROM leases WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None or row['expires_at'] <= time.time():
+            return None
+        return row['holder']
+
+
+class LeaderElector:
+    """Выбор единственного лидера среди процессов с продлением аренды (heartbeat)
+
+    on_elected / on_demoted — корутины, вызываемые при получении и потере лидерства.
+    Резервный процесс забирает аренду не позже чем через LEASE_TTL + RENEW_INTERVAL секунд.
+    """
+
+    def __init__(self, store, on_elected, on_demoted, name=LEASE_NAME, holder=None,
+                 ttl=LEASE_TTL, renew_interval=RENEW_INTERVAL):
+        self.store = store
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.is_leader = False
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+            await asyncio.to_thread(self.store.release, self.name, self.holder)
+
+    async def _set_leader(self, is_leader):
+        self.is_leader = is_leader
+        if is_leader:
+            logger.info(f"👑 {self.holder} стал лидером ({self.name})")
+            await self.on_elected()
+        else:
+            logger.warning(f"{self.holder} потерял лидерство ({self.name})")
+            await self.on_demoted()
+
+    async def _run(self):
+        while True:
+            try:
+                acquired = await asyncio.to_thread(self.store.try_acquire, self.name, self.holder, self.ttl)
+            except Exception as e:
+                logger.error(f"Ошибка продления аренды лидера: {e}")
+                acquired = False
+            if acquired != self.is_leader:
+                try:
+                    await self._set_leader(acquired)
+                except Exception as e:
+                    logger.error(f"Ошибка при смене лидерства: {e}")
+            await asyncio.sleep(self.renew_interval)
+
+
+
+async def watch_leader(store, name=LEASE_NAME, interval=60):
+    """Проверка для веб-процесса: лидер напоминаний продлевает аренду в той же базе
+
+    Кнопки и команды пишут в локальную базу, а повторы и эскалации планирует лидер. Если лидер
+    работает с другим файлом базы, подтверждения до него не доходят — об этом пишется ошибка.
+    """
+    missing = False
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            holder = await asyncio.to_thread(store.holder, name)
+        except Exception as e:
+            logger.error(f"Не удалось проверить аренду лидера: {e}")
+            continue
+        if holder is None and not missing:
+            logger.error(f"Нет лидера ({name}) в общей базе: подтверждения, /subscribe, /quiet, /digest и "
+                         f"отметки воды не дойдут до напоминаний. Веб и воркер должны работать с одним REMINDER_DB")
+        elif holder is not None and missing:
+            logger.info(f"Лидер {holder} снова виден в общей базе")
+        missing = holder is None
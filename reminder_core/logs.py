@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import heapq
+import logging
+import threading
+import contextvars
+import logging.handlers
+from collections import deque, namedtuple
+from datetime import datetime
+
+from .jobs import current_fire
+
+# Настройки конвейера логов
+RING_CAPACITY = 5000
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Поля контекста, которые попадают в структурированную запись
+CONTEXT_FIELDS = ('job_id', 'user_id', 'latency')
+
+# Запись кольцевого буфера (строки уже готовы к показу — форматирование один раз, в потоке логов)
+LogEntry = namedtuple('LogEntry', ['seq', 'created', 'levelno', 'level', 'logger', 'message', 'fields'])
+
+# Контекст текущей задачи/запроса (например, пользователь чата) для всех строк лога внутри него
+log_context = contextvars.ContextVar('log_context', default=None)
+
+
+def bind_log_context(**fields):
+    """Добавление полей ко всем записям текущего контекста (задачи asyncio)"""
+    context = dict(log_context.get() or {})
+    context.update(fields)
+    return log_context.set(context)
+
+
+class ContextFilter(logging.Filter):
+    """Заполняет job_id/user_id из контекста — выполняется в потоке, который пишет в лог"""
+
+    def filter(self, record):
+        context = log_context.get()
+        if context:
+            for name, value in context.items():
+                if getattr(record, name, None) is None:
+                    setattr(record, name, value)
+        fire = current_fire.get()
+        if fire is not None:
+            if getattr(record, 'job_id', None) is None:
+                record.job_id = fire.job_id
+            if getattr(record, 'user_id', None) is None:
+                # ID задачи: тип:пользователь:слот
+                parts = fire.job_id.split(':')
+                if len(parts) >= 2 and parts[1].lstrip('-').isdigit():
+                    record.user_id = int(parts[1])
+        return True
+
+
+def record_fields(record):
+    return {name: getattr(record, name) for name in CONTEXT_FIELDS if getattr(record, name, None) is not None}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля контекста"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(record_fields(record))
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogRingBuffer:
+    """Последние записи в памяти с индексом по уровню и логгеру
+
+    Индекс хранит номера живых записей: вытесненная из буфера запись сразу удаляется
+    из начала своих очередей индекса, поэтому он не растет сверх capacity.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)
+        self._by_level = {}
+        self._by_logger = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, record):
+        with self._lock:
+            self._seq += 1
+            entry = LogEntry(self._seq, record.created, record.levelno, record.levelname,
+                             record.name, record.getMessage(), record_fields(record))
+            if len(self._entries) == self.capacity:
+                evicted = self._entries[0]
+                self._unindex(self._by_level, evicted.levelno)
+                self._unindex(self._by_logger, evicted.logger)
+            self._entries.append(entry)
+            self._by_level.setdefault(record.levelno, deque()).append(entry.seq)
+            self._by_logger.setdefault(record.name, deque()).append(entry.seq)
+
+    @staticmethod
+    def _unindex(index, key):
+        # Номера в очереди индекса возрастают: самая старая запись всегда первая
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+    def _first_seq(self):
+        return self._entries[0].seq if self._entries else self._seq + 1
+
+    @staticmethod
+    def _candidates(index, keys):
+        """Номера записей из индекса по выбранным ключам (от новых к старым)"""
+        return heapq.merge(*(reversed(index[key]) for key in keys), reverse=True)
+
+    def query(self, min_level=logging.NOTSET, logger_prefix=None, limit=20):
+        """Последние limit записей не ниже min_level из логгеров с префиксом logger_prefix"""
+        with self._lock:
+            if not self._entries:
+                return []
+            first_seq = self._first_seq()
+            levels = [level for level in self._by_level if level >= min_level]
+            if logger_prefix:
+                loggers = {name for name in self._by_logger
+                           if name == logger_prefix or name.startswith(logger_prefix + '.')}
+                candidates = self._candidates(self._by_logger, loggers)
+                allowed_levels = set(levels)
+            else:
+                candidates = self._candidates(self._by_level, levels)
+                allowed_levels = None
+            result = []
+            for seq in candidates:
+                entry = self._entries[seq - first_seq]
+                if allowed_levels is not None and entry.levelno not in allowed_levels:
+                    continue
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+            result.reverse()
+            return result
+
+    def counts(self):
+        """Число записей в буфере по уровням"""
+        with self._lock:
+            return {logging.getLevelName(level): len(seqs) for level, seqs in sorted(self._by_level.items())}
+
+
+class RingBufferHandler(logging.Handler):
+    def __init__(self, ring):
+        super().__init__()
+        self.ring = ring
+
+    def emit(self, record):
+        try:
+            self.ring.append(record)
+        except Exception:
+            self.handleError(record)
+
+
+# Буфер процесса: из него читает команда /logs
+log_ring = LogRingBuffer()
+_listener = None
+
+
+def setup_logging(level=logging.INFO, fmt=LOG_FORMAT):
+    """Логи уходят в очередь без блокировки цикла событий; вывод и буфер — в потоке QueueListener"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler(sys.stdout)
+    if fmt == 'json':
+        console.setFormatter(JsonFormatter())
+    else:
+        console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, console, RingBufferHandler(log_ring))
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,204 @@
+import math
+import logging
+from bisect import bisect_left
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм (секунды): от быстрых вызовов API до минутного опоздания
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _HistogramChild:
+    """Счетчики корзин выделяются один раз; observe — бинарный поиск и два сложения"""
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _LabeledMetric(_Metric):
+    """Метрика с дочерними инструментами по меткам; подкласс задает _new_child и _render_child"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._children = {}
+
+    def labels(self, *values):
+        """Дочерний инструмент для набора меток (создается один раз, ссылку можно хранить)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_LabeledMetric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_LabeledMetric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(_Metric):
+    """Значение читается функцией в момент запроса /metrics — на горячем пути ничего не стоит
+
+    Функция возвращает число (без меток) или словарь {кортеж меток: значение}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def labels(self, *values):
+        raise TypeError(f"{self.name}: у gauge нет дочерних инструментов — значения по меткам возвращает function")
+
+    def render(self):
+        lines = self._header()
+        if self.function is None:
+            return lines
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.error(f"Ошибка чтения метрики {self.name}: {e}")
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, number in items:
+            if number is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(number)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        gauge = self._register(Gauge(name, documentation, labelnames))
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр процесса
+metrics = MetricsRegistry()
+
+# Инструменты горячих путей объявлены заранее, чтобы модули не создавали их на лету
+SEND_LATENCY = metrics.histogram(
+    'reminder_send_seconds', 'Длительность вызова send_message по типу напоминания', ('type',)
+)
+FIRE_LAG = metrics.histogram(
+    'scheduler_fire_lag_seconds', 'Опоздание запуска задачи относительно плана по типу напоминания', ('type',),
+    LAG_BUCKETS
+)
+OPENAI_TTFT = metrics.histogram('openai_time_to_first_token_seconds', 'Время до первого фрагмента ответа OpenAI')
+OPENAI_LATENCY = metrics.histogram('openai_request_seconds', 'Полное время ответа OpenAI', ('kind',))
+ERRORS = metrics.counter('errors_total', 'Ошибки по компонентам', ('component', 'kind'))
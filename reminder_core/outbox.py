@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import threading
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden
+
+from .jobs import current_priority, priority_rank, PRIORITY_CLASSES
+from .metrics import ERRORS
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки доставки из outbox
+POLL_INTERVAL = 5
+CLAIM_BATCH = 50
+CLAIM_LEASE = 120
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5
+BACKOFF_CAP = 600
+RETENTION = 7 * 24 * 3600
+CLEANUP_INTERVAL = 3600
+
+PENDING = 'pending'
+SENDING = 'sending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    reminder_id TEXT NOT NULL,
+    scheduled_slot TEXT NOT NULL,
+    text TEXT NOT NULL,
+    options TEXT,
+    priority INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    delivered_at REAL,
+    UNIQUE (user_id, reminder_id, scheduled_slot)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+# Ошибки, которые не исправятся повтором (бот заблокирован, чата нет)
+PERMANENT_ERRORS = (Forbidden, BadRequest)
+
+
+def backoff_delay(attempts):
+    """Экспоненциальная задержка с "полным" джиттером"""
+    return random.uniform(BACKOFF_BASE, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempts))
+
+
+def _rank_to_priority(rank):
+    for name, spec in PRIORITY_CLASSES.items():
+        if spec.priority == rank:
+            return name
+    return None
+
+
+class Outbox:
+    """Постоянный outbox напоминаний: одно сообщение на (пользователь, напоминание, слот)
+
+    Повторное срабатывание того же слота (второй процесс, рестарт) ничего не отправит,
+    а сетевые ошибки приводят к повторам с экспоненциальной задержкой.
+    Запросы к SQLite выполняются в потоках (asyncio.to_thread) под общей блокировкой соединения;
+    сообщения, поставленные, пока идет запись, попадают в следующую транзакцию одним пакетом.
+    """
+
+    def __init__(self, conn, engine, worker_id=None):
+        self.conn = conn
+        self.engine = engine
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.bot = None
+        self._wakeup = None
+        self._task = None
+        self._last_cleanup = 0.0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        # Ожидающие записи строки: (параметры INSERT, future с результатом)
+        self._batch = []
+        self._writer = None
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    async def enqueue(self, user_id, fire, text, options=None):
+        """Запись сообщения срабатывания; False — этот слот уже есть в outbox
+
+        Возвращает управление после коммита: к этому моменту сообщение сохранено.
+        """
+        now = time.time()
+        params = (user_id, fire.job_id, fire.next_slot_key(), text, self._dump_options(options),
+                  priority_rank(current_priority.get()), now, now)
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((params, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_batches())
+        if not await future:
+            self.duplicates += 1
+            logger.info(f"Напоминание {fire.job_id} для {user_id} уже в outbox — повтор пропущен")
+            return False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def _write_batches(self):
+        """Групповая запись: одна транзакция на все строки, накопившиеся к началу записи"""
+        while self._batch:
+            batch, self._batch = self._batch, []
+            try:
+                inserted = await asyncio.to_thread(self.insert_rows, [params for params, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, inserted):
+                if not future.done():
+                    future.set_result(result)
+
+    def insert_rows(self, rows):
+        """Вставка пакета строк в одной транзакции; для каждой — True, если слот новый"""
+        with self._lock:
+            try:
+                inserted = [
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO outbox "
+                        "(user_id, reminder_id, scheduled_slot, text, options, priority, next_attempt_at, "
+                        "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        row
+                    ).rowcount > 0
+                    for row in rows
+                ]
+                self.conn.commit()
+                return inserted
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def claim(self, limit=CLAIM_BATCH):
+        """Атомарный захват готовых к отправке строк этим воркером"""
+        with self._lock:
+            now = time.time()
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                rows = self.conn.execute(
+                    "SELECT id, user_id, reminder_id, text, options, priority, attempts FROM outbox "
+                    "WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                    "AND (claimed_until IS NULL OR claimed_until < ?) "
+                    "ORDER BY priority, next_attempt_at LIMIT ?",
+                    (PENDING, SENDING, now, now, limit)
+                ).fetchall()
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE outbox SET status = ?, claimed_by = ?, claimed_until = ? WHERE id = ?",
+                        [(SENDING, self.worker_id, now + CLAIM_LEASE, row['id']) for row in rows]
+                    )
+                self.conn.commit()
+                return rows
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def mark_delivered(self, row_id):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, delivered_at = ?, claimed_by = NULL, claimed_until = NULL "
+                "WHERE id = ? AND claimed_by = ?",
+                (DELIVERED, time.time(), row_id, self.worker_id)
+            )
+            self.conn.commit()
+
+    def mark_failed(self, row_id, attempts, error, permanent=False):
+        attempts += 1
+        if permanent or attempts >= MAX_ATTEMPTS:
+            status, next_attempt = FAILED, time.time()
+        else:
+            status, next_attempt = PENDING, time.time() + backoff_delay(attempts)
+        with self._lock:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                "claimed_by = NULL, claimed_until = NULL WHERE id = ? AND claimed_by = ?",
+                (status, attempts, next_attempt, str(error)[:500], row_id, self.worker_id)
+            )
+            self.conn.commit()
+        return status
+
+    def stats(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) AS total FROM outbox GROUP BY status").fetchall()
+        stats = {row['status']: row['total'] for row in rows}
+        stats['duplicates_skipped'] = self.duplicates
+        return stats
+
+    def start(self, bot):
+        """Запуск воркера доставки на текущем цикле событий"""
+        if self._task is None:
+            self.bot = bot
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Outbox запущен (воркер {self.worker_id})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @staticmethod
+    def _dump_options(options):
+        if not options:
+            return None
+        options = dict(options)
+        if isinstance(options.get('reply_markup'), InlineKeyboardMarkup):
+            options['reply_markup'] = options['reply_markup'].to_dict()
+        return json.dumps(options, ensure_ascii=False)
+
+    def _load_options(self, raw):
+        if not raw:
+            return {}
+        options = json.loads(raw)
+        if 'reply_markup' in options:
+            options['reply_markup'] = InlineKeyboardMarkup.de_json(options['reply_markup'], self.bot)
+        return options
+
+    async def _deliver(self, row):
+        priority = _rank_to_priority(row['priority'])
+        if priority is not None:
+            current_priority.set(priority)
+        try:
+            await self.engine.send_now(self.bot, row['user_id'], row['text'],
+                                       kind=row['reminder_id'].split(':', 1)[0],
+                                       **self._load_options(row['options']))
+        except Exception as e:
+            status = await asyncio.to_thread(self.mark_failed, row['id'], row['attempts'], e,
+                                             isinstance(e, PERMANENT_ERRORS))
+            ERRORS.labels('outbox', status).inc()
+            log = logger.error if status == FAILED else logger.warning
+            log(f"Напоминание {row['reminder_id']} для {row['user_id']} не доставлено "
+                f"(попытка {row['attempts'] + 1}, статус {status}): {e}")
+        else:
+            await asyncio.to_thread(self.mark_delivered, row['id'])
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM outbox WHERE status IN (?, ?) AND created_at < ?",
+                (DELIVERED, FAILED, now - RETENTION)
+            )
+            self.conn.commit()
+
+    async def _run(self):
+        while True:
+            try:
+                rows = await asyncio.to_thread(self.claim)
+                if rows:
+                    # Каждая строка — отдельная задача со своим контекстом приоритета
+                    await asyncio.gather(*(asyncio.create_task(self._deliver(row)) for row in rows))
+                    continue
+                await asyncio.to_thread(self._cleanup)
+            except Exception as e:
+                logger.error(f"Ошибка воркера outbox: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
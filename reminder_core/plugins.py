@@ -0,0 +1,89 @@
+import time
+import logging
+import importlib
+from collections import namedtuple
+from collections.abc import Mapping
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Описание трекера в манифесте: точка входа "модуль:функция настройки",
+# часовой пояс по умолчанию, описание для пользователя и владелец (owner) для личных трекеров:
+# трекер с одним общим файлом данных подключается только владельцу, а не через /subscribe любому.
+# Модуль трекера импортируется только при первой подписке на него.
+TrackerSpec = namedtuple('TrackerSpec', ['entry_point', 'default_timezone', 'description', 'owner'],
+                         defaults=(None,))
+
+
+class PluginStats:
+    """Стоимость плагина: время импорта и суммарное время настройки слотов"""
+    __slots__ = ('import_seconds', 'setup_seconds', 'setup_calls')
+
+    def __init__(self):
+        self.import_seconds = None
+        self.setup_seconds = 0.0
+        self.setup_calls = 0
+
+
+class PluginRegistry(Mapping):
+    """Декларативный реестр трекеров с ленивым импортом
+
+    Ведет себя как словарь {тип: TrackerSpec}, поэтому список типов и описания
+    доступны без импорта самих трекеров.
+    """
+
+    def __init__(self, manifest):
+        self._manifest = dict(manifest)
+        self._setups = {}
+        self._modules = {}
+        self._stats = {name: PluginStats() for name in self._manifest}
+
+    def __getitem__(self, name):
+        return self._manifest[name]
+
+    def __iter__(self):
+        return iter(self._manifest)
+
+    def __len__(self):
+        return len(self._manifest)
+
+    def is_loaded(self, name):
+        return name in self._modules
+
+    def module(self, name):
+        """Модуль трекера (импорт при первом обращении)"""
+        module = self._modules.get(name)
+        if module is None:
+            module_path = self._manifest[name].entry_point.split(':', 1)[0]
+            started = time.perf_counter()
+            module = importlib.import_module(module_path)
+            self._stats[name].import_seconds = time.perf_counter() - started
+            self._modules[name] = module
+            logger.info(f"🧩 Плагин {name} загружен за {self._stats[name].import_seconds * 1000:.1f} мс")
+        return module
+
+    def setup(self, name, *args):
+        """Вызов функции настройки трекера с учетом времени"""
+        setup = self._setups.get(name)
+        if setup is None:
+            setup = self._setups[name] = getattr(self.module(name), self._manifest[name].entry_point.split(':', 1)[1])
+        started = time.perf_counter()
+        try:
+            return setup(*args)
+        finally:
+            stats = self._stats[name]
+            stats.setup_seconds += time.perf_counter() - started
+            stats.setup_calls += 1
+
+    def report(self):
+        """Разбивка стартовых затрат по плагинам"""
+        lines = []
+        for name, stats in self._stats.items():
+            if stats.import_seconds is None:
+                lines.append(f"   {name}: не загружен (нет подписок)")
+                continue
+            lines.append(
+                f"   {name}: импорт {stats.import_seconds * 1000:.1f} мс, "
+                f"настройка {stats.setup_seconds * 1000:.1f} мс ({stats.setup_calls} подписок)"
+            )
+        return "\n".join(lines)
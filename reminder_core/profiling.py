@@ -0,0 +1,226 @@
+import gc
+import os
+import time
+import asyncio
+import logging
+import resource
+import tracemalloc
+from collections import deque, namedtuple
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Настройки профилирования памяти
+DEFAULT_FRAMES = 1
+DEFAULT_TOP = 10
+MAX_TOP = 30
+MAX_SNAPSHOTS = 2
+SAMPLES_LIMIT = 240
+MIN_SAMPLE_INTERVAL = 5
+
+# Замер памяти: RSS процесса, память под tracemalloc (если включен) и число объектов gc
+MemorySample = namedtuple('MemorySample', ['taken_at', 'rss', 'traced', 'objects'])
+
+# Служебные аллокации самого профилировщика в отчет не попадают
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def current_rss():
+    """Текущий RSS в байтах (Linux); иначе — пиковый RSS из getrusage"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_size(size):
+    sign = '-' if size < 0 else ''
+    size = abs(size)
+    for unit in ('Б', 'КиБ', 'МиБ'):
+        if size < 1024:
+            return f"{sign}{size:.0f} {unit}" if unit == 'Б' else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+    return f"{sign}{size:.1f} ГиБ"
+
+
+class MemoryProfiler:
+    """Профилирование памяти по запросу: по умолчанию tracemalloc выключен и ничего не стоит"""
+
+    def __init__(self):
+        self._snapshots = deque(maxlen=MAX_SNAPSHOTS)
+        self.samples = deque(maxlen=SAMPLES_LIMIT)
+        self._sampler = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=DEFAULT_FRAMES):
+        if self.tracing:
+            return False
+        tracemalloc.start(frames)
+        logger.info(f"tracemalloc включен (глубина стека {frames})")
+        return True
+
+    def stop(self):
+        """Выключение tracemalloc; снимки освобождаются вместе с ним"""
+        if not self.tracing:
+            return False
+        tracemalloc.stop()
+        self._snapshots.clear()
+        logger.info("tracemalloc выключен")
+        return True
+
+    async def snapshot(self):
+        """Снимок выделений памяти (в отдельном потоке — снимок большой кучи занимает время)"""
+        if not self.tracing:
+            raise RuntimeError("tracemalloc не включен")
+        snapshot = await asyncio.to_thread(
+            lambda: tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        )
+        self._snapshots.append(snapshot)
+        return len(snapshot.traces)
+
+    async def top_diff(self, limit=DEFAULT_TOP):
+        """Наибольший прирост памяти между двумя последними снимками по файлу и строке"""
+        if len(self._snapshots) < 2:
+            raise RuntimeError("нужно два снимка")
+        old, new = self._snapshots
+        stats = await asyncio.to_thread(new.compare_to, old, 'lineno')
+        return stats[:limit]
+
+    def sample(self):
+        traced = tracemalloc.get_traced_memory()[0] if self.tracing else None
+        sample = MemorySample(time.time(), current_rss(), traced, len(gc.get_objects()))
+        self.samples.append(sample)
+        return sample
+
+    def start_sampling(self, interval):
+        """Периодический замер RSS и кучи на текущем цикле событий"""
+        self.stop_sampling()
+        self._sampler = asyncio.get_running_loop().create_task(self._sample_loop(max(MIN_SAMPLE_INTERVAL, interval)))
+
+    def stop_sampling(self):
+        if self._sampler is None:
+            return False
+        self._sampler.cancel()
+        self._sampler = None
+        return True
+
+    @property
+    def sampling(self):
+        return self._sampler is not None
+
+    async def _sample_loop(self, interval):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Ошибка замера памяти: {e}")
+            await asyncio.sleep(interval)
+
+    def status(self):
+        current = self.sample()
+        lines = [
+            f"🧠 RSS: {format_size(current.rss)}, объектов: {current.objects}",
+            f"tracemalloc: {'включен' if self.tracing else 'выключен'}, снимков: {len(self._snapshots)}",
+        ]
+        if current.traced is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            lines.append(f"Отслеживается: {format_size(current.traced)} (пик {format_size(peak)})")
+        if self.sampling or len(self.samples) > 1:
+            first = self.samples[0]
+            lines.append(
+                f"Замеры: {len(self.samples)} за {(current.taken_at - first.taken_at) / 60:.0f} мин, "
+                f"RSS {format_size(min(s.rss for s in self.samples))}–{format_size(max(s.rss for s in self.samples))}, "
+                f"прирост {format_size(current.rss - first.rss)}"
+            )
+        return "\n".join(lines)
+
+
+def _short_path(filename):
+    """Путь относительно проекта, для библиотек — только пакет и файл"""
+    if not os.path.isabs(filename):
+        return filename
+    relative = os.path.relpath(filename)
+    if not relative.startswith('..'):
+        return relative
+    return os.path.join(*filename.split(os.sep)[-2:])
+
+
+def _format_diff(stats):
+    lines = []
+    for stat in stats:
+        frame = stat.traceback[0]
+        filename = _short_path(frame.filename)
+        lines.append(f"{filename}:{frame.lineno}: {format_size(stat.size_diff)} ({stat.count_diff:+d} блоков)")
+    return "\n".join(lines) or "Изменений нет"
+
+
+MEMPROF_HELP = (
+    "Использование: /memprof <команда>\n"
+    "start [глубина] — включить tracemalloc\n"
+    "snapshot — снять снимок\n"
+    "diff [N] — топ-N прироста между двумя последними снимками\n"
+    "sample <секунды> | sample off — периодический замер RSS и кучи\n"
+    "status — текущая память\n"
+    "stop — выключить tracemalloc"
+)
+
+
+def setup_profiling_handlers(application, profiler, admin_id):
+    """Команда /memprof (только для администратора)"""
+
+    async def memprof_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if update.effective_user.id != admin_id:
+            await update.message.reply_text("⛔ Команда доступна только администратору")
+            return
+        args = context.args or ['status']
+        action, params = args[0].lower(), args[1:]
+        try:
+            if action == 'start':
+                frames = int(params[0]) if params else DEFAULT_FRAMES
+                started = profiler.start(frames)
+                reply = "✅ tracemalloc включен" if started else "tracemalloc уже включен"
+            elif action == 'stop':
+                reply = "🛑 tracemalloc выключен" if profiler.stop() else "tracemalloc и так выключен"
+            elif action == 'snapshot':
+                traces = await profiler.snapshot()
+                reply = f"📸 Снимок сохранен ({traces} выделений)"
+            elif action == 'diff':
+                limit = min(MAX_TOP, int(params[0])) if params else DEFAULT_TOP
+                reply = "📈 Прирост памяти:\n" + _format_diff(await profiler.top_diff(limit))
+            elif action == 'sample':
+                if params and params[0].lower() == 'off':
+                    profiler.stop_sampling()
+                    reply = "Замеры остановлены"
+                else:
+                    interval = int(params[0]) if params else 60
+                    profiler.start_sampling(interval)
+                    reply = f"⏱️ Замер памяти каждые {max(MIN_SAMPLE_INTERVAL, interval)} с"
+            elif action == 'status':
+                reply = profiler.status()
+            else:
+                reply = MEMPROF_HELP
+        except (RuntimeError, ValueError) as e:
+            reply = f"❌ {e}"
+        logger.info(f"[ID: {update.effective_user.id}] /memprof {' '.join(args)}")
+        await update.message.reply_text(reply)
+
+    application.add_handler(CommandHandler("memprof", memprof_command))
+
+
+# Общий профилировщик процесса
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,114 @@
+import json
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+Subscription = namedtuple('Subscription', ['user_id', 'reminder_type', 'timezone', 'schedule'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id INTEGER NOT NULL,
+    reminder_type TEXT NOT NULL,
+    timezone TEXT NOT NULL,
+    schedule TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, reminder_type)
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_active_type
+    ON subscriptions (active, reminder_type);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_updated
+    ON subscriptions (updated_at);
+"""
+
+
+def _row_to_subscription(row):
+    schedule = json.loads(row['schedule']) if row['schedule'] else None
+    return Subscription(row['user_id'], row['reminder_type'], row['timezone'], schedule)
+
+
+class SubscriptionRegistry:
+    """Постоянный реестр подписок: пользователь × тип напоминания × расписание × часовой пояс"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def subscribe(self, user_id, reminder_type, timezone, schedule=None):
+        """Создание или повторная активация подписки"""
+        now = datetime.utcnow().isoformat()
+        schedule_json = json.dumps(schedule) if schedule else None
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO subscriptions (user_id, reminder_type, timezone, schedule, active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT (user_id, reminder_type) DO UPDATE SET
+                    timezone = excluded.timezone,
+                    schedule = excluded.schedule,
+                    active = 1,
+                    updated_at = excluded.updated_at
+                """,
+                (user_id, reminder_type, timezone, schedule_json, now, now)
+            )
+        return Subscription(user_id, reminder_type, timezone, schedule)
+
+    def unsubscribe(self, user_id, reminder_type):
+        """Отключение подписки, возвращает True если она была активна"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE subscriptions SET active = 0, updated_at = ? "
+                "WHERE user_id = ? AND reminder_type = ? AND active = 1",
+                (datetime.utcnow().isoformat(), user_id, reminder_type)
+            )
+        return cursor.rowcount > 0
+
+    def seed(self, user_id, reminder_type, timezone):
+        """Начальная подписка из переменных окружения (не трогает уже существующие строки)"""
+        now = datetime.utcnow().isoformat()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO subscriptions "
+                "(user_id, reminder_type, timezone, schedule, active, created_at, updated_at) "
+                "VALUES (?, ?, ?, NULL, 1, ?, ?)",
+                (user_id, reminder_type, timezone, now, now)
+            )
+
+    def active_subscriptions(self, reminder_types=None):
+        """Загрузка только активных подписок нужных типов"""
+        query = "SELECT user_id, reminder_type, timezone, schedule FROM subscriptions WHERE active = 1"
+        params = ()
+        if reminder_types:
+            reminder_types = list(reminder_types)
+            query += f" AND reminder_type IN ({', '.join('?' * len(reminder_types))})"
+            params = tuple(reminder_types)
+        return [_row_to_subscription(row) for row in self.conn.execute(query, params)]
+
+    def changes_since(self, updated_at):
+        """Подписки, измененные после updated_at (в том числе отключенные) — для синхронизации процессов"""
+        rows = self.conn.execute(
+            "SELECT user_id, reminder_type, timezone, schedule, active, updated_at FROM subscriptions "
+            "WHERE updated_at > ? ORDER BY updated_at",
+            (updated_at,)
+        )
+        return [(_row_to_subscription(row), bool(row['active']), row['updated_at']) for row in rows]
+
+    def user_subscriptions(self, user_id):
+        rows = self.conn.execute(
+            "SELECT user_id, reminder_type, timezone, schedule FROM subscriptions "
+            "WHERE user_id = ? AND active = 1 ORDER BY reminder_type",
+            (user_id,)
+        )
+        return [_row_to_subscription(row) for row in rows]
+
+    def count_by_type(self):
+        rows = self.conn.execute(
+            "SELECT reminder_type, COUNT(*) AS total FROM subscriptions "
+            "WHERE active = 1 GROUP BY reminder_type"
+        )
+        return {row['reminder_type']: row['total'] for row in rows}
@@ -0,0 +1,42 @@
+import os
+import json
+import sqlite3
+import logging
+import tempfile
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Общая база данных напоминаний
+DB_PATH = os.getenv("REMINDER_DB", "data/reminders.db")
+
+
+def connect(path=None):
+    """Открытие соединения с SQLite базой напоминаний"""
+    path = path or DB_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def write_json_atomic(path, data, indent=2):
+    """Запись JSON через временный файл + rename: файл никогда не остается записанным наполовину"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
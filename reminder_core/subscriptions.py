@@ -0,0 +1,246 @@
+import asyncio
+import logging
+from datetime import datetime
+
+import pytz
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from .triggers import WINDOW_KEYS, parse_window
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Как часто лидер подхватывает подписки, измененные другими процессами
+SYNC_INTERVAL = 5
+
+
+class SubscriptionManager:
+    """Связь реестра подписок с диспетчером: подключение трекеров без передеплоя
+
+    trackers — PluginRegistry: модуль трекера импортируется при первой подписке на него.
+    """
+
+    def __init__(self, registry, scheduler, bot, trackers):
+        self.registry = registry
+        self.scheduler = scheduler
+        self.bot = bot
+        self.trackers = trackers
+        self._synced_at = ''
+        self._sync_task = None
+
+    def available(self, user_id):
+        """Типы, на которые пользователь может подписаться (личные трекеры — только владельцу)"""
+        return [name for name, tracker in self.trackers.items() if tracker.owner in (None, user_id)]
+
+    def activate(self, subscription):
+        owner = self.trackers[subscription.reminder_type].owner
+        if owner not in (None, subscription.user_id):
+            # Подписка на личный трекер, оформленная до появления ограничения: слоты не заводятся
+            logger.warning(f"Подписка {subscription} на личный трекер пропущена: владелец {owner}")
+            return
+        self.trackers.setup(
+            subscription.reminder_type,
+            self.scheduler,
+            self.bot,
+            subscription.user_id,
+            pytz.timezone(subscription.timezone),
+            subscription.schedule
+        )
+
+    def load(self):
+        """Загрузка активных подписок известных трекеров при старте"""
+        self._synced_at = datetime.utcnow().isoformat()
+        subscriptions = self.registry.active_subscriptions(self.trackers)
+        for subscription in subscriptions:
+            try:
+                self.activate(subscription)
+            except Exception as e:
+                logger.error(f"Не удалось подключить подписку {subscription}: {e}")
+        logger.info(f"✅ Загружено подписок: {len(subscriptions)}")
+        return len(subscriptions)
+
+    def sync(self):
+        """Применение изменений реестра, сделанных другим процессом (например, веб-процессом)"""
+        changes = self.registry.changes_since(self._synced_at)
+        for subscription, active, updated_at in changes:
+            self._synced_at = updated_at
+            if subscription.reminder_type not in self.trackers:
+                continue
+            self.scheduler.remove_user_jobs(subscription.reminder_type, subscription.user_id)
+            if active:
+                try:
+                    self.activate(subscription)
+                except Exception as e:
+                    logger.error(f"Не удалось подключить подписку {subscription}: {e}")
+        if changes:
+            logger.info(f"🔄 Синхронизировано изменений подписок: {len(changes)}")
+        return len(changes)
+
+    def start_sync(self, interval=SYNC_INTERVAL):
+        if self._sync_task is None:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop(interval))
+
+    async def stop_sync(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    async def _sync_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Ошибка синхронизации подписок: {e}")
+
+    def _current_schedule(self, user_id, reminder_type):
+        for subscription in self.registry.user_subscriptions(user_id):
+            if subscription.reminder_type == reminder_type:
+                return subscription.schedule
+        return None
+
+    def subscribe(self, user_id, reminder_type, timezone=None):
+        tracker = self.trackers[reminder_type]
+        if tracker.owner not in (None, user_id):
+            raise PermissionError(f"Трекер {reminder_type} личный")
+        timezone = timezone or tracker.default_timezone
+        pytz.timezone(timezone)  # проверка до записи в реестр
+        # Тихие часы и активное окно пользователя сохраняются при переподписке
+        schedule = self._current_schedule(user_id, reminder_type) or {}
+        windows = {key: schedule[key] for key in WINDOW_KEYS if key in schedule}
+        subscription = self.registry.subscribe(user_id, reminder_type, timezone, windows or None)
+        self.scheduler.remove_user_jobs(reminder_type, user_id)
+        self.activate(subscription)
+        return subscription
+
+    def set_window(self, user_id, key, value):
+        """Тихие часы (key='quiet') или активное окно ('active') для всех подписок пользователя
+
+        value — '22:00-07:00' в местном времени подписки или None (снять окно).
+        Слоты пересчитываются сразу: подавленные срабатывания не попадают в очередь.
+        """
+        if key not in WINDOW_KEYS:
+            raise ValueError(f"Неизвестное окно: {key}")
+        parse_window(value)  # проверка до записи в реестр
+        updated = []
+        for subscription in self.registry.user_subscriptions(user_id):
+            if subscription.reminder_type not in self.trackers:
+                continue
+            schedule = dict(subscription.schedule or {})
+            if value:
+                schedule[key] = value
+            else:
+                schedule.pop(key, None)
+            subscription = self.registry.subscribe(user_id, subscription.reminder_type, subscription.timezone,
+                                                   schedule or None)
+            self.scheduler.remove_user_jobs(subscription.reminder_type, user_id)
+            self.activate(subscription)
+            updated.append(subscription)
+        return updated
+
+    def unsubscribe(self, user_id, reminder_type):
+        was_active = self.registry.unsubscribe(user_id, reminder_type)
+        self.scheduler.remove_user_jobs(reminder_type, user_id)
+        return was_active
+
+
+def _parse_subscribe_args(args, caller_id, admin_id):
+    """Разбор аргументов: <тип> [ID пользователя (только админ)] [часовой пояс]"""
+    reminder_type = args[0].lower()
+    user_id = caller_id
+    timezone = None
+    for arg in args[1:]:
+        if arg.lstrip('-').isdigit() and caller_id == admin_id:
+            user_id = int(arg)
+        else:
+            timezone = arg
+    return reminder_type, user_id, timezone
+
+
+def _format_windows(schedule):
+    schedule = schedule or {}
+    parts = [f"{label} {schedule[key]}" for key, label in (('quiet', "🌙"), ('active', "☀️")) if schedule.get(key)]
+    return f" {' '.join(parts)}" if parts else ""
+
+
+def setup_subscription_handlers(application, manager, admin_id):
+    """Команды /subscribe, /unsubscribe, /subscriptions, /quiet и /active"""
+
+    def types_help(user_id):
+        return ", ".join(manager.available(user_id))
+
+    async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        caller_id = update.effective_user.id
+        if not context.args:
+            await update.message.reply_text(
+                f"Использование: /subscribe <тип> [часовой пояс]\nТипы: {types_help(caller_id)}"
+            )
+            return
+        reminder_type, user_id, timezone = _parse_subscribe_args(context.args, caller_id, admin_id)
+        if reminder_type not in manager.available(user_id):
+            await update.message.reply_text(f"❌ Неизвестный тип. Доступно: {types_help(user_id)}")
+            return
+        try:
+            subscription = manager.subscribe(user_id, reminder_type, timezone)
+        except pytz.UnknownTimeZoneError:
+            await update.message.reply_text(f"❌ Неизвестный часовой пояс: {timezone}")
+            return
+        logger.info(f"[ID: {update.effective_user.id}] подписал {user_id} на {reminder_type}")
+        await update.message.reply_text(
+            f"✅ Подписка оформлена: {manager.trackers[reminder_type].description} ({subscription.timezone})"
+        )
+
+    async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not context.args:
+            await update.message.reply_text(
+                f"Использование: /unsubscribe <тип>\nТипы: {types_help(update.effective_user.id)}"
+            )
+            return
+        reminder_type, user_id, _ = _parse_subscribe_args(context.args, update.effective_user.id, admin_id)
+        if manager.unsubscribe(user_id, reminder_type):
+            logger.info(f"[ID: {update.effective_user.id}] отписал {user_id} от {reminder_type}")
+            await update.message.reply_text("🔕 Подписка отключена")
+        else:
+            await update.message.reply_text("Такой подписки нет")
+
+    async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        available = manager.available(update.effective_user.id)
+        subscriptions = [s for s in manager.registry.user_subscriptions(update.effective_user.id)
+                         if s.reminder_type in available]
+        if not subscriptions:
+            await update.message.reply_text(f"Подписок нет. Доступно: {types_help(update.effective_user.id)}")
+            return
+        lines = [
+            f"   {manager.trackers[s.reminder_type].description} ({s.timezone}){_format_windows(s.schedule)}"
+            for s in subscriptions
+        ]
+        await update.message.reply_text("⏰ Твои напоминания:\n" + "\n".join(lines))
+
+    def make_window_command(key, title, example):
+        async def window_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            if not context.args:
+                await update.message.reply_text(f"Использование: /{key} {example} или /{key} off")
+                return
+            value = None if context.args[0].lower() == 'off' else context.args[0]
+            user_id = update.effective_user.id
+            try:
+                updated = manager.set_window(user_id, key, value)
+            except ValueError:
+                await update.message.reply_text(f"❌ Ожидается окно вида {example}")
+                return
+            if not updated:
+                await update.message.reply_text(f"Подписок нет. Доступно: {types_help(user_id)}")
+                return
+            logger.info(f"[ID: {user_id}] {key}: {value or 'off'}")
+            state = f"{value} (местное время)" if value else "отключены"
+            await update.message.reply_text(f"{title}: {state}. Напоминаний обновлено: {len(updated)}")
+        return window_command
+
+    application.add_handler(CommandHandler("subscribe", subscribe_command))
+    application.add_handler(CommandHandler("quiet", make_window_command('quiet', "🌙 Тихие часы", "22:00-07:00")))
+    application.add_handler(CommandHandler("active", make_window_command('active', "☀️ Активное окно",
+                                                                         "07:00-22:00")))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+    application.add_handler(CommandHandler("subscriptions", subscriptions_command))
@@ -0,0 +1,115 @@
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytz
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Сколько дней вперед искать ближайшее срабатывание (недельные слоты + запас)
+SEARCH_DAYS = 8
+
+# Окно времени суток в минутах от полуночи: [start, end), может переходить через полночь
+TimeWindow = namedtuple('TimeWindow', ['start', 'end'])
+# Ключи окон в параметрах слота: тихие часы и активное окно пользователя (локальное время)
+WINDOW_KEYS = ('quiet', 'active')
+
+
+def _parse_minutes(text):
+    hour, _, minute = text.strip().partition(':')
+    minutes = int(hour) * 60 + int(minute or 0)
+    if not 0 <= minutes <= 24 * 60:
+        raise ValueError(f"Некорректное время: {text}")
+    return minutes
+
+
+def parse_window(value):
+    """'22:00-07:00' -> TimeWindow(1320, 420); пустое значение — окна нет"""
+    if not value:
+        return None
+    start, separator, end = value.partition('-')
+    if not separator:
+        raise ValueError(f"Ожидается окно вида 22:00-07:00: {value}")
+    return TimeWindow(_parse_minutes(start), _parse_minutes(end))
+
+
+def in_window(window, minute_of_day):
+    if window.start <= window.end:
+        return window.start <= minute_of_day < window.end
+    return minute_of_day >= window.start or minute_of_day < window.end
+
+
+def _allowed(minute_of_day, quiet, active):
+    if quiet is not None and in_window(quiet, minute_of_day):
+        return False
+    return active is None or in_window(active, minute_of_day)
+
+
+def _parse_days(day_of_week):
+    if day_of_week is None:
+        return None
+    return {DAY_NAMES.index(day.strip()) for day in day_of_week.split(',')}
+
+
+def _parse_hours(hour):
+    """Часы слота: None — каждый час, число, диапазон '7-22' или список '8,14,20'"""
+    if hour is None:
+        return list(range(24))
+    if isinstance(hour, int):
+        return [hour]
+    hours = set()
+    for part in str(hour).split(','):
+        first, _, last = part.strip().partition('-')
+        hours.update(range(int(first), int(last or first) + 1))
+    return sorted(hours)
+
+
+def _localize(tz, naive):
+    """Перевод локального времени в UTC с учетом перехода на летнее/зимнее время"""
+    try:
+        return tz.localize(naive, is_dst=None)
+    except pytz.NonExistentTimeError:
+        # Время "съедено" переходом на летнее время — слот в этот день пропускается
+        return None
+    except pytz.AmbiguousTimeError:
+        # Время повторяется при переходе на зимнее — срабатываем один раз, в первое
+        return tz.localize(naive, is_dst=True)
+
+
+def next_fire_time(when, tz, after):
+    """Ближайшее срабатывание слота строго после момента after (aware datetime)
+
+    when — параметры слота: minute, необязательные hour ('7-22') и day_of_week ('sat,sun'),
+    а также окна пользователя quiet ('22:00-07:00') и active ('07:00-22:00') в локальном времени.
+    Время в тихие часы или вне активного окна пропускается сразу при поиске, поэтому
+    подавленные срабатывания не попадают в очередь. Возвращает aware datetime в UTC
+    или None, если окна исключают слот полностью.
+    """
+    minute = when.get('minute', 0)
+    hours = _parse_hours(when.get('hour'))
+    days = _parse_days(when.get('day_of_week'))
+    quiet = parse_window(when.get('quiet'))
+    active = parse_window(when.get('active'))
+
+    local_after = after.astimezone(tz)
+    start_day = local_after.date()
+    for offset in range(SEARCH_DAYS):
+        day = start_day + timedelta(days=offset)
+        if days is not None and day.weekday() not in days:
+            continue
+        for hour in hours:
+            if not _allowed(hour * 60 + minute, quiet, active):
+                continue
+            localized = _localize(tz, datetime(day.year, day.month, day.day, hour, minute))
+            if localized is None:
+                continue
+            fire = localized.astimezone(pytz.utc)
+            if fire > after:
+                return fire
+    if quiet is not None or active is not None:
+        return None
+    raise ValueError(f"Не удалось вычислить следующее срабатывание для {when}")
+
@@ -0,0 +1,104 @@
+import hmac
+import json
+import signal
+import asyncio
+import logging
+import ipaddress
+
+import tornado.httpserver
+import tornado.web
+from telegram import Update
+
+from .metrics import CONTENT_TYPE, metrics
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class TelegramWebhookHandler(tornado.web.RequestHandler):
+    """POST от Telegram: апдейт кладется в очередь приложения, дальше как в run_webhook PTB"""
+
+    def initialize(self, bot_application, secret_token):
+        self.bot_application = bot_application
+        self.secret_token = secret_token
+
+    async def post(self):
+        if self.secret_token and not hmac.compare_digest(self.request.headers.get(SECRET_HEADER, ''),
+                                                         self.secret_token):
+            self.set_status(403)
+            return
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)
+            return
+        update = Update.de_json(data, self.bot_application.bot)
+        if update is not None:
+            await self.bot_application.update_queue.put(update)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """GET /metrics в текстовом формате Prometheus
+
+    С token — только с заголовком "Authorization: Bearer <token>"; без него — только с localhost.
+    """
+
+    def initialize(self, registry, token):
+        self.registry = registry
+        self.token = token
+
+    def _allowed(self):
+        if self.token:
+            return hmac.compare_digest(self.request.headers.get('Authorization', ''), f"Bearer {self.token}")
+        try:
+            return ipaddress.ip_address(self.request.remote_ip).is_loopback
+        except ValueError:
+            return False
+
+    def get(self):
+        if not self._allowed():
+            self.set_status(403)
+            return
+        self.set_header('Content-Type', CONTENT_TYPE)
+        self.write(self.registry.render())
+
+
+def make_webhook_app(application, url_path='', registry=metrics, secret_token=None, metrics_token=None):
+    """Приложение tornado: вебхук Telegram и /metrics (публичный API tornado, без внутренних модулей PTB)"""
+    url_path = url_path if url_path.startswith('/') else f'/{url_path}'
+    return tornado.web.Application([
+        (r'/metrics/?', MetricsHandler, {'registry': registry, 'token': metrics_token}),
+        (rf'{url_path}/?', TelegramWebhookHandler, {'bot_application': application, 'secret_token': secret_token}),
+    ])
+
+
+async def run_webhook(application, listen, port, webhook_url, url_path='', drop_pending_updates=False,
+                      registry=metrics, secret_token=None, metrics_token=None):
+    """Аналог Application.run_webhook с /metrics на том же порту; работает до SIGTERM/SIGINT"""
+    server = tornado.httpserver.HTTPServer(
+        make_webhook_app(application, url_path, registry, secret_token, metrics_token)
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    async with application:
+        await application.bot.set_webhook(url=webhook_url, drop_pending_updates=drop_pending_updates,
+                                          secret_token=secret_token)
+        await application.start()
+        server.listen(port, address=listen)
+        logger.info(f"Вебхук и /metrics слушают {listen}:{port}"
+                    + ("" if metrics_token else " (/metrics — только localhost)"))
+        try:
+            await stop.wait()
+        finally:
+            server.stop()
+            await server.close_all_connections()
+            await application.stop()
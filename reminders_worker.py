@@ -1,8 +1,10 @@
 import asyncio
-from agent import main
+from agent import main, ROLE_WORKER
 
 if __name__ == "__main__":
     async def run_reminders():
-        await main()  # Внутри main() уже вызывается scheduler.start()
+        # Воркер участвует в выборах лидера; диспетчер запускается только у лидера.
+        # Подтверждения из bot_web.py он видит, только если оба процесса работают с одним REMINDER_DB
+        await main(role=ROLE_WORKER)
 
     asyncio.run(run_reminders())
\ No newline at end of file
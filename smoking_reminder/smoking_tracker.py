@@ -1,10 +1,11 @@
-import os
-import json
+import asyncio
 import logging
 from datetime import datetime, date
-from apscheduler.triggers.cron import CronTrigger
 import pytz
 
+from reminder_core.delivery import send_message
+from .state_store import SmokingStateStore
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -18,59 +19,21 @@ DATA_FILE = "smoking_reminder/quit_smoking_data.json"
 vancouver_tz = pytz.timezone('America/Vancouver')
 
 
-def load_data():
-    """Загрузка данных о днях без курения"""
-    try:
-        # Создаем папку если не существует
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if 'start_date' in data:
-                    return data
-
-        today = date.today().isoformat()
-        data = {
-            'start_date': today,
-            'total_days': 0,
-            'created_at': datetime.now().isoformat()
-        }
-        save_data(data)
-        return data
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке данных: {e}")
-        today = date.today().isoformat()
-        return {
-            'start_date': today,
-            'total_days': 0,
-            'created_at': datetime.now().isoformat()
-        }
-
-
-def save_data(data):
-    """Сохранение данных о днях без курения"""
-    try:
-        # Создаем папку если не существует
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"Ошибка при сохранении данных: {e}")
+# Состояние загружается один раз и хранится в памяти
+smoking_state = SmokingStateStore(DATA_FILE)
 
 
 def calculate_days_and_savings():
-    """Подсчет дней без курения и сэкономленных денег"""
-    data = load_data()
+    """Подсчет дней без курения и сэкономленных денег (на цикле событий — после smoking_state.load())"""
+    data = smoking_state.get()
     start_date = datetime.fromisoformat(data['start_date']).date()
     today = date.today()
     days_passed = (today - start_date).days + 1
 
-    # Обновляем данные
-    data['total_days'] = days_passed
+    # Обновляем данные (на диск пишем только при смене дня)
     data['last_calculated'] = datetime.now().isoformat()
-    save_data(data)
+    if data.get('total_days') != days_passed:
+        smoking_state.update(total_days=days_passed)
 
     # Расчеты
     total_cigarettes_not_smoked = days_passed * CIGARETTES_PER_DAY
@@ -140,9 +103,10 @@ def get_health_benefit(day_number):
         return "🌟 Твой организм благодарит тебя каждый день!"
 
 
-async def send_daily_smoking_reminder(bot, user_id):
+async def send_daily_smoking_reminder(bot, user_id, tz=vancouver_tz):
     """Отправка ежедневного напоминания о курении"""
     try:
+        await smoking_state.load()
         days, money_saved, cigarettes_not_smoked = calculate_days_and_savings()
         motivational_msg = get_motivational_message(days)
         health_benefit = get_health_benefit(days)
@@ -161,25 +125,31 @@ async def send_daily_smoking_reminder(bot, user_id):
 
 🏃‍♂️ Продолжай в том же духе!"""
 
-        await bot.send_message(chat_id=user_id, text=message)
-        current_time = datetime.now(vancouver_tz)
+        await send_message(bot, user_id, message)
+        current_time = datetime.now(tz)
         logger.info(f"Напоминание о курении отправлено: День {days}, время: {current_time}")
 
     except Exception as e:
         logger.error(f"Ошибка при отправке напоминания о курении: {e}")
 
 
-def setup_smoking_scheduler(scheduler, bot, user_id):
+# Слоты напоминаний: (ID слота, обработчик, время, название)
+SMOKING_SLOTS = [
+    # Ежедневное напоминание о курении в 6:40 утра
+    ('daily', send_daily_smoking_reminder, {'hour': 6, 'minute': 40}, 'Ежедневное напоминание о курении'),
+]
+
+
+def setup_smoking_scheduler(scheduler, bot, user_id, tz=vancouver_tz, schedule=None):
     """Настройка планировщика для напоминаний о курении"""
-    # Ежедневное напоминание о курении в 6:40 утра Vancouver time
-    scheduler.add_job(
-        lambda: send_daily_smoking_reminder(bot, user_id),
-        CronTrigger(hour=6, minute=40, timezone=vancouver_tz),
-        id='daily_smoking_reminder',
-        name='Ежедневное напоминание о курении'
-    )
-
-    logger.info("Планировщик курения настроен: 6:40 AM Vancouver time")
+    scheduler.add_slots('smoking', SMOKING_SLOTS, bot, user_id, tz, schedule)
+    # Состояние читается с диска заранее и в потоке — обработчики берут его уже из памяти
+    try:
+        asyncio.get_running_loop().create_task(smoking_state.load())
+    except RuntimeError:
+        smoking_state.get()
+
+    logger.info(f"Планировщик курения настроен ({user_id}): 6:40 AM {tz}")
 
 
 # Функция для ручного тестирования
@@ -0,0 +1,126 @@
+import os
+import json
+import atexit
+import asyncio
+import logging
+import threading
+from datetime import datetime, date
+
+from reminder_core.storage import write_json_atomic
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Задержка перед записью: повторные изменения за это время объединяются в одну запись
+FLUSH_DELAY = 2.0
+
+
+def _default_data():
+    return {
+        'start_date': date.today().isoformat(),
+        'total_days': 0,
+        'created_at': datetime.now().isoformat()
+    }
+
+
+class SmokingStateStore:
+    """Состояние трекера курения в памяти с отложенной атомарной записью на диск"""
+
+    def __init__(self, path, flush_delay=FLUSH_DELAY):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._data = None
+        self._version = 0
+        self._saved_version = 0
+        self._flush_task = None
+        self._write_lock = threading.Lock()
+        atexit.register(self.flush_sync)
+
+    def _read(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if 'start_date' in data:
+                        return data, False
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных: {e}")
+        return _default_data(), True
+
+    def _set_loaded(self, data, is_new):
+        if self._data is None:
+            self._data = data
+            if is_new:
+                self._mark_dirty()
+
+    async def load(self):
+        """Однократная загрузка с диска вне цикла событий"""
+        if self._data is None:
+            data, is_new = await asyncio.to_thread(self._read)
+            self._set_loaded(data, is_new)
+        return self._data
+
+    def get(self):
+        """Текущее состояние из памяти
+
+        На цикле событий состояние загружается заранее через load(); чтение с диска здесь —
+        только для синхронных вызовов вне цикла (скрипты, завершение процесса).
+        """
+        if self._data is None:
+            self._set_loaded(*self._read())
+        return self._data
+
+    def update(self, **changes):
+        """Изменение состояния; запись на диск будет выполнена позже"""
+        self.get().update(changes)
+        self._mark_dirty()
+
+    @property
+    def dirty(self):
+        return self._version != self._saved_version
+
+    def _mark_dirty(self):
+        self._version += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Изменения, сделанные во время записи, не запускают новую задачу — их подхватывает этот цикл
+        while True:
+            await asyncio.sleep(self.flush_delay)
+            await self.flush()
+            if not self.dirty:
+                return
+
+    def _write_snapshot(self, snapshot, version):
+        with self._write_lock:
+            # Более новая версия уже могла быть записана другим потоком
+            if version <= self._saved_version:
+                return
+            write_json_atomic(self.path, snapshot)
+            self._saved_version = version
+
+    async def flush(self):
+        """Запись накопленных изменений в фоновом потоке"""
+        if not self.dirty:
+            return
+        version = self._version
+        snapshot = dict(self._data)
+        try:
+            await asyncio.to_thread(self._write_snapshot, snapshot, version)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении данных: {e}")
+
+    def flush_sync(self):
+        """Синхронная запись (при завершении процесса или вне цикла событий)"""
+        if self._data is None or not self.dirty:
+            return
+        try:
+            self._write_snapshot(dict(self._data), self._version)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении данных: {e}")
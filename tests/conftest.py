@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Тесты никогда не пишут в рабочую базу: общая база напоминаний — во временном каталоге
+os.environ.setdefault("REMINDER_DB", os.path.join(tempfile.mkdtemp(prefix='reminders_test_'), 'reminders.db'))
@@ -0,0 +1,66 @@
+"""Заглушки Telegram для тестов обработчиков: приложение, бот, апдейты"""
+from types import SimpleNamespace
+
+
+class FakeApplication:
+    def __init__(self):
+        self.handlers = []
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def callback(self, name):
+        """Обработчик по имени функции (например, 'taken_callback')"""
+        for handler in self.handlers:
+            if handler.callback.__name__ == name:
+                return handler.callback
+        raise KeyError(name)
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text, kwargs))
+        return SimpleNamespace(chat_id=chat_id, text=text)
+
+
+class FakeMessage:
+    def __init__(self, text='', document=None, caption=None):
+        self.text = text
+        self.document = document
+        self.caption = caption
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append((text, kwargs))
+
+
+class FakeQuery:
+    def __init__(self, user_id, data, message=None):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.data = data
+        self.message = message
+        self.answers = []
+        self.edits = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+    async def edit_message_text(self, text, **kwargs):
+        self.edits.append((text, kwargs))
+
+
+def callback_update(user_id, data, message=None):
+    query = FakeQuery(user_id, data, message)
+    return SimpleNamespace(callback_query=query, effective_user=query.from_user, message=None,
+                           effective_message=message)
+
+
+def message_update(user_id, message):
+    return SimpleNamespace(message=message, effective_message=message, effective_user=SimpleNamespace(id=user_id))
+
+
+def command_context(*args):
+    return SimpleNamespace(args=list(args))
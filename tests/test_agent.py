@@ -0,0 +1,36 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Обработчики трекеров регистрируются в каждом процессе; модули самих трекеров грузит только TRACKERS
+SETUP_HANDLERS = """
+import sys, json
+import agent
+from reminder_core.registry import SubscriptionRegistry
+from reminder_core.storage import connect
+from tests.helpers import FakeApplication
+
+application = FakeApplication()
+agent.setup_tracker_handlers(application, SubscriptionRegistry(connect()))
+trackers = [spec.entry_point.split(':', 1)[0] for spec in agent.TRACKERS.values()]
+# Подтверждение дозы, пока трекер не загружен, тоже не должно его импортировать
+agent.cancel_medicine_followups(1, '2026-10-18', 'morning')
+print(json.dumps({
+    'loaded': [module for module in trackers if module in sys.modules],
+    'handlers': [handler.callback.__name__ for handler in application.handlers],
+}))
+"""
+
+
+def test_tracker_handlers_do_not_load_trackers(tmp_path):
+    env = dict(os.environ, TELEGRAM_TOKEN='123:TEST', USER_ID='1', REMINDER_DB=str(tmp_path / 'agent.db'))
+    result = subprocess.run([sys.executable, '-c', SETUP_HANDLERS], cwd=ROOT, env=env, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report['loaded'] == []
+    assert {'drink_callback', 'water_command', 'taken_callback', 'meds_command',
+            'quiz_command', 'deck_command'} <= set(report['handlers'])
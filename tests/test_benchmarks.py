@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.fake_telegram import Received
+from benchmarks.replay import match_replies
+from benchmarks.scenarios import EngineCounters, isolated_storage
+from lina_water import intake
+from medicine_reminder import adherence
+from reminder_core import storage
+from reminder_core.catalog import message_catalog
+from reminder_core.delivery import delivery_engine
+
+
+def database_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()['file']
+
+
+def test_isolated_storage_redirects_lazy_tracker_stores(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'bench.db')
+    production = object()
+    monkeypatch.setattr(intake, '_intake_log', production)
+    saved_path = storage.DB_PATH
+    with isolated_storage(db_path):
+        assert database_file(intake.get_intake_log().conn) == db_path
+        assert database_file(adherence.get_adherence_log().conn) == db_path
+        assert database_file(message_catalog._store.conn) == db_path
+    assert intake._intake_log is production
+    assert storage.DB_PATH == saved_path
+    assert message_catalog._store is None
+
+
+def test_engine_counters_are_per_scenario(monkeypatch):
+    monkeypatch.setattr(delivery_engine, 'retried', 7)
+    counters = EngineCounters()
+    delivery_engine.retried += 2
+    assert counters.delta()['retried'] == 2
+
+
+def test_match_replies_measures_time_to_first_reply():
+    sent = [(10.0, 1), (10.5, 1), (11.0, 2), (20.0, 1), (30.0, 3)]
+    received = [
+        Received(12.0, 1, 'sendmessage', "ответ на два склеенных"),
+        Received(12.5, 1, 'editmessagetext', "продолжение"),
+        Received(11.25, 2, 'sendmessage', "ответ"),
+        Received(21.0, 1, 'sendmessage', "ответ"),
+        Received(5.0, 3, 'sendmessage', "напоминание до апдейта"),
+    ]
+    latencies, unanswered = match_replies(sent, received)
+    assert sorted(latencies) == pytest.approx([0.25, 1.0, 1.5, 2.0])
+    assert unanswered == 1
@@ -0,0 +1,64 @@
+import json
+
+from reminder_core.catalog import CursorStore, MessageCatalog, deck_index
+from reminder_core.storage import connect
+
+TEXTS = [f"Текст {index}" for index in range(5)]
+USER_ID = 5
+
+
+def make_catalog(tmp_path, texts=TEXTS, store=None):
+    directory = tmp_path / 'messages'
+    directory.mkdir(exist_ok=True)
+    (directory / 'ru.json').write_text(json.dumps({'pools': {'reminder': texts}}), encoding='utf-8')
+    catalog = MessageCatalog(locale='ru')
+    catalog.register('test', str(directory))
+    if store is not None:
+        catalog.attach(store)
+    return catalog
+
+
+def test_deck_index_is_a_permutation():
+    for size in (1, 2, 3, 7, 16, 17, 1000):
+        for seed in range(20):
+            assert sorted(deck_index(seed, size, position) for position in range(size)) == list(range(size))
+
+
+def test_every_deck_deals_each_text_once(tmp_path):
+    catalog = make_catalog(tmp_path)
+    drawn = [catalog.draw(USER_ID, 'test.reminder') for _ in range(len(TEXTS) * 20)]
+    decks = [drawn[start:start + len(TEXTS)] for start in range(0, len(drawn), len(TEXTS))]
+    assert all(sorted(deck) == sorted(TEXTS) for deck in decks)
+    # Новая колода не начинается с последнего текста предыдущей
+    assert all(previous[-1] != deck[0] for previous, deck in zip(decks, decks[1:]))
+
+
+def test_users_have_separate_decks(tmp_path):
+    catalog = make_catalog(tmp_path)
+    for _ in range(3):
+        catalog.draw(USER_ID, 'test.reminder')
+    other = [catalog.draw(6, 'test.reminder') for _ in range(len(TEXTS))]
+    assert sorted(other) == sorted(TEXTS)
+
+
+def test_cursor_survives_restart(tmp_path):
+    store = CursorStore(connect(str(tmp_path / 'cursors.db')))
+    catalog = make_catalog(tmp_path, store=store)
+    # Без цикла событий курсор записывается сразу
+    first = [catalog.draw(USER_ID, 'test.reminder') for _ in range(2)]
+    assert store.load()[(USER_ID, 'test.reminder')].position == 2
+
+    restarted = make_catalog(tmp_path, store=CursorStore(connect(str(tmp_path / 'cursors.db'))))
+    rest = [restarted.draw(USER_ID, 'test.reminder') for _ in range(len(TEXTS) - 2)]
+    assert sorted(first + rest) == sorted(TEXTS)
+
+
+def test_changed_pool_starts_new_deck(tmp_path):
+    store = CursorStore(connect(str(tmp_path / 'cursors.db')))
+    catalog = make_catalog(tmp_path, store=store)
+    catalog.draw(USER_ID, 'test.reminder')
+
+    texts = TEXTS + ["Новый текст"]
+    edited = make_catalog(tmp_path, texts=texts, store=CursorStore(connect(str(tmp_path / 'cursors.db'))))
+    drawn = [edited.draw(USER_ID, 'test.reminder') for _ in range(len(texts))]
+    assert sorted(drawn) == sorted(texts)
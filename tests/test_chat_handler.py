@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram import Chat, Message, Update, User
+from telegram.ext import MessageHandler
+
+from bot_chat import chat_handler as chat_module
+from bot_chat.chat_handler import answer_question, chat_message, setup_chat_handlers
+from bot_chat.response_cache import ResponseCache
+from tests.helpers import FakeApplication, FakeMessage
+
+USER = User(5, 'Lina', False)
+
+
+def text_message(text):
+    return Message(1, None, Chat(5, 'private'), from_user=USER, text=text)
+
+
+def chat_handler():
+    application = FakeApplication()
+    setup_chat_handlers(application)
+    return next(handler for handler in application.handlers if isinstance(handler, MessageHandler))
+
+
+def test_chat_handler_accepts_new_text_message():
+    assert chat_handler().check_update(Update(1, message=text_message("Привет")))
+
+
+def test_chat_handler_ignores_edited_message():
+    assert not chat_handler().check_update(Update(1, edited_message=text_message("Привет")))
+
+
+def test_chat_message_without_message_returns():
+    update = SimpleNamespace(message=None, effective_user=USER)
+    assert asyncio.run(chat_message(update, None)) is None
+
+
+class ChatMessage(FakeMessage):
+    """Сообщение в чате: ответ можно править, в чат можно слать «печатает»"""
+
+    def __init__(self, text=''):
+        super().__init__(text)
+        self.chat = SimpleNamespace(send_action=self._send_action)
+
+    async def _send_action(self, action):
+        return True
+
+    async def reply_text(self, text, **kwargs):
+        await super().reply_text(text, **kwargs)
+        return SimpleNamespace(edit_text=self._edit)
+
+    async def _edit(self, text, **kwargs):
+        self.replies.append((text, kwargs))
+
+
+def test_identical_concurrent_questions_make_one_model_call(monkeypatch):
+    requests = []
+
+    async def fake_stream(messages):
+        requests.append(messages)
+        await asyncio.sleep(0.05)
+        yield "Привет! Как дела?"
+
+    monkeypatch.setattr(chat_module, 'stream_chat_completion', fake_stream)
+    monkeypatch.setattr(chat_module, 'response_cache', ResponseCache(path=None))
+    messages = [ChatMessage("Привет!") for _ in range(4)]
+    updates = [SimpleNamespace(message=message, effective_user=SimpleNamespace(id=700 + index))
+               for index, message in enumerate(messages)]
+
+    async def scenario():
+        return await asyncio.gather(*(answer_question(update, "Привет!") for update in updates))
+
+    from_cache = asyncio.run(scenario())
+    assert len(requests) == 1
+    assert sorted(from_cache) == [False, True, True, True]
+    assert all(message.replies[-1][0] == "Привет! Как дела?" for message in messages)
@@ -0,0 +1,117 @@
+import time
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter, TimedOut
+
+from reminder_core.delivery import DeliveryEngine, TokenBucket
+
+
+class ScriptedBot:
+    """Бот, который отвечает по сценарию: исключение из errors или успешная отправка"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append((time.monotonic(), chat_id, text))
+        return text
+
+
+def run_engine(scenario, **options):
+    async def run():
+        engine = DeliveryEngine(**options)
+        await engine.start()
+        try:
+            return await scenario(engine)
+        finally:
+            await engine.stop()
+
+    return asyncio.run(run())
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, capacity=5)
+        started = time.monotonic()
+        for _ in range(10):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 5 токенов сразу, еще 5 — по 1/20 с
+    assert 0.2 <= asyncio.run(run()) < 0.5
+
+
+def test_per_chat_pacing_does_not_delay_other_chats():
+    bot = ScriptedBot()
+
+    async def scenario(engine):
+        started = time.monotonic()
+        await asyncio.gather(*(engine.send_now(bot, 1, f"чат 1: {n}") for n in range(3)),
+                             engine.send_now(bot, 2, "чат 2"))
+        return started
+
+    started = run_engine(scenario, global_rate=1000, per_chat_interval=0.2, workers=2)
+    chat_one = [at for at, chat_id, _ in bot.sent if chat_id == 1]
+    chat_two = [at for at, chat_id, _ in bot.sent if chat_id == 2]
+    assert all(later - earlier >= 0.18 for earlier, later in zip(chat_one, chat_one[1:]))
+    assert chat_two[0] - started < 0.1
+
+
+def test_retry_after_pauses_and_retries():
+    bot = ScriptedBot([RetryAfter(0.2), None])
+
+    async def scenario(engine):
+        started = time.monotonic()
+        result = await engine.send_now(bot, 1, "привет")
+        return result, engine.retried, time.monotonic() - started
+
+    result, retried, elapsed = run_engine(scenario, global_rate=1000, per_chat_interval=0)
+    assert result == "привет"
+    assert retried == 1
+    assert elapsed >= 0.2
+
+
+def test_repeated_retry_after_gives_up_after_max_retries():
+    bot = ScriptedBot([RetryAfter(0.01)] * 10)
+
+    async def scenario(engine):
+        with pytest.raises(RetryAfter):
+            await engine.send_now(bot, 1, "привет")
+        return engine.failed, engine.retried
+
+    assert run_engine(scenario, global_rate=1000, per_chat_interval=0, max_retries=2) == (1, 2)
+    assert len(bot.errors) == 7
+
+
+def test_network_errors_retry_with_backoff():
+    bot = ScriptedBot([TimedOut()])
+
+    async def scenario(engine):
+        return await engine.send_now(bot, 1, "привет")
+
+    assert run_engine(scenario, global_rate=1000, per_chat_interval=0) == "привет"
+
+
+def test_stop_fails_queued_and_delayed_sends():
+    bot = ScriptedBot()
+
+    async def run():
+        engine = DeliveryEngine(global_rate=1000, per_chat_interval=10)
+        await engine.start()
+        first = asyncio.create_task(engine.send_now(bot, 1, "сразу"))
+        delayed = asyncio.create_task(engine.send_now(bot, 1, "через 10 с"))
+        await first
+        await asyncio.sleep(0.05)
+        assert engine.queue_depth() == 1
+        await engine.stop()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(delayed, timeout=1)
+        return engine.queue_depth()
+
+    assert asyncio.run(run()) == 0
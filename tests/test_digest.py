@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytz
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from reminder_core import digest as digest_module
+from reminder_core.digest import SENDS_SAVED, DigestCollector, DigestStore
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.storage import connect
+
+NOW = datetime(2026, 10, 18, 8, 0, tzinfo=pytz.utc)
+
+
+async def noop(*args):
+    pass
+
+
+def make_store(tmp_path):
+    return DigestStore(connect(str(tmp_path / 'digest.db')))
+
+
+def once(dispatcher, user_id, name, at):
+    return dispatcher.add_once(noop, at, (), f"water:{user_id}:{name}", name)
+
+
+def test_window_is_served_from_memory(tmp_path):
+    store = make_store(tmp_path)
+    store.enable(5, 600)
+    statements = []
+    store.conn.set_trace_callback(statements.append)
+    assert [store.window(5) for _ in range(100)] == [600] * 100
+    assert store.window(6) is None
+    assert statements == []
+    store.disable(5)
+    assert store.window(5) is None
+
+
+def test_refresh_picks_up_other_process(tmp_path):
+    leader = make_store(tmp_path)
+    make_store(tmp_path).enable(5, 600)
+    asyncio.run(leader.refresh())
+    # Кэш свежий — база не читается
+    assert leader.window(5) is None
+    asyncio.run(leader.refresh(max_age=0))
+    assert leader.window(5) == 600
+
+
+def test_coalesce_pulls_slots_inside_window(tmp_path):
+    store = make_store(tmp_path)
+    store.enable(5, 15 * 60)
+    dispatcher = Dispatcher(runner=None, digest=store)
+    due = once(dispatcher, 5, 'morning', NOW)
+    soon = once(dispatcher, 5, 'soon', NOW + timedelta(minutes=10))
+    once(dispatcher, 5, 'later', NOW + timedelta(minutes=30))
+    other = once(dispatcher, 6, 'morning', NOW)
+
+    singles, digests, pulled = dispatcher._coalesce([(due, NOW), (other, NOW)], NOW)
+
+    assert singles == [(other, NOW)]
+    assert digests == {5: [(due, NOW), (soon, soon.next_fire)]}
+    assert pulled == [soon]
+
+
+def test_single_slot_in_window_is_not_a_digest(tmp_path):
+    store = make_store(tmp_path)
+    store.enable(5, 15 * 60)
+    dispatcher = Dispatcher(runner=None, digest=store)
+    due = once(dispatcher, 5, 'morning', NOW)
+    once(dispatcher, 5, 'later', NOW + timedelta(hours=1))
+    assert dispatcher._coalesce([(due, NOW)], NOW) == ([(due, NOW)], {}, [])
+
+
+def test_collector_sends_one_digest(monkeypatch):
+    sent = []
+
+    async def fake_send(bot, chat_id, text, **kwargs):
+        sent.append((chat_id, text, kwargs))
+
+    monkeypatch.setattr(digest_module, 'send_message', fake_send)
+    saved = SENDS_SAVED.labels().value
+    collector = DigestCollector(5)
+    button = InlineKeyboardMarkup([[InlineKeyboardButton("Выпил", callback_data='water:drank')]])
+    assert collector.collect('bot', 5, "Попей воды", {'reply_markup': button})
+    assert collector.collect('bot', 5, "Прими витамины", {})
+    assert not collector.collect('bot', 6, "Чужое", {})
+    asyncio.run(collector.flush())
+
+    (chat_id, text, kwargs), = sent
+    assert chat_id == 5
+    assert "Попей воды" in text and "Прими витамины" in text
+    assert kwargs['reply_markup'].inline_keyboard[0][0].callback_data == 'water:drank'
+    assert SENDS_SAVED.labels().value == saved + 1
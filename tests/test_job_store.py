@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytz
+
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.job_store import DEFAULT_MISFIRE, JobStateStore, dump_when, misfire_policy
+from reminder_core.storage import connect
+
+WHEN = {'hour': 9, 'minute': 0}
+
+
+class RecordingRunner:
+    """Runner без очередей: выполняет задачу сразу и запоминает ее ID"""
+
+    def __init__(self):
+        self.ran = []
+
+    async def run(self, job_id, coro_func, *args, priority=None):
+        self.ran.append(job_id)
+        await coro_func(*args)
+
+
+async def noop(*args):
+    pass
+
+
+def make_store(tmp_path):
+    return JobStateStore(connect(str(tmp_path / 'jobs.db')))
+
+
+def test_misfire_policy_by_reminder_type():
+    assert misfire_policy('medicine:5:morning').grace == 3 * 3600
+    assert misfire_policy('water:5:hourly').grace == 10 * 60
+    assert misfire_policy('unknown:5:slot') == DEFAULT_MISFIRE
+
+
+def test_save_keeps_last_fired_and_prunes(tmp_path):
+    store = make_store(tmp_path)
+    store.save([('water:5:hourly', WHEN, 100.0, 200.0), ('french:5:daily', WHEN, None, 300.0)])
+    # Перенос без срабатывания не стирает последнее срабатывание
+    store.save([('water:5:hourly', WHEN, None, 400.0)])
+    states = store.load()
+    assert states['water:5:hourly'].last_fired == 100.0
+    assert states['water:5:hourly'].next_fire == 400.0
+    assert states['water:5:hourly'].when == dump_when(WHEN)
+
+    assert store.prune({'water:5:hourly'}) == 1
+    assert set(store.load()) == {'water:5:hourly'}
+
+
+def test_warm_restart_keeps_saved_fire_time(tmp_path):
+    store = make_store(tmp_path)
+    missed = datetime.now(pytz.utc) - timedelta(minutes=20)
+    store.save([('water:5:hourly', WHEN, None, missed.timestamp()),
+                ('french:5:daily', {'hour': 8, 'minute': 0}, None, missed.timestamp())])
+
+    dispatcher = Dispatcher(RecordingRunner(), store=store)
+    water = dispatcher.add_job(noop, WHEN, pytz.utc, (), 'water:5:hourly', 'water')
+    # Время слота изменилось: сохраненное состояние не подходит, время считается заново
+    french = dispatcher.add_job(noop, WHEN, pytz.utc, (), 'french:5:daily', 'french')
+    assert water.next_fire.timestamp() == missed.timestamp()
+    assert french.next_fire > datetime.now(pytz.utc)
+    assert store.load()['french:5:daily'].when == dump_when(WHEN)
+
+
+def test_missed_slots_fire_late_or_drop_by_type(tmp_path):
+    store = make_store(tmp_path)
+    missed = datetime.now(pytz.utc) - timedelta(minutes=20)
+    job_ids = ['medicine:5:morning', 'water:5:hourly']
+    store.save([(job_id, WHEN, None, missed.timestamp()) for job_id in job_ids])
+    runner = RecordingRunner()
+    dispatcher = Dispatcher(runner, store=store)
+    for job_id in job_ids:
+        dispatcher.add_job(noop, WHEN, pytz.utc, (), job_id, job_id)
+
+    async def scenario():
+        dispatcher.start()
+        await asyncio.sleep(0.1)
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    # 20 минут опоздания: лекарство в пределах 3 часов, вода — за пределами 10 минут
+    assert runner.ran == ['medicine:5:morning']
+    assert (dispatcher.misfires_caught_up, dispatcher.misfires_dropped) == (1, 1)
+    states = store.load()
+    assert states['medicine:5:morning'].last_fired == missed.timestamp()
+    assert states['water:5:hourly'].last_fired is None
+    # Оба слота перенесены на следующее срабатывание
+    assert all(state.next_fire > datetime.now(pytz.utc).timestamp() for state in states.values())
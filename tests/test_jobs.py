@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from reminder_core.jobs import CHAT, MEDICATION, REMINDER, JobRunner, PriorityClass, WorkShed
+
+
+def make_runner(medication=1, reminder=3, chat=1, chat_slo=5.0, chat_queue=None, reminder_slo=5.0):
+    return JobRunner({
+        MEDICATION: PriorityClass(MEDICATION, 0, medication, 5.0, 5, None, False),
+        REMINDER: PriorityClass(REMINDER, 1, reminder, reminder_slo, 5, None, False),
+        CHAT: PriorityClass(CHAT, 2, chat, chat_slo, 5, chat_queue, True),
+    })
+
+
+async def hold(event):
+    await event.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_queued_medication_runs_before_queued_chat():
+    async def run():
+        runner = make_runner()
+        order = []
+
+        async def record(name):
+            order.append(name)
+
+        medication_busy, chat_busy = asyncio.Event(), asyncio.Event()
+        blockers = [asyncio.create_task(runner.submit(MEDICATION, hold, medication_busy)),
+                    asyncio.create_task(runner.submit(CHAT, hold, chat_busy))]
+        await settle()
+        queued = [asyncio.create_task(runner.submit(MEDICATION, record, 'medication')),
+                  asyncio.create_task(runner.submit(CHAT, record, 'chat'))]
+        await settle()
+        # Слот чата свободен, но лекарство ждет — чат не запускается
+        chat_busy.set()
+        await settle()
+        assert order == []
+        assert runner.stats()[CHAT]['queued'] == 1
+        medication_busy.set()
+        await asyncio.gather(*blockers, *queued)
+        return order
+
+    assert asyncio.run(run()) == ['medication', 'chat']
+
+
+def test_chat_is_shed_past_queue_slo():
+    async def run():
+        runner = make_runner(chat_slo=0.05)
+        busy = asyncio.Event()
+        blocker = asyncio.create_task(runner.submit(CHAT, hold, busy))
+        await settle()
+        with pytest.raises(WorkShed):
+            await runner.submit(CHAT, asyncio.sleep, 0)
+        busy.set()
+        await blocker
+        return runner.stats()[CHAT]
+
+    stats = asyncio.run(run())
+    assert (stats['shed'], stats['slo_violations'], stats['running'], stats['queued']) == (1, 1, 0, 0)
+
+
+def test_chat_queue_overflow_is_shed_immediately():
+    async def run():
+        runner = make_runner(chat_queue=1)
+        busy = asyncio.Event()
+        tasks = [asyncio.create_task(runner.submit(CHAT, hold, busy)) for _ in range(2)]
+        await settle()
+        with pytest.raises(WorkShed):
+            await runner.submit(CHAT, asyncio.sleep, 0)
+        busy.set()
+        await asyncio.gather(*tasks)
+        return runner.stats()[CHAT]
+
+    stats = asyncio.run(run())
+    assert (stats['shed'], stats['completed']) == (1, 2)
+
+
+def test_reminder_past_slo_still_runs():
+    async def run():
+        runner = make_runner(reminder=1, reminder_slo=0.05)
+        busy = asyncio.Event()
+        blocker = asyncio.create_task(runner.submit(REMINDER, hold, busy))
+        await settle()
+        late = asyncio.create_task(runner.submit(REMINDER, asyncio.sleep, 0, 'done'))
+        await asyncio.sleep(0.1)
+        busy.set()
+        await blocker
+        return await late, runner.stats()[REMINDER]['slo_violations']
+
+    assert asyncio.run(run()) == ('done', 1)
+
+
+def test_concurrency_cap_holds():
+    async def run():
+        runner = make_runner(reminder=3)
+        active, peak = 0, 0
+
+        async def job():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        await asyncio.gather(*(runner.submit(REMINDER, job) for _ in range(12)))
+        return peak, runner.stats()[REMINDER]
+
+    peak, stats = asyncio.run(run())
+    assert peak == 3
+    assert (stats['completed'], stats['running'], stats['queued']) == (12, 0, 0)
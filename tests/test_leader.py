@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import queue
+import asyncio
+import threading
+import subprocess
+
+from reminder_core.leader import LeaderElector, LeaseStore, watch_leader
+from reminder_core.storage import connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TTL = 2
+RENEW_INTERVAL = 0.3
+
+
+def run_worker(db_path, ttl, renew_interval):
+    """Процесс-участник выборов: печатает ELECTED/DEMOTED со своим pid"""
+
+    async def run():
+        async def elected():
+            print(f"ELECTED {os.getpid()}", flush=True)
+
+        async def demoted():
+            print(f"DEMOTED {os.getpid()}", flush=True)
+
+        elector = LeaderElector(LeaseStore(connect(db_path)), elected, demoted, name='check',
+                                ttl=ttl, renew_interval=renew_interval)
+        elector.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+class Worker:
+    def __init__(self, db_path, events):
+        command = [sys.executable, '-c',
+                   f"from tests.test_leader import run_worker; run_worker({db_path!r}, {TTL}, {RENEW_INTERVAL})"]
+        self.process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        threading.Thread(target=self._pump, args=(events,), daemon=True).start()
+
+    def _pump(self, events):
+        for line in self.process.stdout:
+            kind, pid = line.split()
+            events.put((kind, int(pid)))
+
+
+def wait_for(events, kind, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            event = events.get(timeout=deadline - time.monotonic())
+        except queue.Empty:
+            break
+        if event[0] == kind:
+            return event[1]
+    raise AssertionError(f"не дождались {kind} за {timeout} с")
+
+
+def test_two_processes_one_leader_and_failover(tmp_path):
+    events = queue.Queue()
+    db_path = str(tmp_path / 'leader.db')
+    workers = [Worker(db_path, events), Worker(db_path, events)]
+    processes = {worker.process.pid: worker.process for worker in workers}
+    try:
+        leader_pid = wait_for(events, 'ELECTED', TTL * 5)
+        time.sleep(TTL * 2)
+        assert events.empty(), "лидер должен быть ровно один"
+
+        started = time.monotonic()
+        processes[leader_pid].kill()
+        new_leader_pid = wait_for(events, 'ELECTED', TTL + RENEW_INTERVAL * 10)
+        assert new_leader_pid != leader_pid
+        assert time.monotonic() - started >= TTL - RENEW_INTERVAL
+    finally:
+        for process in processes.values():
+            process.kill()
+            process.wait()
+
+
+def test_lease_blocks_other_holder_until_expiry(tmp_path):
+    store = LeaseStore(connect(str(tmp_path / 'lease.db')))
+    assert store.try_acquire('check', 'a', ttl=0.2)
+    assert not store.try_acquire('check', 'b', ttl=0.2)
+    assert store.holder('check') == 'a'
+    time.sleep(0.3)
+    assert store.try_acquire('check', 'b', ttl=0.2)
+    store.release('check', 'b')
+    assert store.holder('check') is None
+
+
+def test_watch_leader_reports_missing_leader(tmp_path, caplog):
+    store = LeaseStore(connect(str(tmp_path / 'lease.db')))
+
+    async def watch():
+        task = asyncio.create_task(watch_leader(store, name='check', interval=0.01))
+        await asyncio.sleep(0.1)
+        store.try_acquire('check', 'worker', ttl=10)
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    with caplog.at_level('INFO', logger='reminder_core.leader'):
+        asyncio.run(watch())
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum("Нет лидера" in message for message in messages) == 1
+    assert any("снова виден" in message for message in messages)
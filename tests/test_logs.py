@@ -0,0 +1,42 @@
+import logging
+
+from reminder_core.logs import LogRingBuffer
+
+
+def make_record(name, level, message):
+    return logging.LogRecord(name, level, __file__, 0, message, None, None)
+
+
+def test_index_bounded_by_capacity():
+    ring = LogRingBuffer(capacity=100)
+    for number in range(10000):
+        ring.append(make_record(f"app.m{number % 7}", logging.INFO if number % 3 else logging.ERROR, str(number)))
+    assert len(ring) == 100
+    assert sum(len(seqs) for seqs in ring._by_level.values()) == 100
+    assert sum(len(seqs) for seqs in ring._by_logger.values()) == 100
+
+
+def test_evicted_logger_leaves_index():
+    ring = LogRingBuffer(capacity=3)
+    ring.append(make_record("once", logging.INFO, "first"))
+    for number in range(3):
+        ring.append(make_record("app", logging.INFO, str(number)))
+    assert "once" not in ring._by_logger
+    assert [entry.message for entry in ring.query(logger_prefix="app")] == ["0", "1", "2"]
+
+
+def test_counts_live_entries():
+    ring = LogRingBuffer(capacity=4)
+    for level in (logging.ERROR, logging.ERROR, logging.INFO, logging.INFO, logging.INFO, logging.WARNING):
+        ring.append(make_record("app", level, "x"))
+    assert ring.counts() == {'INFO': 3, 'WARNING': 1}
+
+
+def test_query_filters_level_and_prefix():
+    ring = LogRingBuffer(capacity=10)
+    ring.append(make_record("bot_chat.chat_handler", logging.ERROR, "chat error"))
+    ring.append(make_record("reminder_core.jobs", logging.ERROR, "job error"))
+    ring.append(make_record("bot_chat", logging.INFO, "chat info"))
+    assert [entry.message for entry in ring.query(logging.ERROR, "bot_chat")] == ["chat error"]
+    assert [entry.message for entry in ring.query(logging.WARNING)] == ["chat error", "job error"]
+    assert [entry.message for entry in ring.query(limit=1)] == ["chat info"]
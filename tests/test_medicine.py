@@ -0,0 +1,154 @@
+import os
+import sys
+import asyncio
+import subprocess
+from datetime import datetime, timedelta
+
+import pytz
+
+from medicine_reminder import adherence, medicine_tracker
+from medicine_reminder.adherence import AdherenceLog, setup_medicine_handlers
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.storage import connect
+from tests.helpers import FakeApplication, callback_update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TZ = pytz.timezone('Europe/Helsinki')
+
+
+async def noop(*args):
+    pass
+
+
+def schedule_followups(monkeypatch, days):
+    scheduler = Dispatcher(runner=None)
+    monkeypatch.setattr(medicine_tracker, '_scheduler', scheduler)
+    at = datetime.now(pytz.utc).timestamp() + 3600
+    for day in days:
+        medicine_tracker._schedule(noop, at, None, 5, TZ, day, 'morning', 'followup')
+    return scheduler
+
+
+def test_followup_job_id_includes_day(monkeypatch):
+    scheduler = schedule_followups(monkeypatch, ['2026-10-17', '2026-10-18'])
+    assert len(scheduler) == 2
+
+
+def test_cancel_followups_only_for_that_day(monkeypatch):
+    scheduler = schedule_followups(monkeypatch, ['2026-10-17', '2026-10-18'])
+    medicine_tracker.cancel_followups(5, '2026-10-17', 'morning')
+    assert list(scheduler._entries) == ['medicine:5:2026-10-18_morning_followup']
+
+
+def test_acknowledge_is_idempotent(tmp_path):
+    log = AdherenceLog(connect(str(tmp_path / 'doses.db')))
+    log.open_dose(5, '2026-10-18', 'morning')
+    assert log.acknowledge(5, '2026-10-18', 'morning') is True
+    assert log.acknowledge(5, '2026-10-18', 'morning') is False
+    assert log.pending(5, '2026-10-17') == []
+
+
+def press(tmp_path, day):
+    log = AdherenceLog(connect(str(tmp_path / 'doses.db')))
+    cancelled = []
+    application = FakeApplication()
+    setup_medicine_handlers(application, lambda user_id: TZ, on_taken=lambda *args: cancelled.append(args),
+                            adherence_log=log)
+    update = callback_update(5, f"{adherence.CALLBACK_PREFIX}{day}:morning")
+    asyncio.run(application.callback('taken_callback')(update, None))
+    return log, cancelled, update.callback_query
+
+
+def test_taken_press_passes_day(tmp_path):
+    today = datetime.now(TZ).date().isoformat()
+    log, cancelled, _ = press(tmp_path, today)
+    assert cancelled == [(5, today, 'morning')]
+    assert log.get(5, today, 'morning').taken_at is not None
+
+
+def test_taken_press_for_closed_day_is_ignored(tmp_path):
+    yesterday = (datetime.now(TZ).date() - timedelta(days=1)).isoformat()
+    log, cancelled, query = press(tmp_path, yesterday)
+    assert cancelled == []
+    assert log.get(5, yesterday, 'morning') is None
+    assert query.answers == ["Этот день уже закрыт"]
+
+
+# Веб-процесс: только обработчики кнопок (трекер не загружен), база — из REMINDER_DB
+WEB_PRESS = """
+import asyncio, sys
+import agent
+from reminder_core.registry import SubscriptionRegistry
+from reminder_core.storage import connect
+from tests.helpers import FakeApplication, callback_update
+
+application = FakeApplication()
+agent.setup_tracker_handlers(application, SubscriptionRegistry(connect()))
+update = callback_update(5, sys.argv[1])
+asyncio.run(application.callback('taken_callback')(update, None))
+print(update.callback_query.answers[-1])
+"""
+
+
+def test_confirmation_in_web_process_cancels_leader_followup(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'shared.db')
+    monkeypatch.setattr(adherence, '_adherence_log', AdherenceLog(connect(db_path)))
+    sent = []
+
+    async def send(bot, chat_id, text, **kwargs):
+        sent.append(chat_id)
+
+    monkeypatch.setattr(medicine_tracker, 'send_message', send)
+    scheduler = schedule_followups(monkeypatch, [])
+    day = datetime.now(TZ).date().isoformat()
+    asyncio.run(medicine_tracker.send_dose_reminder('morning', None, 5, TZ))
+    assert sent == [5] and len(scheduler) == 1
+
+    env = dict(os.environ, TELEGRAM_TOKEN='123:TEST', USER_ID='1', REMINDER_DB=db_path)
+    web = subprocess.run([sys.executable, '-c', WEB_PRESS, f"{adherence.CALLBACK_PREFIX}{day}:morning"],
+                         cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert web.returncode == 0, web.stderr
+    assert web.stdout.strip().endswith("Прием отмечен ✅")
+
+    # Лидер в своем процессе: повтор срабатывает по расписанию и видит подтверждение в общей базе
+    asyncio.run(medicine_tracker.send_followup_reminder(None, 5, TZ, day, 'morning'))
+    assert sent == [5]
+    assert adherence.get_adherence_log().get(5, day, 'morning').followup_at is None
+
+
+def test_caregivers_default_to_mother_and_admin():
+    assert medicine_tracker.load_caregivers({'MOTHER_USER_ID': '7', 'USER_ID': '1'}) == {7: 1}
+    assert medicine_tracker.load_caregivers({'USER_ID': '1'}) == {}
+    assert medicine_tracker.load_caregivers({'MEDICINE_CAREGIVERS': '7:1, 8:2,9:9', 'USER_ID': '1'}) == {7: 1, 8: 2}
+    assert medicine_tracker.load_caregivers({'MOTHER_USER_ID': '7', 'USER_ID': '1',
+                                             'MEDICINE_CAREGIVER_DIGEST': '0'}) == {}
+
+
+def missed_followup(tmp_path, monkeypatch, user_id):
+    """Повтор неподтвержденной дозы; возвращает адресатов сообщений и запланированные задачи"""
+    monkeypatch.setattr(adherence, '_adherence_log', AdherenceLog(connect(str(tmp_path / 'doses.db'))))
+    monkeypatch.setattr(medicine_tracker, 'CAREGIVERS', {7: 1})
+    sent = []
+
+    async def send(bot, chat_id, text, **kwargs):
+        sent.append(chat_id)
+
+    monkeypatch.setattr(medicine_tracker, 'send_message', send)
+    scheduler = schedule_followups(monkeypatch, [])
+    day = datetime.now(TZ).date().isoformat()
+    adherence.get_adherence_log().open_dose(user_id, day, 'morning')
+    asyncio.run(medicine_tracker.send_followup_reminder(None, user_id, TZ, day, 'morning'))
+    asyncio.run(medicine_tracker.check_dose_escalation(None, user_id, TZ, day, 'morning'))
+    return sent, list(scheduler._entries)
+
+
+def test_escalation_goes_to_configured_caregiver(tmp_path, monkeypatch):
+    sent, jobs = missed_followup(tmp_path, monkeypatch, 7)
+    assert sent == [7, 1]
+    assert jobs == [f"medicine:7:{datetime.now(TZ).date().isoformat()}_morning_escalation"]
+
+
+def test_self_subscriber_has_no_caregiver(tmp_path, monkeypatch):
+    sent, jobs = missed_followup(tmp_path, monkeypatch, 42)
+    assert sent == [42]
+    assert jobs == []
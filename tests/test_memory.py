@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from bot_chat.memory import MAX_TURNS, ConversationMemory
+
+USER_ID = 5
+
+
+def fill(memory, exchanges):
+    for number in range(exchanges):
+        memory.add_exchange(USER_ID, f"вопрос {number}", f"ответ {number}")
+
+
+def texts(memory):
+    return [turn['content'] for turn in memory.context(USER_ID)[1]]
+
+
+def test_turns_stay_visible_until_summary_is_ready():
+    memory = ConversationMemory()
+    fill(memory, MAX_TURNS // 2)
+    seen = []
+
+    async def summarize(previous, turns):
+        seen.append(texts(memory))
+        return "сводка"
+
+    asyncio.run(memory.compact(USER_ID, summarize))
+
+    assert "вопрос 0" in seen[0]
+    summary, history = memory.context(USER_ID)
+    assert summary == "сводка"
+    assert len(history) == MAX_TURNS // 2
+    assert history[0]['content'] == f"вопрос {MAX_TURNS // 4}"
+
+
+@pytest.mark.parametrize('error', [RuntimeError("модель недоступна"), asyncio.CancelledError()])
+def test_failed_summary_keeps_turns(error):
+    memory = ConversationMemory()
+    fill(memory, MAX_TURNS // 2)
+    before = texts(memory)
+
+    async def summarize(previous, turns):
+        raise error
+
+    try:
+        asyncio.run(memory.compact(USER_ID, summarize))
+    except asyncio.CancelledError:
+        pass
+
+    assert memory.context(USER_ID) == ("", [{'role': role, 'content': text} for role, text in
+                                            zip(['user', 'assistant'] * MAX_TURNS, before)])
+    assert memory.needs_compaction(USER_ID)
+
+
+def test_exchange_during_compaction_is_kept():
+    memory = ConversationMemory()
+    fill(memory, MAX_TURNS // 2)
+
+    async def summarize(previous, turns):
+        memory.add_exchange(USER_ID, "новый вопрос", "новый ответ")
+        await asyncio.sleep(0)
+        return "сводка"
+
+    asyncio.run(memory.compact(USER_ID, summarize))
+    assert texts(memory)[-2:] == ["новый вопрос", "новый ответ"]
+    assert memory.context(USER_ID)[0] == "сводка"
+
+
+def test_overflow_during_compaction_is_not_lost():
+    memory = ConversationMemory()
+    fill(memory, MAX_TURNS // 2)
+
+    async def summarize(previous, turns):
+        # Буфер переполняется, пока модель думает: запасная сводка забирает и несжатые реплики
+        fill(memory, MAX_TURNS)
+        return "сводка"
+
+    asyncio.run(memory.compact(USER_ID, summarize))
+    summary, _ = memory.context(USER_ID)
+    assert summary.startswith("сводка\n")
+    assert "Пользователь: вопрос" in summary
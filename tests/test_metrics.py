@@ -0,0 +1,27 @@
+import pytest
+
+from reminder_core.metrics import MetricsRegistry
+
+
+def test_counter_and_histogram_render():
+    registry = MetricsRegistry()
+    sends = registry.counter('sends_total', 'Отправки', ('type',))
+    sends.labels('water').inc()
+    sends.labels('water').inc(2)
+    lag = registry.histogram('lag_seconds', 'Опоздание', buckets=(1.0, 5.0))
+    lag.observe(0.5)
+    lag.observe(3)
+    text = registry.render()
+    assert 'sends_total{type="water"} 3' in text
+    assert 'lag_seconds_bucket{le="1"} 1' in text
+    assert 'lag_seconds_bucket{le="+Inf"} 2' in text
+    assert 'lag_seconds_sum 3.5' in text
+
+
+def test_gauge_reads_function_and_has_no_children():
+    registry = MetricsRegistry()
+    depth = registry.gauge('queue_depth', 'Очередь', ('class',), function=lambda: {('chat',): 2, ('reminder',): None})
+    assert 'queue_depth{class="chat"} 2' in registry.render()
+    assert 'reminder' not in registry.render()
+    with pytest.raises(TypeError, match='function'):
+        depth.labels('chat')
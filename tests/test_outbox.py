@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytz
+
+from reminder_core.jobs import FireContext
+from reminder_core.outbox import DELIVERED, PENDING, Outbox
+from reminder_core.storage import connect
+
+PLANNED = datetime(2026, 10, 18, 8, 0, tzinfo=pytz.utc)
+
+
+class RecordingEngine:
+    def __init__(self, fail=0):
+        self.sent = []
+        self.fail = fail
+
+    async def send_now(self, bot, chat_id, text, kind=None, **kwargs):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("сеть недоступна")
+        self.sent.append((chat_id, text))
+
+
+def make_outbox(tmp_path, engine=None, worker_id='w1'):
+    return Outbox(connect(str(tmp_path / 'outbox.db')), engine or RecordingEngine(), worker_id=worker_id)
+
+
+def test_same_slot_is_stored_once(tmp_path):
+    outbox = make_outbox(tmp_path)
+
+    async def run():
+        first = await outbox.enqueue(5, FireContext('water:5:hourly', PLANNED), "Попей воды")
+        # Тот же слот из другого процесса или после рестарта
+        second = await outbox.enqueue(5, FireContext('water:5:hourly', PLANNED), "Попей воды")
+        return first, second
+
+    assert asyncio.run(run()) == (True, False)
+    assert outbox.stats()[PENDING] == 1
+    assert outbox.duplicates == 1
+
+
+def test_concurrent_enqueues_are_batched_off_the_loop(tmp_path):
+    outbox = make_outbox(tmp_path)
+    calls = []
+    insert_rows = outbox.insert_rows
+
+    def recording_insert(rows):
+        calls.append((len(rows), threading.current_thread() is threading.main_thread()))
+        return insert_rows(rows)
+
+    outbox.insert_rows = recording_insert
+
+    async def run():
+        fires = [FireContext(f"water:{user_id}:hourly", PLANNED) for user_id in range(100)]
+        return await asyncio.gather(*(outbox.enqueue(user_id, fire, "Попей воды")
+                                      for user_id, fire in enumerate(fires)))
+
+    assert all(asyncio.run(run()))
+    assert sum(size for size, _ in calls) == 100
+    assert len(calls) < 100
+    assert not any(on_main for _, on_main in calls)
+
+
+def deliver(outbox, fires, timeout=5):
+    async def run():
+        outbox.start(bot=None)
+        for user_id, fire in fires:
+            await outbox.enqueue(user_id, fire, f"Напоминание {user_id}")
+        for _ in range(int(timeout / 0.02)):
+            if outbox.stats().get(DELIVERED, 0) >= len(fires):
+                break
+            await asyncio.sleep(0.02)
+        await outbox.stop()
+
+    asyncio.run(run())
+
+
+def test_delivered_exactly_once_across_workers(tmp_path):
+    engine = RecordingEngine()
+    first = make_outbox(tmp_path, engine)
+    deliver(first, [(5, FireContext('smoking:5:daily', PLANNED))])
+    second = make_outbox(tmp_path, engine, worker_id='w2')
+    deliver(second, [(5, FireContext('smoking:5:daily', PLANNED))], timeout=0.3)
+    assert engine.sent == [(5, "Напоминание 5")]
+
+
+def test_failed_send_is_retried_later(tmp_path):
+    outbox = make_outbox(tmp_path, RecordingEngine(fail=1))
+
+    async def run():
+        await outbox.enqueue(5, FireContext('smoking:5:daily', PLANNED), "Напоминание")
+        row, = outbox.claim()
+        await outbox._deliver(row)
+        return outbox.conn.execute("SELECT status, attempts, next_attempt_at FROM outbox").fetchone()
+
+    status, attempts, next_attempt_at = asyncio.run(run())
+    assert (status, attempts) == (PENDING, 1)
+    assert next_attempt_at > datetime.now().timestamp()
+    assert outbox.claim() == []
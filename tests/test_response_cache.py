@@ -0,0 +1,99 @@
+import asyncio
+
+from bot_chat import response_cache as cache_module
+from bot_chat.response_cache import ResponseCache, normalize_prompt
+
+MODEL = 'gpt-test'
+SYSTEM = 'system'
+
+
+def key(text):
+    return ResponseCache.make_key(MODEL, SYSTEM, text)
+
+
+def test_normalization_ignores_case_spaces_and_punctuation():
+    assert normalize_prompt("  Привет,   КАК дела?! ") == "привет как дела"
+    assert key("Привет!") == key("привет")
+    assert key("привет") != ResponseCache.make_key(MODEL, 'другой промпт', "привет")
+    assert key("...") is None
+    assert key("а" * (cache_module.CACHE_MAX_PROMPT_LENGTH + 1)) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    cache = ResponseCache(ttl=60, path=None)
+    cache.set(key("привет"), "Привет!")
+    assert cache.get(key("привет")) == "Привет!"
+    now[0] += 61
+    assert cache.get(key("привет")) is None
+    assert cache.stats()['entries'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, path=None)
+    cache.set(key("один"), "1")
+    cache.set(key("два"), "2")
+    assert cache.get(key("один")) == "1"
+    cache.set(key("три"), "3")
+    assert cache.get(key("два")) is None
+    assert cache.get(key("один")) == "1"
+    assert cache.get(key("три")) == "3"
+
+
+def test_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / 'chat_cache.json')
+    cache = ResponseCache(path=path)
+    cache.set(key("привет"), "Привет!")
+    cache.save()
+
+    restored = ResponseCache(path=path)
+    assert restored.get(key("привет")) == "Привет!"
+
+
+def test_waiters_get_answer_being_generated():
+    cache = ResponseCache(path=None)
+
+    async def scenario():
+        assert await cache.wait(key("привет")) is None
+        cache.begin(key("привет"))
+        waiters = [asyncio.create_task(cache.wait(key("Привет!"))) for _ in range(3)]
+        await asyncio.sleep(0)
+        cache.finish(key("привет"), "Привет!")
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == ["Привет!"] * 3
+    assert cache.get(key("привет")) == "Привет!"
+    assert cache.shared == 3
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    cache = ResponseCache(path=None)
+
+    async def scenario():
+        cache.begin(key("привет"))
+        cancelled = asyncio.create_task(cache.wait(key("привет")))
+        waiter = asyncio.create_task(cache.wait(key("привет")))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        cache.finish(key("привет"), "Привет!")
+        return await waiter
+
+    assert asyncio.run(scenario()) == "Привет!"
+
+
+def test_waiters_retry_when_generation_fails():
+    cache = ResponseCache(path=None)
+
+    async def scenario():
+        cache.begin(key("привет"))
+        waiter = asyncio.create_task(cache.wait(key("привет")))
+        await asyncio.sleep(0)
+        cache.finish(key("привет"), None)
+        return await waiter
+
+    assert asyncio.run(scenario()) is None
+    assert cache.get(key("привет")) is None
+    assert cache.shared == 0
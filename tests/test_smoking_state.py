@@ -0,0 +1,55 @@
+import json
+import asyncio
+
+from smoking_reminder.state_store import SmokingStateStore
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_load_reads_file_off_the_loop(tmp_path, monkeypatch):
+    path = tmp_path / 'state.json'
+    path.write_text(json.dumps({'start_date': '2026-01-01', 'total_days': 5}), encoding='utf-8')
+    store = SmokingStateStore(str(path), flush_delay=0.01)
+    threads = []
+    original = asyncio.to_thread
+
+    async def tracking_to_thread(func, *args):
+        threads.append(func.__name__)
+        return await original(func, *args)
+
+    monkeypatch.setattr(asyncio, 'to_thread', tracking_to_thread)
+    data = asyncio.run(store.load())
+    assert data['total_days'] == 5
+    assert threads == ['_read']
+
+
+def test_write_during_flush_is_persisted(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text(json.dumps({'start_date': '2026-01-01', 'total_days': 1}), encoding='utf-8')
+    store = SmokingStateStore(str(path), flush_delay=0.01)
+    original_write = store._write_snapshot
+    loops = []
+
+    def slow_write(snapshot, version):
+        # Изменение приходит, пока идет запись предыдущей версии
+        if snapshot['total_days'] == 2:
+            loops[0].call_soon_threadsafe(lambda: store.update(total_days=3))
+        original_write(snapshot, version)
+
+    store._write_snapshot = slow_write
+
+    async def run():
+        loops.append(asyncio.get_running_loop())
+        await store.load()
+        store.update(total_days=2)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if not store.dirty and read(path)['total_days'] == 3:
+                break
+
+    asyncio.run(run())
+    assert read(path)['total_days'] == 3
+    assert not store.dirty
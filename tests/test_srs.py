@@ -0,0 +1,141 @@
+import asyncio
+import csv
+
+import pytest
+
+from french_reminder.srs import FIRST_INTERVALS, INITIAL_EASE, MIN_EASE, CardStore, parse_deck, \
+    setup_french_handlers, sm2
+from reminder_core.storage import connect
+from tests.helpers import FakeApplication, FakeMessage, callback_update, command_context, message_update
+
+NOW = 1_790_000_000.0
+DAY = 86400
+USER_ID = 5
+
+
+class FakeFile:
+    def __init__(self, content):
+        self.content = content
+
+    async def download_to_drive(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.content)
+
+
+class FakeDocument:
+    def __init__(self, file_name, content):
+        self.file_name = file_name
+        self.file = FakeFile(content)
+        self.downloads = 0
+
+    async def get_file(self):
+        self.downloads += 1
+        return self.file
+
+
+@pytest.fixture
+def cards(tmp_path):
+    return CardStore(connect(str(tmp_path / 'cards.db')))
+
+
+@pytest.fixture
+def app(cards):
+    application = FakeApplication()
+    setup_french_handlers(application, cards)
+    return application
+
+
+def new_card(cards, front='bonjour', back='привет'):
+    cards.add_cards(USER_ID, 'test', [(front, back)], now=NOW)
+    return cards.due_cards(USER_ID, now=NOW)[0]
+
+
+def test_sm2_intervals_grow(cards):
+    card = new_card(cards)
+    intervals = []
+    for _ in range(4):
+        card = sm2(card, 4, now=NOW)
+        intervals.append(card.interval)
+    assert intervals[:2] == list(FIRST_INTERVALS)
+    assert intervals[2] == round(FIRST_INTERVALS[1] * card.ease)
+    assert card.ease == pytest.approx(INITIAL_EASE)
+    assert card.due == NOW + intervals[-1] * DAY
+
+
+def test_sm2_lapse_resets_and_lowers_ease(cards):
+    card = sm2(sm2(new_card(cards), 5, now=NOW), 1, now=NOW)
+    assert (card.repetitions, card.interval, card.lapses) == (0, 0, 1)
+    assert card.due == NOW + 600
+    for _ in range(10):
+        card = sm2(card, 0, now=NOW)
+    assert card.ease == MIN_EASE
+
+
+def test_parse_deck_formats():
+    assert list(parse_deck(["# comment\n", "chat\tкот\n", "\n", "chien\tсобака\n"])) == \
+        [('chat', 'кот'), ('chien', 'собака')]
+    assert list(parse_deck(["chat;кот\n"])) == [('chat', 'кот')]
+    assert list(parse_deck(['{"front": "chat", "back": "кот"}\n'])) == [('chat', 'кот')]
+
+
+def test_review_is_idempotent(cards):
+    card = new_card(cards)
+    assert cards.review(card, 4, now=NOW).repetitions == 1
+    # Второе нажатие с той же (устаревшей) карточкой
+    assert cards.review(card, 4, now=NOW + 1) is None
+    assert cards.get(card.card_id).repetitions == 1
+
+
+def test_double_grade_press_counts_once(app, cards):
+    card = new_card(cards)
+    message = FakeMessage()
+    show = callback_update(USER_ID, f"fr:show:{card.card_id}", message)
+    asyncio.run(app.callback('card_callback')(show, None))
+    keyboard = show.callback_query.edits[0][1]['reply_markup']
+    grade = keyboard.inline_keyboard[0][2].callback_data
+
+    for _ in range(2):
+        update = callback_update(USER_ID, grade, message)
+        asyncio.run(app.callback('card_callback')(update, None))
+    assert update.callback_query.answers == ["Оценка уже учтена"]
+    assert cards.get(card.card_id).repetitions == 1
+
+
+def send_document(app, document, caption=None):
+    message = FakeMessage(document=document, caption=caption)
+    asyncio.run(app.callback('deck_document')(message_update(USER_ID, message), None))
+    return message
+
+
+def test_document_without_request_is_ignored(app, cards):
+    document = FakeDocument('notes.txt', "chat\tкот\n".encode())
+    message = send_document(app, document)
+    assert message.replies == []
+    assert document.downloads == 0
+    assert cards.total(USER_ID) == 0
+
+
+def test_deck_import_command_then_file(app, cards):
+    command = FakeMessage('/deck import animaux')
+    asyncio.run(app.callback('deck_command')(message_update(USER_ID, command), command_context('import', 'animaux')))
+    message = send_document(app, FakeDocument('words.txt', "chat\tкот\nchien\tсобака\n".encode()))
+    assert message.replies[0][0].startswith("✅ Колода animaux: добавлено 2")
+    # Запрос одноразовый
+    assert send_document(app, FakeDocument('more.txt', "oiseau\tптица\n".encode())).replies == []
+    assert cards.total(USER_ID) == 2
+
+
+def test_caption_requests_import(app, cards):
+    message = send_document(app, FakeDocument('words.csv', "chat,кот\n".encode()), caption='/deck import')
+    assert message.replies[0][0].startswith("✅ Колода words: добавлено 1")
+
+
+@pytest.mark.parametrize('content', [b'\xff\xfe\x00broken', b'"chat\tkot\n' + b'x' * (200 * 1024)])
+def test_broken_deck_reports_error(app, cards, content):
+    limit = csv.field_size_limit(1024)
+    try:
+        message = send_document(app, FakeDocument('words.txt', content), caption='/deck import')
+    finally:
+        csv.field_size_limit(limit)
+    assert message.replies[0][0].startswith("❌ Не удалось разобрать колоду")
+    assert cards.total(USER_ID) == 0
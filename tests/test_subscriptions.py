@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from reminder_core.dispatcher import Dispatcher
+from reminder_core.plugins import PluginRegistry, TrackerSpec
+from reminder_core.registry import SubscriptionRegistry
+from reminder_core.storage import connect
+from reminder_core.subscriptions import SubscriptionManager, setup_subscription_handlers
+from tests.helpers import FakeApplication, FakeMessage, command_context, message_update
+
+ADMIN_ID = 1
+STRANGER_ID = 99
+
+activated = []
+
+
+def setup_tracker(scheduler, bot, user_id, tz, schedule=None):
+    activated.append(user_id)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    activated.clear()
+    trackers = PluginRegistry({
+        'smoking': TrackerSpec(f'{__name__}:setup_tracker', 'America/Vancouver', "Курение", owner=ADMIN_ID),
+        'water': TrackerSpec(f'{__name__}:setup_tracker', 'America/Vancouver', "Вода"),
+    })
+    registry = SubscriptionRegistry(connect(str(tmp_path / 'subscriptions.db')))
+    return SubscriptionManager(registry, Dispatcher(runner=None), None, trackers)
+
+
+def run_command(manager, user_id, *args):
+    application = FakeApplication()
+    setup_subscription_handlers(application, manager, ADMIN_ID)
+    message = FakeMessage(' '.join(('/subscribe',) + args))
+    asyncio.run(application.callback('subscribe_command')(message_update(user_id, message), command_context(*args)))
+    return message.replies[-1][0]
+
+
+def test_personal_tracker_is_hidden_from_strangers(manager):
+    assert manager.available(STRANGER_ID) == ['water']
+    assert manager.available(ADMIN_ID) == ['smoking', 'water']
+    assert run_command(manager, STRANGER_ID, 'smoking').startswith("❌ Неизвестный тип. Доступно: water")
+    assert manager.registry.user_subscriptions(STRANGER_ID) == []
+    with pytest.raises(PermissionError):
+        manager.subscribe(STRANGER_ID, 'smoking')
+
+
+def test_admin_cannot_hand_personal_tracker_to_others(manager):
+    assert run_command(manager, ADMIN_ID, 'smoking', str(STRANGER_ID)).startswith("❌")
+    assert run_command(manager, ADMIN_ID, 'smoking').startswith("✅")
+    assert run_command(manager, STRANGER_ID, 'water').startswith("✅")
+    assert activated == [ADMIN_ID, STRANGER_ID]
+
+
+def test_existing_stranger_subscription_is_not_activated(manager):
+    manager.registry.subscribe(STRANGER_ID, 'smoking', 'America/Vancouver')
+    manager.registry.subscribe(STRANGER_ID, 'water', 'America/Vancouver')
+    manager.load()
+    assert activated == [STRANGER_ID]
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from reminder_core.triggers import TimeWindow, in_window, next_fire_time, parse_window
+
+VANCOUVER = 'America/Vancouver'
+HELSINKI = 'Europe/Helsinki'
+
+# Переходы на летнее/зимнее время, которые есть в любой версии tzdata начиная с pinned pytz:
+# (пояс, слот, после — местное время, ожидаемые срабатывания — местное время и смещение UTC в часах)
+DST_MATRIX = [
+    # Ванкувер, 8 марта 2026: 02:00 -> 03:00. Несуществующее 02:30 пропускается
+    (VANCOUVER, {'hour': 2, 'minute': 30}, '2026-03-07 12:00',
+     [('2026-03-09 02:30', -7), ('2026-03-10 02:30', -7)]),
+    # Тихие часы через полночь в ночь перехода: первое напоминание утром, уже по летнему времени
+    (VANCOUVER, {'hour': '7-22', 'minute': 0, 'quiet': '22:00-07:00'}, '2026-03-07 21:30',
+     [('2026-03-08 07:00', -7), ('2026-03-08 08:00', -7)]),
+    # Ванкувер, 2 ноября 2025: 02:00 -> 01:00. Повторяющееся 01:30 срабатывает один раз, в первое
+    (VANCOUVER, {'hour': 1, 'minute': 30}, '2025-11-01 12:00',
+     [('2025-11-02 01:30', -7), ('2025-11-03 01:30', -8)]),
+    (VANCOUVER, {'minute': 0}, '2025-11-02 00:30',
+     [('2025-11-02 01:00', -7), ('2025-11-02 02:00', -8), ('2025-11-02 03:00', -8)]),
+    (VANCOUVER, {'minute': 0, 'quiet': '22:00-07:00'}, '2025-11-01 21:30',
+     [('2025-11-02 07:00', -8), ('2025-11-02 08:00', -8)]),
+    (VANCOUVER, {'minute': 0, 'active': '07:00-09:00'}, '2025-11-01 08:30',
+     [('2025-11-02 07:00', -8), ('2025-11-02 08:00', -8), ('2025-11-03 07:00', -8)]),
+    # Хельсинки, 29 марта 2026: 03:00 -> 04:00
+    (HELSINKI, {'hour': 3, 'minute': 30}, '2026-03-28 12:00',
+     [('2026-03-30 03:30', 3)]),
+    (HELSINKI, {'hour': '8,14,20', 'minute': 0, 'quiet': '19:00-09:00'}, '2026-03-28 15:00',
+     [('2026-03-29 14:00', 3), ('2026-03-30 14:00', 3)]),
+    (HELSINKI, {'minute': 0, 'quiet': '23:30-03:30'}, '2026-03-28 23:00',
+     [('2026-03-29 04:00', 3), ('2026-03-29 05:00', 3)]),
+    # Хельсинки, 25 октября 2026: 04:00 -> 03:00
+    (HELSINKI, {'hour': 3, 'minute': 30}, '2026-10-24 12:00',
+     [('2026-10-25 03:30', 3), ('2026-10-26 03:30', 2)]),
+    (HELSINKI, {'hour': '8,14,20', 'minute': 0, 'active': '07:00-15:00'}, '2026-10-24 15:00',
+     [('2026-10-25 08:00', 2), ('2026-10-25 14:00', 2), ('2026-10-26 08:00', 2)]),
+]
+
+
+def localize(tz, text):
+    return tz.localize(datetime.strptime(text, '%Y-%m-%d %H:%M')).astimezone(pytz.utc)
+
+
+def fires_after(when, tz, after, count):
+    fires = []
+    fire = after
+    for _ in range(count):
+        fire = next_fire_time(when, tz, fire)
+        if fire is None:
+            break
+        fires.append(fire)
+    return fires
+
+
+@pytest.mark.parametrize('zone, when, after, expected', DST_MATRIX)
+def test_dst_matrix(zone, when, after, expected):
+    tz = pytz.timezone(zone)
+    fires = fires_after(when, tz, localize(tz, after), len(expected))
+    local = [fire.astimezone(tz) for fire in fires]
+    assert [(value.strftime('%Y-%m-%d %H:%M'), value.utcoffset() / timedelta(hours=1)) for value in local] == expected
+
+
+def test_vancouver_2026_autumn_fires_each_hour_once():
+    """1 ноября 2026: в зависимости от tzdata часы переводятся или BC остается на UTC-7 —
+    в обоих случаях каждое местное время срабатывает не больше одного раза и по порядку"""
+    tz = pytz.timezone(VANCOUVER)
+    fires = fires_after({'minute': 0}, tz, localize(tz, '2026-11-01 00:30'), 4)
+    local_hours = [fire.astimezone(tz).strftime('%H:%M') for fire in fires]
+    assert local_hours == ['01:00', '02:00', '03:00', '04:00']
+    assert fires == sorted(fires)
+
+
+def test_window_fully_excluding_slot_has_no_fire():
+    tz = pytz.timezone(HELSINKI)
+    assert next_fire_time({'hour': 8, 'minute': 0, 'quiet': '07:00-09:00'}, tz, localize(tz, '2026-10-24 12:00')) \
+        is None
+
+
+def test_slot_without_windows_still_fires():
+    tz = pytz.timezone(HELSINKI)
+    fire = next_fire_time({'hour': 8, 'minute': 0}, tz, localize(tz, '2026-10-24 12:00'))
+    assert fire.astimezone(tz).strftime('%Y-%m-%d %H:%M') == '2026-10-25 08:00'
+
+
+def test_parse_window():
+    assert parse_window('22:00-07:00') == TimeWindow(22 * 60, 7 * 60)
+    assert parse_window('7-9') == TimeWindow(7 * 60, 9 * 60)
+    assert parse_window(None) is None
+    with pytest.raises(ValueError):
+        parse_window('22:00')
+    with pytest.raises(ValueError):
+        parse_window('25:00-07:00')
+
+
+@pytest.mark.parametrize('minute, quiet', [(23 * 60, True), (0, True), (6 * 60 + 59, True), (7 * 60, False),
+                                           (12 * 60, False), (21 * 60 + 59, False)])
+def test_in_window_wraps_midnight(minute, quiet):
+    assert in_window(parse_window('22:00-07:00'), minute) is quiet
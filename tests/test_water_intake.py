@@ -0,0 +1,99 @@
+import asyncio
+from datetime import date, datetime
+
+import pytz
+
+from lina_water import water_reminder
+from lina_water.intake import DAILY_TARGET_ML, RECENT_WINDOW, DailyTotal, IntakeLog, setup_water_handlers
+from reminder_core.storage import connect
+from tests.helpers import FakeApplication, FakeBot, callback_update
+
+VANCOUVER = pytz.timezone('America/Vancouver')
+USER_ID = 5
+
+
+def local(text):
+    return VANCOUVER.localize(datetime.strptime(text, '%Y-%m-%d %H:%M')).timestamp()
+
+
+def make_log(tmp_path):
+    return IntakeLog(connect(str(tmp_path / 'water.db')))
+
+
+def test_daily_total_matches_raw_entries(tmp_path):
+    log = make_log(tmp_path)
+    for hour in (8, 9, 12):
+        log.record(USER_ID, 250, VANCOUVER, at=local(f'2026-10-18 {hour:02d}:00'))
+    log.record(USER_ID, 500, VANCOUVER, at=local('2026-10-18 13:00'))
+    log.record(6, 250, VANCOUVER, at=local('2026-10-18 13:00'))
+
+    assert log.daily(USER_ID, '2026-10-18') == DailyTotal('2026-10-18', 1250, 4)
+    raw = log.conn.execute("SELECT SUM(amount_ml) AS total FROM water_intake WHERE user_id = ? AND day = ?",
+                           (USER_ID, '2026-10-18')).fetchone()
+    assert raw['total'] == 1250
+
+
+def test_day_boundary_uses_user_timezone(tmp_path):
+    log = make_log(tmp_path)
+    # 23:30 в Ванкувере — уже следующий день по UTC, но итог идет в местный день
+    total = log.record(USER_ID, 250, VANCOUVER, at=local('2026-10-18 23:30'))
+    assert total.day == '2026-10-18'
+    assert log.record(USER_ID, 250, VANCOUVER, at=local('2026-10-19 00:10')).day == '2026-10-19'
+
+
+def test_week_fills_missing_days(tmp_path):
+    log = make_log(tmp_path)
+    log.record(USER_ID, 250, VANCOUVER, at=local('2026-10-12 10:00'))
+    log.record(USER_ID, 250, VANCOUVER, at=local('2026-10-11 10:00'))
+    log.record(USER_ID, 2000, VANCOUVER, at=local('2026-10-18 10:00'))
+    week = log.week(USER_ID, date(2026, 10, 18))
+    assert [day.day for day in week] == [f'2026-10-{day}' for day in range(12, 19)]
+    assert [day.total_ml for day in week] == [250, 0, 0, 0, 0, 0, 2000]
+
+
+def test_suppress_reason(tmp_path):
+    log = make_log(tmp_path)
+    assert log.suppress_reason(USER_ID, VANCOUVER, now=local('2026-10-18 09:00')) is None
+    log.record(USER_ID, 500, VANCOUVER, at=local('2026-10-18 09:00'))
+    # Пила недавно и не отстает от графика (к 09:30 по графику ~266 мл)
+    assert log.suppress_reason(USER_ID, VANCOUVER, now=local('2026-10-18 09:30')) == 'on_track'
+    # Давно не пила
+    later = local('2026-10-18 09:00') + RECENT_WINDOW + 60
+    assert log.suppress_reason(USER_ID, VANCOUVER, now=later) is None
+    log.record(USER_ID, DAILY_TARGET_ML, VANCOUVER, at=local('2026-10-18 10:00'))
+    assert log.suppress_reason(USER_ID, VANCOUVER, now=local('2026-10-18 21:00')) == 'target'
+
+
+def test_drink_button_records_intake(tmp_path):
+    log = make_log(tmp_path)
+    app = FakeApplication()
+    setup_water_handlers(app, lambda user_id: VANCOUVER, log)
+    update = callback_update(USER_ID, 'water:drink:250')
+    asyncio.run(app.callback('drink_callback')(update, None))
+    today = datetime.now(VANCOUVER).date().isoformat()
+    assert log.daily(USER_ID, today).total_ml == 250
+    assert update.callback_query.answers[0].startswith("+250 мл. Сегодня: 250")
+
+
+def test_drink_button_rejects_unknown_amount(tmp_path):
+    log = make_log(tmp_path)
+    app = FakeApplication()
+    setup_water_handlers(app, lambda user_id: VANCOUVER, log)
+    for data in ('water:drink:999999', 'water:drink:0'):
+        update = callback_update(USER_ID, data)
+        asyncio.run(app.callback('drink_callback')(update, None))
+        assert update.callback_query.answers == ["Неизвестный объем"]
+    today = datetime.now(VANCOUVER).date().isoformat()
+    assert log.daily(USER_ID, today).total_ml == 0
+
+
+def test_special_reminder_skipped_after_target(tmp_path, monkeypatch):
+    log = make_log(tmp_path)
+    monkeypatch.setattr(water_reminder, 'get_intake_log', lambda: log)
+    bot = FakeBot()
+    asyncio.run(water_reminder.send_special_water_reminder(bot, USER_ID, VANCOUVER))
+    assert len(bot.sent) == 1
+
+    log.record(USER_ID, DAILY_TARGET_ML, VANCOUVER)
+    asyncio.run(water_reminder.send_special_water_reminder(bot, USER_ID, VANCOUVER))
+    assert len(bot.sent) == 1
@@ -0,0 +1,66 @@
+import json
+import socket
+import asyncio
+from types import SimpleNamespace
+
+import tornado.httpclient
+import tornado.httpserver
+
+from reminder_core.metrics import MetricsRegistry
+from reminder_core.webhook import SECRET_HEADER, make_webhook_app
+
+UPDATE = {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'chat': {'id': 5, 'type': 'private'},
+                                      'from': {'id': 5, 'is_bot': False, 'first_name': 'Lina'}, 'text': 'Привет'}}
+
+
+def serve_and_fetch(requests, **app_kwargs):
+    """Поднимает приложение на свободном порту и выполняет запросы; возвращает (коды, очередь апдейтов)"""
+    registry = MetricsRegistry()
+    registry.counter('demo_total', 'Пример').inc()
+
+    async def run():
+        application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        server = tornado.httpserver.HTTPServer(make_webhook_app(application, registry=registry, **app_kwargs))
+        server.listen(port, address='127.0.0.1')
+        client = tornado.httpclient.AsyncHTTPClient()
+        codes = []
+        try:
+            for path, kwargs in requests:
+                response = await client.fetch(f"http://127.0.0.1:{port}{path}", raise_error=False, **kwargs)
+                codes.append((response.code, response.body.decode()))
+        finally:
+            server.stop()
+        return codes, application.update_queue
+
+    return asyncio.run(run())
+
+
+def post(body, headers=None):
+    return '/', {'method': 'POST', 'body': json.dumps(body), 'headers': headers or {}}
+
+
+def test_metrics_without_token_allowed_from_localhost():
+    (code, body), = serve_and_fetch([('/metrics', {})])[0]
+    assert code == 200 and 'demo_total 1' in body
+
+
+def test_metrics_token_required_when_configured():
+    codes, _ = serve_and_fetch([('/metrics', {}),
+                                ('/metrics', {'headers': {'Authorization': 'Bearer wrong'}}),
+                                ('/metrics', {'headers': {'Authorization': 'Bearer s3cret'}})],
+                               metrics_token='s3cret')
+    assert [code for code, _ in codes] == [403, 403, 200]
+
+
+def test_webhook_queues_update_and_checks_secret():
+    codes, updates = serve_and_fetch([post(UPDATE), post(UPDATE, {SECRET_HEADER: 'token'}),
+                                      ('/', {'method': 'POST', 'body': 'not json',
+                                             'headers': {SECRET_HEADER: 'token'}})],
+                                     secret_token='token')
+    assert [code for code, _ in codes] == [403, 200, 400]
+    assert updates.qsize() == 1
+    assert updates.get_nowait().message.text == 'Привет'